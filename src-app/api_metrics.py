@@ -0,0 +1,212 @@
+"""
+Métricas das chamadas à API da AWS
+Ligadas aos eventos do botocore de cada sessão, registram por operação a quantidade de
+chamadas, um histograma de latência, os retries, os throttlings e os códigos de erro.
+O agregado do processo é exposto em /api/metrics no formato texto do Prometheus
+"""
+
+import time
+import threading
+
+from rate_limiter import THROTTLE_CODES
+
+# Limites superiores (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefixo dos nomes das métricas no Prometheus
+METRIC_PREFIX = 'aws_cleaner_api'
+
+# Chave, no contexto da requisição do botocore, com o início da chamada
+_START_KEY = 'api_metrics_start'
+
+class OperationMetrics:
+    """Contadores e histograma de latência de uma operação (ex.: ec2 DescribeInstances)"""
+
+    __slots__ = ('calls', 'retries', 'throttles', 'errors', 'seconds', 'max_seconds', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.errors = {}
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        # Contagem por bucket (não cumulativa); o último é o +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds, retries, error_code):
+        self.calls += 1
+        self.retries += retries
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[_bucket(seconds)] += 1
+        if error_code:
+            self.errors[error_code] = self.errors.get(error_code, 0) + 1
+
+def _bucket(seconds):
+    for index, limit in enumerate(LATENCY_BUCKETS):
+        if seconds <= limit:
+            return index
+    return len(LATENCY_BUCKETS)
+
+class ApiMetrics:
+    """Métricas por (serviço, operação), alimentadas pelos eventos do botocore de uma ou mais sessões
+
+    Com parent, cada chamada também é registrada nele: o InProcessRunner mantém
+    o agregado do processo e cada execução tem as suas, para o resumo do job.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def install(self, session):
+        """Registra os handlers nos eventos de session (copiados para cada client criado depois)"""
+        session.events.register('before-call', self._before_call)
+        session.events.register('after-call', self._after_call)
+        session.events.register('after-call-error', self._after_call_error)
+        session.events.register('needs-retry', self._needs_retry)
+        return self
+
+    def observe(self, service, operation, seconds, retries=0, error_code=None):
+        """Registra uma chamada terminada (com todos os seus retries)"""
+        with self._lock:
+            self._operation(service, operation).observe(seconds, retries, error_code)
+        if self.parent is not None:
+            self.parent.observe(service, operation, seconds, retries, error_code)
+
+    def throttled(self, service, operation):
+        """Registra uma tentativa que recebeu throttling (repetida ou não pelo botocore)"""
+        with self._lock:
+            self._operation(service, operation).throttles += 1
+        if self.parent is not None:
+            self.parent.throttled(service, operation)
+
+    def _operation(self, service, operation):
+        key = (service, operation)
+        if key not in self._operations:
+            self._operations[key] = OperationMetrics()
+        return self._operations[key]
+
+    def _snapshot(self):
+        # Cópia, para formatar a saída fora do lock enquanto as chamadas continuam
+        with self._lock:
+            return [(key, _copy(metrics)) for key, metrics in sorted(self._operations.items())]
+
+    def summary(self):
+        """Resumo para o resultado de um job: totais e as operações que mais tomaram tempo"""
+        operations = self._snapshot()
+        return {
+            'calls': sum(metrics.calls for _, metrics in operations),
+            'retries': sum(metrics.retries for _, metrics in operations),
+            'throttles': sum(metrics.throttles for _, metrics in operations),
+            'errors': sum(sum(metrics.errors.values()) for _, metrics in operations),
+            'api_seconds': round(sum(metrics.seconds for _, metrics in operations), 3),
+            'operations': [
+                {
+                    'service': service,
+                    'operation': operation,
+                    'calls': metrics.calls,
+                    'retries': metrics.retries,
+                    'throttles': metrics.throttles,
+                    'errors': dict(metrics.errors),
+                    'seconds': round(metrics.seconds, 3),
+                    'max_seconds': round(metrics.max_seconds, 3)
+                }
+                for (service, operation), metrics in sorted(operations, key=lambda item: -item[1].seconds)
+            ]
+        }
+
+    def describe(self):
+        """Linha do resumo da execução com os totais das chamadas"""
+        summary = self.summary()
+        return (
+            f"📡 API calls: {summary['calls']} ({summary['api_seconds']:.1f}s in API, "
+            f"{summary['retries']} retries, {summary['errors']} errors)"
+        )
+
+    def prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus"""
+        operations = self._snapshot()
+        lines = []
+
+        def family(name, metric_type, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+        for name, field, help_text in [
+            ('calls_total', 'calls', 'Chamadas à API da AWS feitas pelo cleaner'),
+            ('retries_total', 'retries', 'Tentativas repetidas pelo botocore'),
+            ('throttles_total', 'throttles', 'Tentativas que receberam throttling'),
+        ]:
+            family(name, 'counter', help_text)
+            for (service, operation), metrics in operations:
+                lines.append(f"{METRIC_PREFIX}_{name}{_labels(service=service, operation=operation)} {getattr(metrics, field)}")
+
+        family('errors_total', 'counter', 'Chamadas que terminaram em erro, por código')
+        for (service, operation), metrics in operations:
+            for code, count in sorted(metrics.errors.items()):
+                lines.append(f"{METRIC_PREFIX}_errors_total{_labels(service=service, operation=operation, code=code)} {count}")
+
+        family('call_duration_seconds', 'histogram', 'Latência das chamadas, incluindo os retries')
+        for (service, operation), metrics in operations:
+            cumulative = 0
+            for limit, count in zip(LATENCY_BUCKETS + ('+Inf',), metrics.buckets):
+                cumulative += count
+                lines.append(
+                    f"{METRIC_PREFIX}_call_duration_seconds_bucket"
+                    f"{_labels(service=service, operation=operation, le=str(limit))} {cumulative}"
+                )
+            labels = _labels(service=service, operation=operation)
+            lines.append(f"{METRIC_PREFIX}_call_duration_seconds_sum{labels} {metrics.seconds:.6f}")
+            lines.append(f"{METRIC_PREFIX}_call_duration_seconds_count{labels} {metrics.calls}")
+        return '\n'.join(lines) + '\n'
+
+    def _before_call(self, context=None, **kwargs):
+        if context is not None:
+            context[_START_KEY] = time.monotonic()
+
+    def _after_call(self, event_name, http_response=None, parsed=None, context=None, **kwargs):
+        start = (context or {}).get(_START_KEY)
+        if start is None:
+            return
+        parsed = parsed or {}
+        error_code = None
+        if http_response is not None and http_response.status_code >= 300:
+            error_code = parsed.get('Error', {}).get('Code') or str(http_response.status_code)
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        self.observe(*_operation_name(event_name), time.monotonic() - start, retries, error_code)
+
+    def _after_call_error(self, event_name, exception=None, context=None, **kwargs):
+        # Erros sem resposta da API (conexão, timeout)
+        start = (context or {}).get(_START_KEY)
+        if start is not None:
+            self.observe(*_operation_name(event_name), time.monotonic() - start, 0, type(exception).__name__)
+
+    def _needs_retry(self, event_name, response=None, **kwargs):
+        # Só observa a resposta; a decisão de repetir continua com o botocore
+        if response is None:
+            return
+        http_response, parsed = response
+        if parsed.get('Error', {}).get('Code') in THROTTLE_CODES or http_response.status_code == 429:
+            self.throttled(*_operation_name(event_name))
+
+def _copy(metrics):
+    copy = OperationMetrics()
+    for field in OperationMetrics.__slots__:
+        value = getattr(metrics, field)
+        setattr(copy, field, value.copy() if isinstance(value, (dict, list)) else value)
+    return copy
+
+def _operation_name(event_name):
+    """(serviço, operação) em eventos como 'after-call.ec2.DescribeInstances'"""
+    _, service, operation = event_name.split('.', 2)
+    return service, operation
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
@@ -1,12 +1,16 @@
-from flask import Flask, request, jsonify, render_template
-import subprocess
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 import os
 import tempfile
 import yaml
 import re
-import sys
 from pathlib import Path
 
+from cleaner_common import ALL_REGIONS, parse_regions
+from checkpoint_journal import DEFAULT_JOURNAL_PATH
+from cleaner_runner import InProcessRunner
+from inventory_cache import InventoryCache
+from jobs import LOG_BUFFER_LINES, MAX_PAGE_LIMIT, PAGE_LIMIT, JobManager, sse_stream
+
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # Configurações
@@ -14,6 +18,13 @@ BASE_DIR = Path(__file__).parent.parent
 AWS_NUKE_PATH = str(BASE_DIR / 'src-nuke' / 'aws-nuke-v2.25.0-linux-amd64')
 AWS_CLEANER_PATH = str(BASE_DIR / 'src-app' / 'aws_resource_cleaner_simple.py')
 
+# O cleaner roda dentro deste processo, em threads, em vez de um subprocesso por requisição;
+# a execução reaproveita o inventário (só IDs) do dry-run recente da mesma conta e regiões
+runner = InProcessRunner(inventory_cache=InventoryCache(), journal_path=DEFAULT_JOURNAL_PATH)
+
+# Execuções assíncronas, acompanhadas por /api/jobs/<id> e pelo stream SSE
+jobs = JobManager(runner)
+
 def validate_inputs(data):
     """Valida os dados de entrada"""
     required_fields = ['account_id', 'aws_access_key', 'aws_secret_key', 'region']
@@ -34,8 +45,35 @@ def validate_inputs(data):
     if len(data['aws_secret_key']) != 40:
         return False, 'AWS Secret Key deve ter 40 caracteres'
     
+    # Valida as regiões (lista separada por vírgulas, array JSON ou 'all')
+    regions = parse_regions(data['region'])
+    if not regions:
+        return False, 'Informe ao menos uma região'
+    for region in regions:
+        if region != ALL_REGIONS and not re.match(r'^[a-z]{2}(-[a-z]+)+-\d$', region):
+            return False, f'Região inválida: {region}'
+    
     return True, ''
 
+def region_argument(data):
+    """Monta o valor de --region a partir das regiões informadas"""
+    return ','.join(parse_regions(data['region']))
+
+def sync_result(job):
+    """Resposta de /api/dry-run e /api/execute: o fim do output, com o job_id para paginar o resto"""
+    total = job.log.count
+    start = max(0, total - LOG_BUFFER_LINES)
+    output = ''.join(line + '\n' for line in job.log.read(start, LOG_BUFFER_LINES))
+    return {
+        'success': job.result['success'],
+        'output': output,
+        'output_truncated': start > 0,
+        'error': job.result['error'],
+        'return_code': job.result['return_code'],
+        'metrics': job.result.get('metrics'),
+        'job_id': job.id
+    }
+
 def create_config_file(data):
     """Cria arquivo de configuração sem exigir alias da conta"""
     config = {
@@ -43,7 +81,7 @@ def create_config_file(data):
         'accounts': {
             data['account_id']: {}  # Sem filtros para permitir deletar TUDO
         },
-        'regions': ['global', data['region']],  # Adicionado 'global' para recursos globais
+        'regions': ['global'] + parse_regions(data['region']),  # Adicionado 'global' para recursos globais
         'feature-flags': {
             'disable-deletion-protection': {
                 'EC2Instance': True,
@@ -73,38 +111,22 @@ def dry_run():
         if not is_valid:
             return jsonify({'success': False, 'error': error_msg}), 400
         
-        # Configura ambiente AWS
-        env = os.environ.copy()
-        env.update({
-            'AWS_ACCESS_KEY_ID': data['aws_access_key'],
-            'AWS_SECRET_ACCESS_KEY': data['aws_secret_key'],
-            'AWS_DEFAULT_REGION': data['region']
-        })
-        
-        # Usa o AWS Resource Cleaner em vez do AWS Nuke
-        result = subprocess.run(
-            [
-                sys.executable, AWS_CLEANER_PATH,
-                '--access-key', data['aws_access_key'],
-                '--secret-key', data['aws_secret_key'],
-                '--region', data['region']
-            ],
-            env=env,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            timeout=300  # 5 minutos timeout
+        # Executa o AWS Resource Cleaner no próprio processo; as credenciais ficam só em memória
+        job = jobs.create(
+            data['aws_access_key'],
+            data['aws_secret_key'],
+            region_argument(data),
+            dry_run=True
         )
+        if not job.wait(timeout=300):  # 5 minutos timeout
+            return jsonify({
+                'success': False,
+                'error': 'Timeout: Operação demorou mais que 5 minutos',
+                'job_id': job.id
+            }), 500
         
-        return jsonify({
-            'success': result.returncode == 0,
-            'output': result.stdout,
-            'error': result.stderr,
-            'return_code': result.returncode
-        })
+        return jsonify(sync_result(job))
         
-    except subprocess.TimeoutExpired:
-        return jsonify({'success': False, 'error': 'Timeout: Operação demorou mais que 5 minutos'}), 500
     except Exception as e:
         return jsonify({'success': False, 'error': f'Erro: {str(e)}'}), 500
 
@@ -124,42 +146,107 @@ def execute():
         if not is_valid:
             return jsonify({'success': False, 'error': error_msg}), 400
 
-        # Configura ambiente AWS
-        env = os.environ.copy()
-        env.update({
-            'AWS_ACCESS_KEY_ID': data['aws_access_key'],
-            'AWS_SECRET_ACCESS_KEY': data['aws_secret_key'],
-            'AWS_DEFAULT_REGION': data['region']
-        })
+        # Executa o AWS Resource Cleaner no próprio processo; as credenciais ficam só em memória
+        job = jobs.create(
+            data['aws_access_key'],
+            data['aws_secret_key'],
+            region_argument(data),
+            dry_run=False
+        )
+        if not job.wait(timeout=1800):  # 30 minutos timeout
+            return jsonify({
+                'success': False,
+                'error': 'Timeout: Operação demorou mais que 30 minutos',
+                'job_id': job.id
+            }), 500
+        
+        return jsonify(sync_result(job))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Erro: {str(e)}'}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    try:
+        data = request.json
+        dry_run = data.get('dry_run', True) is not False
         
-        # Usa o AWS Resource Cleaner em vez do AWS Nuke
-        result = subprocess.run(
-            [
-                sys.executable, AWS_CLEANER_PATH,
-                '--access-key', data['aws_access_key'],
-                '--secret-key', data['aws_secret_key'],
-                '--region', data['region'],
-                '--no-dry-run'
-            ],
-            env=env,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            timeout=1800  # 30 minutos timeout
+        # Validação
+        if not dry_run and not data.get('confirmed'):
+            return jsonify({
+                'success': False,
+                'error': 'Confirmação necessária para executar o nuke'
+            }), 400
+
+        is_valid, error_msg = validate_inputs(data)
+        if not is_valid:
+            return jsonify({'success': False, 'error': error_msg}), 400
+        
+        # Retorna o ID na hora; o progresso é acompanhado por /api/jobs/<id>/events
+        job = jobs.create(
+            data['aws_access_key'],
+            data['aws_secret_key'],
+            region_argument(data),
+            dry_run=dry_run
         )
         
-        return jsonify({
-            'success': result.returncode == 0,
-            'output': result.stdout,
-            'error': result.stderr,
-            'return_code': result.returncode
-        })
+        return jsonify({'success': True, **job.to_dict()}), 202
         
-    except subprocess.TimeoutExpired:
-        return jsonify({'success': False, 'error': 'Timeout: Operação demorou mais que 30 minutos'}), 500
     except Exception as e:
         return jsonify({'success': False, 'error': f'Erro: {str(e)}'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job não encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/output', methods=['GET'])
+def job_output(job_id):
+    """Página do output do job: ?offset=<primeira linha>&limit=<quantidade de linhas>"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job não encontrado'}), 404
+    
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', PAGE_LIMIT, type=int)
+    if offset < 0 or not 0 < limit <= MAX_PAGE_LIMIT:
+        return jsonify({
+            'success': False,
+            'error': f'offset deve ser >= 0 e limit entre 1 e {MAX_PAGE_LIMIT}'
+        }), 400
+    
+    lines = job.log.read(offset, limit)
+    return jsonify({
+        'success': True,
+        'offset': offset,
+        'lines': lines,
+        'next_offset': offset + len(lines),
+        'total': job.log.count,
+        'finished': job.finished
+    })
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream SSE com o output do job linha a linha e um evento 'done' no fim"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job não encontrado'}), 404
+    
+    # O EventSource reenvia o último ID recebido ao reconectar
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    return Response(
+        stream_with_context(sse_stream(job, last_event_id if last_event_id.isdigit() else None)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Chamadas à API da AWS de todas as execuções, no formato texto do Prometheus"""
+    return Response(runner.metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Verifica se tudo está funcionando"""
@@ -175,6 +262,7 @@ def health_check():
         return jsonify({
             'status': 'ok',
             'aws_cleaner_path': AWS_CLEANER_PATH,
+            'backend': 'in-process',
             'version': 'v1.0.0'
         })
         
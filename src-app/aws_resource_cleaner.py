@@ -5,13 +5,25 @@ Este script usa o AWS CLI para listar e excluir recursos em uma conta AWS
 """
 
 import boto3
-import botocore
 import argparse
 import sys
-import time
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from botocore.exceptions import ClientError
+from functools import partial
+
+from cleaner_common import (
+    ALL_REGIONS, DELETE_WORKERS, DRY_RUN, FILTERED, GLOBAL_REGION, BoundedPool, ClientPool, GroupedRunner,
+    RecordWriter, human_output_to_stderr, parse_regions, resolve_regions, thread_local_stdout
+)
+from api_metrics import ApiMetrics
+from checkpoint_journal import DEFAULT_JOURNAL_PATH, CheckpointJournal
+from completion_tracker import CHECKERS, DELETED, FAILED, CompletionTracker
+from deletion_scheduler import DeletionScheduler
+from inventory_cache import discover
+from rate_limiter import RETRY_CONFIG, AdaptiveRateLimiter
+from resource_filters import FilterConfigError, ResourceFilters, blocked, load_config
+from resource_handlers import parallel_tasks, select_handlers, unique
+from run_profiler import DELETION, DISCOVERY, FILTERING, OTHER, WAITING, PhaseTimer, StackSampler, write_profile
+from tagging_inventory import ENGINES, LIST, TAGGED_ONLY, TAGGING, UNTAGGED_WARNING, TaggingInventory
 
 # Configuração de logging
 logging.basicConfig(
@@ -21,420 +33,347 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sem --workers explícito, no máximo esta quantidade de tipos de recurso (de todas as regiões)
+# de uma onda é verificada em paralelo
+MAX_DEFAULT_WORKERS = DELETE_WORKERS
+
+# Região usada pela sessão quando --region é 'all'
+DEFAULT_REGION = 'us-east-1'
+
 class AWSResourceCleaner:
-    def __init__(self, access_key, secret_key, region, dry_run=True):
+    def __init__(self, access_key, secret_key, region, dry_run=True, workers=None, records=None, inventory_engine=LIST, config=None, services=None,
+                 journal_path=DEFAULT_JOURNAL_PATH, resume=False, metrics=None, timer=None):
         self.access_key = access_key
         self.secret_key = secret_key
-        self.region = region
         self.dry_run = dry_run
+        # Tempo de cada fase por tipo de recurso (--profile); desabilitado não mede nada
+        self.timer = timer or PhaseTimer(enabled=False)
+        # Só os tipos selecionados têm o módulo importado e clients criados
+        try:
+            self.handlers = select_handlers(services)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        regions = parse_regions(region)
         self.session = boto3.Session(
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
-            region_name=region
+            region_name=next((r for r in regions if r != ALL_REGIONS), DEFAULT_REGION)
         )
+        # Todos os clients da sessão passam pelo limitador de taxa por serviço
+        self.rate_limiter = AdaptiveRateLimiter().install(self.session)
+        # Chamadas, latência, retries e erros por operação (ApiMetrics)
+        self.metrics = (metrics or ApiMetrics()).install(self.session)
         self.account_id = self._get_account_id()
+        self.filters = self._load_filters(config)
+        self.regions = self._resolve_regions(regions)
+        self.region = self.regions[0]
+        self.workers = max(1, workers or MAX_DEFAULT_WORKERS)
+        # Cada tarefa em paralelo (e cada bucket esvaziado) pode ter DELETE_WORKERS chamadas em andamento
+        self.clients = ClientPool(
+            self.session, max_connections=parallel_tasks(self.handlers, self.workers) * DELETE_WORKERS, timer=self.timer
+        )
+        # Fora do dry-run, cada mudança de estado vai para o journal, para a execução poder ser retomada
+        self.resume = resume
+        self.journal = None if dry_run or not journal_path else CheckpointJournal(self.account_id, self.regions, journal_path)
+        # Com records (RecordWriter), cada recurso processado também vira um registro NDJSON
+        self.tracker = CompletionTracker(self.clients, listener=records.write if records else None, journal=self.journal)
+        self.inventory_engine = inventory_engine
+        # Inventário da Tagging API; sem ele (ou nos tipos que ele não cobre) cada serviço é listado
+        self.inventory = None
         
     def _get_account_id(self):
         """Obtém o ID da conta AWS"""
         try:
-            sts = self.session.client('sts')
+            sts = self.session.client('sts', config=RETRY_CONFIG)
             return sts.get_caller_identity()["Account"]
         except Exception as e:
             logger.error(f"Erro ao obter ID da conta: {e}")
             sys.exit(1)
+    
+    def _load_filters(self, config):
+        """Compila os filtros da conta no config (nuke-config.yml) e recusa contas bloqueadas"""
+        if not config:
+            return None
+        if blocked(config, self.account_id):
+            logger.error(f"A conta {self.account_id} está na account-blocklist do config")
+            sys.exit(1)
+        try:
+            return ResourceFilters.from_config(config, self.account_id)
+        except FilterConfigError as e:
+            logger.error(str(e))
+            sys.exit(1)
+    
+    def _resolve_regions(self, regions):
+        """Expande 'all' para as regiões habilitadas na conta"""
+        try:
+            return resolve_regions(self.session, regions) or [self.session.region_name]
+        except Exception as e:
+            logger.error(f"Erro ao listar regiões habilitadas: {e}")
+            sys.exit(1)
             
     def run(self):
         """Executa a limpeza de recursos"""
+        try:
+            self._run()
+        finally:
+            # Libera a execução para outra da mesma conta e regiões, mesmo se a limpeza falhar
+            if self.journal is not None:
+                self.journal.close()
+
+    def _run(self):
         print("=" * 60)
         print(f"{'🔍 DRY RUN MODE' if self.dry_run else '🚨 EXECUTION MODE'}")
         print(f"Account ID: {self.account_id}")
-        print(f"Region: {self.region}")
+        if len(self.regions) > 1:
+            print(f"Regions: {', '.join(self.regions)}")
+        else:
+            print(f"Region: {self.region}")
+        if self.inventory_engine in (TAGGING, TAGGED_ONLY):
+            tagging = TaggingInventory(self.clients, self.workers, complete=self.inventory_engine == TAGGED_ONLY)
+            with self.timer.phase(DISCOVERY):
+                self.inventory = tagging.collect(self.regions)
+            print(f"🏷️  Using inventory from the Tagging API ({tagging.calls} GetResources calls)")
+        if self.journal is not None and self.journal.open(self.resume):
+            self._resume()
         print("=" * 60)
         
-        # Lista de serviços para limpar
-        services = [
-            ("EC2 Resources", self.clean_ec2),
-            ("S3 Buckets", self.clean_s3),
-            ("RDS Instances", self.clean_rds),
-            ("Lambda Functions", self.clean_lambda),
-            ("CloudFormation Stacks", self.clean_cloudformation),
-            ("DynamoDB Tables", self.clean_dynamodb),
-            ("Elastic Beanstalk", self.clean_elasticbeanstalk),
-            ("IAM Users", self.clean_iam_users),
-            ("IAM Roles", self.clean_iam_roles),
-            ("IAM Policies", self.clean_iam_policies)
-        ]
+        # Executa os tipos de recurso em ondas, respeitando as dependências entre eles
+        scheduler = self._build_scheduler()
+        # Mais threads que a onda mais larga não adiantam
+        workers = min(self.workers, max(map(len, scheduler.waves()), default=1))
+        if workers > 1:
+            with thread_local_stdout() as output:
+                runner = GroupedRunner(output)
+                results = scheduler.run(workers, lambda func, key: runner.run(func, label=' '.join(key)))
+        else:
+            results = scheduler.run()
         
-        total_resources = 0
+        # Espera as exclusões assíncronas que nenhuma onda esperou (ex.: tabelas do DynamoDB)
+        if not self.dry_run:
+            with self.timer.phase(WAITING):
+                self.tracker.wait()
+        # A execução chegou ao fim: não há mais o que retomar
+        if self.journal is not None:
+            self.journal.finish()
         
-        # Executa a limpeza sequencialmente para melhor output
-        for service_name, service_func in services:
-            print(f"\n🔍 Checking {service_name}...")
-            try:
-                count = service_func()
-                total_resources += count if count else 0
-            except Exception as e:
-                print(f"❌ Error checking {service_name}: {str(e)}")
+        # Consolida o relatório por região
+        region_totals = {}
+        for (region, _), count in results.items():
+            region_totals[region] = region_totals.get(region, 0) + count
+        total_resources = sum(region_totals.values())
         
         print("\n" + "=" * 60)
         print(f"📊 SUMMARY:")
         print(f"Total resources found: {total_resources}")
+        if len(self.regions) > 1:
+            for region in self.regions + [GLOBAL_REGION]:
+                print(f"  🌎 {region}: {region_totals.get(region, 0)}")
+        print(self.metrics.describe())
+        if self.inventory_engine == TAGGED_ONLY:
+            print(UNTAGGED_WARNING)
+        if self.timer.enabled:
+            print(self.timer.describe())
+        throttles = self.rate_limiter.throttles()
+        if throttles:
+            print("⏳ Throttled requests (retried): " + ", ".join(
+                f"{service}={count}" for service, count in sorted(throttles.items())
+            ))
         if self.dry_run:
             print("🔍 This was a DRY RUN - no resources were actually deleted")
             print("💡 Use --no-dry-run flag to actually delete resources")
         else:
-            print("🚨 Resources have been deleted!")
+            self._print_completion()
         print("=" * 60)
     
-    def clean_ec2(self):
-        """Limpa recursos EC2"""
-        total_count = 0
-        try:
-            ec2 = self.session.resource('ec2')
-            
-            # Termina instâncias EC2
-            instances = list(ec2.instances.all())
-            if instances:
-                print(f"  📦 Found {len(instances)} EC2 instances")
-                total_count += len(instances)
-                for instance in instances:
-                    state = instance.state['Name']
-                    print(f"    {'🔍 Would terminate' if self.dry_run else '🗑️  Terminating'} EC2 instance: {instance.id} (state: {state})")
-                    if not self.dry_run and state != 'terminated':
-                        instance.terminate()
-            
-            # Exclui volumes EBS
-            volumes = list(ec2.volumes.all())
-            available_volumes = [v for v in volumes if v.state != 'in-use']
-            if available_volumes:
-                print(f"  💾 Found {len(available_volumes)} available EBS volumes")
-                total_count += len(available_volumes)
-                for volume in available_volumes:
-                    print(f"    {'🔍 Would delete' if self.dry_run else '🗑️  Deleting'} EBS volume: {volume.id}")
-                    if not self.dry_run:
-                        volume.delete()
-            
-            # Exclui snapshots
-            snapshots = list(ec2.snapshots.filter(OwnerIds=[self.account_id]))
-            if snapshots:
-                print(f"  📸 Found {len(snapshots)} EBS snapshots")
-                total_count += len(snapshots)
-                for snapshot in snapshots:
-                    print(f"    {'🔍 Would delete' if self.dry_run else '🗑️  Deleting'} snapshot: {snapshot.id}")
-                    if not self.dry_run:
-                        snapshot.delete()
-            
-            # Exclui security groups (exceto o default)
-            security_groups = [sg for sg in ec2.security_groups.all() if sg.group_name != 'default']
-            if security_groups:
-                print(f"  🔒 Found {len(security_groups)} security groups")
-                total_count += len(security_groups)
-                for sg in security_groups:
-                    print(f"    {'🔍 Would delete' if self.dry_run else '🗑️  Deleting'} security group: {sg.id} ({sg.group_name})")
-                    if not self.dry_run:
-                        try:
-                            sg.delete()
-                        except ClientError as e:
-                            if 'DependencyViolation' in str(e):
-                                print(f"    ⚠️  Cannot delete security group {sg.id} due to dependencies")
-                            else:
-                                raise
-                                
-        except Exception as e:
-            print(f"  ❌ Error cleaning EC2 resources: {e}")
-        
-        return total_count
+    def _resume(self):
+        """Parte do estado da execução interrompida: revalida o que ela listou e volta a acompanhar o que estava em andamento"""
+        summary = self.journal.summary()
+        print("♻️  Resuming interrupted run: " + ", ".join(f"{status}={count}" for status, count in sorted(summary.items())))
+        self.inventory = self.journal.inventory()
+        selected = {handler.resource_type for handler in self.handlers}
+        for resource_type, region, resource_id, state in self.journal.in_flight():
+            if resource_type in selected and resource_type in CHECKERS:
+                self.tracker.track(resource_type, region, resource_id, state)
     
-    def clean_s3(self):
-        """Limpa buckets S3"""
-        total_count = 0
+    def _print_completion(self):
+        """Mostra o estado final de cada exclusão"""
+        statuses = self.tracker.statuses()
+        protected = sum(1 for status in statuses.values() if status == FILTERED)
+        not_deleted = sorted(
+            (key, status) for key, status in statuses.items() if status not in (DELETED, FILTERED)
+        )
+        print(f"✅ Deleted: {len(statuses) - len(not_deleted) - protected}")
+        if protected:
+            print(f"🛡️  Protected by filters: {protected}")
+        if not not_deleted:
+            print("🚨 Resources have been deleted!")
+            return
+        print(f"⚠️  Not deleted: {len(not_deleted)}")
+        for (resource_type, region, resource_id), status in not_deleted:
+            print(f"  ❌ {resource_type} {resource_id} [{region}]: {status}")
+    
+    def _build_scheduler(self):
+        """Monta o grafo de exclusões: um nó por (região, tipo) e os tipos globais uma única vez"""
+        handlers = {handler.resource_type: handler for handler in self.handlers}
+        scheduler = DeletionScheduler()
+        for handler in self.handlers:
+            # Dependências de tipos fora da seleção são ignoradas
+            dependencies = [handlers[name] for name in handler.depends_on if name in handlers]
+            for region in [GLOBAL_REGION] if handler.is_global else self.regions:
+                depends_on = []
+                for dependency in dependencies:
+                    if dependency.is_global:
+                        depends_on.append((GLOBAL_REGION, dependency.resource_type))
+                    elif handler.is_global:
+                        # Tipos globais esperam o tipo regional em todas as regiões
+                        depends_on.extend((r, dependency.resource_type) for r in self.regions)
+                    else:
+                        depends_on.append((region, dependency.resource_type))
+                scheduler.add((region, handler.resource_type), partial(self._check_service, handler, region), depends_on)
+        return scheduler
+    
+    def _check_service(self, handler, region):
+        """Executa a limpeza de um tipo de recurso e retorna a quantidade de recursos encontrados"""
+        label = f"{handler.title} [{region}]" if len(self.regions) > 1 else handler.title
+        print(f"\n🔍 Checking {label}...")
         try:
-            s3 = self.session.resource('s3')
-            buckets = list(s3.buckets.all())
-            
-            if buckets:
-                print(f"  🪣 Found {len(buckets)} S3 buckets")
-                total_count += len(buckets)
-                for bucket in buckets:
-                    print(f"    {'🔍 Would delete' if self.dry_run else '🗑️  Deleting'} S3 bucket: {bucket.name}")
-                    if not self.dry_run:
-                        try:
-                            # Primeiro exclui todos os objetos
-                            bucket.objects.all().delete()
-                            # Depois exclui o bucket
-                            bucket.delete()
-                        except ClientError as e:
-                            print(f"    ❌ Error deleting bucket {bucket.name}: {e}")
+            with self.timer.scope(handler.resource_type, region), self.timer.phase(OTHER):
+                return self.clean(handler, region)
         except Exception as e:
-            print(f"  ❌ Error cleaning S3 buckets: {e}")
-        
-        return total_count
+            print(f"❌ Error checking {label}: {str(e)}")
+            return 0
     
-    def clean_rds(self):
-        """Limpa instâncias RDS"""
+    def clean(self, handler, region):
+        """Lista os recursos do tipo e exclui em lotes de handler.batch_size, com até handler.concurrency lotes em paralelo"""
+        lister, deleter = handler.load()
+        resource_type = handler.resource_type
         total_count = 0
-        try:
-            rds = self.session.client('rds')
-            
-            # Lista instâncias RDS
-            response = rds.describe_db_instances()
-            instances = response.get('DBInstances', [])
-            
-            if instances:
-                print(f"  🗄️  Found {len(instances)} RDS instances")
-                total_count += len(instances)
-                for instance in instances:
-                    instance_id = instance['DBInstanceIdentifier']
-                    status = instance['DBInstanceStatus']
-                    print(f"    {'🔍 Would delete' if self.dry_run else '🗑️  Deleting'} RDS instance: {instance_id} (status: {status})")
-                    if not self.dry_run:
-                        try:
-                            rds.delete_db_instance(
-                                DBInstanceIdentifier=instance_id,
-                                SkipFinalSnapshot=True,
-                                DeleteAutomatedBackups=True
-                            )
-                        except ClientError as e:
-                            print(f"    ❌ Error deleting RDS instance {instance_id}: {e}")
-        except Exception as e:
-            print(f"  ❌ Error cleaning RDS instances: {e}")
+        batch = []
+        batches = []
+        resources = unique(self.timer.timed(lister(self, region), DISCOVERY))
+        if self.journal is not None:
+            resources = self.journal.listing(region, resource_type, resources, lambda resource: resource.id)
+        deleter = self.timer.scoped(deleter, resource_type, region)
+        with BoundedPool(handler.concurrency) as pool:
+            for resource in resources:
+                with self.timer.phase(FILTERING):
+                    protected = self._protected(resource_type, region, resource.id, resource.filter_properties(), resource.tags)
+                if protected:
+                    continue
+                total_count += 1
+                print(f"    {'🔍 Would ' + handler.action if self.dry_run else '🗑️  ' + handler.action_ing.capitalize()} {handler.noun}: {resource.id}{resource.describe()}")
+                if self.dry_run:
+                    self.tracker.record(resource_type, region, resource.id, DRY_RUN, state=resource.state)
+                    continue
+                batch.append(resource)
+                if handler.batch_size is not None and len(batch) >= handler.batch_size:
+                    # submit bloqueia enquanto o pool está cheio
+                    with self.timer.phase(DELETION):
+                        pool.submit(len(batches), deleter, self, region, batch)
+                    batches.append(batch)
+                    batch = []
+            if total_count:
+                print(f"  {handler.icon} Found {total_count} {handler.title}")
+            with self.timer.phase(DELETION):
+                if batch:
+                    pool.submit(len(batches), deleter, self, region, batch)
+                    batches.append(batch)
+                pool.drain()
+        
+        # Um lote que levantou exceção falhou inteiro; os demais retornam só os que falharam
+        errors = []
+        for index, error in pool.errors:
+            errors += [(resource.id, error) for resource in batches[index]]
+        failed = set()
+        for index, batch_errors in pool.results.items():
+            errors += batch_errors or []
+        for resource_id, error in errors:
+            failed.add(resource_id)
+            self.tracker.record(resource_type, region, resource_id, FAILED)
+            print(f"    ❌ Error {handler.action_ing} {handler.noun} {resource_id}: {error}")
+        if not handler.tracks:
+            for index in pool.succeeded:
+                for resource in batches[index]:
+                    if resource.id not in failed:
+                        self.tracker.record(resource_type, region, resource.id, DELETED, duration=pool.durations.get(index))
         
+        # Espera as exclusões acompanhadas antes de liberar as próximas ondas
+        if handler.waits and not self.dry_run:
+            with self.timer.phase(WAITING):
+                self.tracker.wait(resource_type, region)
         return total_count
     
-    def clean_lambda(self):
-        total_count = 0
-        """Limpa funções Lambda"""
-        try:
-            lambda_client = self.session.client('lambda')
-            
-            # Lista funções Lambda
-            response = lambda_client.list_functions()
-            functions = response.get('Functions', [])
-            
-            if functions:
-                logger.info(f"Encontradas {len(functions)} funções Lambda")
-                for function in functions:
-                    function_name = function['FunctionName']
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} função Lambda: {function_name}")
-                    if not self.dry_run:
-                        try:
-                            lambda_client.delete_function(FunctionName=function_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir função Lambda {function_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar funções Lambda: {e}")
-    
-    def clean_cloudformation(self):
-        """Limpa stacks do CloudFormation"""
-        try:
-            cf = self.session.client('cloudformation')
-            
-            # Lista stacks do CloudFormation
-            response = cf.list_stacks(
-                StackStatusFilter=[
-                    'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'ROLLBACK_COMPLETE',
-                    'UPDATE_ROLLBACK_COMPLETE'
-                ]
-            )
-            stacks = response.get('StackSummaries', [])
-            
-            if stacks:
-                logger.info(f"Encontradas {len(stacks)} stacks do CloudFormation")
-                for stack in stacks:
-                    stack_name = stack['StackName']
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} stack do CloudFormation: {stack_name}")
-                    if not self.dry_run:
-                        try:
-                            cf.delete_stack(StackName=stack_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir stack {stack_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar stacks do CloudFormation: {e}")
-    
-    def clean_dynamodb(self):
-        """Limpa tabelas do DynamoDB"""
-        try:
-            dynamodb = self.session.client('dynamodb')
-            
-            # Lista tabelas do DynamoDB
-            response = dynamodb.list_tables()
-            tables = response.get('TableNames', [])
-            
-            if tables:
-                logger.info(f"Encontradas {len(tables)} tabelas do DynamoDB")
-                for table_name in tables:
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} tabela do DynamoDB: {table_name}")
-                    if not self.dry_run:
-                        try:
-                            dynamodb.delete_table(TableName=table_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir tabela {table_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar tabelas do DynamoDB: {e}")
-    
-    def clean_elasticbeanstalk(self):
-        """Limpa ambientes do Elastic Beanstalk"""
-        try:
-            eb = self.session.client('elasticbeanstalk')
-            
-            # Lista ambientes do Elastic Beanstalk
-            response = eb.describe_environments()
-            environments = response.get('Environments', [])
-            
-            if environments:
-                logger.info(f"Encontrados {len(environments)} ambientes do Elastic Beanstalk")
-                for env in environments:
-                    env_name = env['EnvironmentName']
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} ambiente do Elastic Beanstalk: {env_name}")
-                    if not self.dry_run:
-                        try:
-                            eb.terminate_environment(EnvironmentName=env_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir ambiente {env_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar ambientes do Elastic Beanstalk: {e}")
-    
-    def clean_iam_users(self):
-        """Limpa usuários IAM (exceto o usuário atual)"""
-        try:
-            iam = self.session.client('iam')
-            
-            # Obtém o usuário atual
-            try:
-                current_user = iam.get_user()['User']['UserName']
-            except:
-                current_user = None
-            
-            # Lista usuários IAM
-            response = iam.list_users()
-            users = response.get('Users', [])
-            
-            if users:
-                logger.info(f"Encontrados {len(users)} usuários IAM")
-                for user in users:
-                    user_name = user['UserName']
-                    if user_name == current_user:
-                        logger.info(f"Ignorando usuário atual: {user_name}")
-                        continue
-                    
-                    # Remove access keys
-                    keys_response = iam.list_access_keys(UserName=user_name)
-                    for key in keys_response.get('AccessKeyMetadata', []):
-                        key_id = key['AccessKeyId']
-                        logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} access key {key_id} do usuário {user_name}")
-                        if not self.dry_run:
-                            iam.delete_access_key(UserName=user_name, AccessKeyId=key_id)
-                    
-                    # Remove políticas anexadas
-                    policies_response = iam.list_attached_user_policies(UserName=user_name)
-                    for policy in policies_response.get('AttachedPolicies', []):
-                        policy_arn = policy['PolicyArn']
-                        logger.info(f"{'Simulando desanexação' if self.dry_run else 'Desanexando'} política {policy_arn} do usuário {user_name}")
-                        if not self.dry_run:
-                            iam.detach_user_policy(UserName=user_name, PolicyArn=policy_arn)
-                    
-                    # Exclui o usuário
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} usuário IAM: {user_name}")
-                    if not self.dry_run:
-                        try:
-                            iam.delete_user(UserName=user_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir usuário {user_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar usuários IAM: {e}")
-    
-    def clean_iam_roles(self):
-        """Limpa roles IAM (exceto roles essenciais)"""
-        try:
-            iam = self.session.client('iam')
-            
-            # Lista roles IAM
-            response = iam.list_roles()
-            roles = response.get('Roles', [])
-            
-            # Roles essenciais que não devem ser excluídas
-            essential_roles = ['OrganizationAccountAccessRole', 'AWSServiceRoleFor']
-            
-            if roles:
-                logger.info(f"Encontrados {len(roles)} roles IAM")
-                for role in roles:
-                    role_name = role['RoleName']
-                    
-                    # Verifica se é uma role essencial
-                    if any(essential in role_name for essential in essential_roles):
-                        logger.info(f"Ignorando role essencial: {role_name}")
-                        continue
-                    
-                    # Remove políticas anexadas
-                    policies_response = iam.list_attached_role_policies(RoleName=role_name)
-                    for policy in policies_response.get('AttachedPolicies', []):
-                        policy_arn = policy['PolicyArn']
-                        logger.info(f"{'Simulando desanexação' if self.dry_run else 'Desanexando'} política {policy_arn} da role {role_name}")
-                        if not self.dry_run:
-                            iam.detach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
-                    
-                    # Exclui a role
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} role IAM: {role_name}")
-                    if not self.dry_run:
-                        try:
-                            iam.delete_role(RoleName=role_name)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir role {role_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar roles IAM: {e}")
+    def discover(self, region, resource_type, list_all, recheck):
+        """Lista os recursos do tipo, ou só consulta os IDs do inventário da Tagging API quando há um"""
+        return discover(region, resource_type, list_all, recheck, None, cached=self.inventory)
     
-    def clean_iam_policies(self):
-        """Limpa políticas IAM personalizadas"""
-        try:
-            iam = self.session.client('iam')
-            
-            # Lista políticas IAM personalizadas
-            response = iam.list_policies(Scope='Local')
-            policies = response.get('Policies', [])
-            
-            if policies:
-                logger.info(f"Encontradas {len(policies)} políticas IAM personalizadas")
-                for policy in policies:
-                    policy_arn = policy['Arn']
-                    policy_name = policy['PolicyName']
-                    
-                    # Exclui a política
-                    logger.info(f"{'Simulando exclusão' if self.dry_run else 'Excluindo'} política IAM: {policy_name}")
-                    if not self.dry_run:
-                        try:
-                            # Primeiro, exclui todas as versões não padrão
-                            versions_response = iam.list_policy_versions(PolicyArn=policy_arn)
-                            for version in versions_response.get('Versions', []):
-                                if not version['IsDefaultVersion']:
-                                    iam.delete_policy_version(
-                                        PolicyArn=policy_arn,
-                                        VersionId=version['VersionId']
-                                    )
-                            
-                            # Depois, exclui a política
-                            iam.delete_policy(PolicyArn=policy_arn)
-                        except ClientError as e:
-                            logger.error(f"Erro ao excluir política {policy_name}: {e}")
-        except Exception as e:
-            logger.error(f"Erro ao limpar políticas IAM: {e}")
+    def _protected(self, resource_type, region, resource_id, properties=None, tags=None):
+        """Registra e retorna True se um filtro do config protege o recurso"""
+        if self.filters is None:
+            return False
+        rule = self.filters.protected(resource_type, resource_id, properties, tags)
+        if rule is None:
+            return False
+        print(f"    🛡️  Skipping {resource_type} {resource_id}: protected by filter ({rule})")
+        self.tracker.record(resource_type, region, resource_id, FILTERED)
+        return True
 
 def main():
     parser = argparse.ArgumentParser(description='AWS Resource Cleaner - Uma alternativa ao AWS Nuke')
     parser.add_argument('--access-key', required=True, help='AWS Access Key ID')
     parser.add_argument('--secret-key', required=True, help='AWS Secret Access Key')
-    parser.add_argument('--region', required=True, help='AWS Region')
+    parser.add_argument('--region', required=True, help="AWS Region (lista separada por vírgulas ou 'all' para todas as regiões habilitadas)")
     parser.add_argument('--no-dry-run', action='store_true', help='Execute a exclusão real (sem isso, apenas simula)')
+    parser.add_argument('--workers', type=int, help='Quantidade de tipos de recurso verificados em paralelo dentro de cada onda (padrão: 10)')
+    parser.add_argument('--output', choices=['text', 'ndjson'], default='text', help='Formato da saída: texto ou um registro JSON por recurso em stdout (o texto vai para stderr)')
+    parser.add_argument('--services', help='Tipos de recurso a limpar, separados por vírgulas (ex.: EC2Instance,S3Bucket; padrão: todos)')
+    parser.add_argument('--config', help='nuke-config.yml com account-blocklist e filtros de recursos protegidos')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_PATH, help='Arquivo SQLite do journal de checkpoint da execução')
+    parser.add_argument('--resume', action='store_true', help='Retoma a execução interrompida registrada no journal')
+    parser.add_argument('--profile', metavar='PATH', help='Grava em PATH (JSON) o tempo de cada fase (clients, descoberta, filtros, exclusão, espera) por tipo de recurso')
+    parser.add_argument('--profile-stacks', metavar='PATH', help='Amostra as pilhas de todas as threads e grava em PATH no formato folded (flamegraph.pl, speedscope)')
+    parser.add_argument('--inventory', choices=ENGINES, default=LIST, help='Descoberta dos recursos: listar cada serviço, tratar primeiro os recursos com tags da Tagging API e depois listar, ou só a Tagging API (tagged-only: não encontra recursos sem tags; IAM, S3 e Elastic Beanstalk são sempre listados)')
     
     args = parser.parse_args()
     
+    if args.output == 'ndjson':
+        records = RecordWriter(sys.stdout)
+        with human_output_to_stderr():
+            run_cleaner(args, records)
+    else:
+        run_cleaner(args)
+
+def parse_services(value):
+    """Lista de tipos de recurso de --services (None para todos)"""
+    return [name.strip() for name in value.split(',') if name.strip()] if value else None
+
+def run_cleaner(args, records=None):
+    timer = PhaseTimer(enabled=bool(args.profile or args.profile_stacks))
+    sampler = StackSampler().start() if args.profile_stacks else None
     cleaner = AWSResourceCleaner(
         access_key=args.access_key,
         secret_key=args.secret_key,
         region=args.region,
-        dry_run=not args.no_dry_run
+        dry_run=not args.no_dry_run,
+        workers=args.workers,
+        records=records,
+        inventory_engine=args.inventory,
+        config=load_config(args.config) if args.config else None,
+        services=parse_services(args.services),
+        journal_path=args.journal,
+        resume=args.resume,
+        timer=timer
     )
     
-    cleaner.run()
+    try:
+        cleaner.run()
+    finally:
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(args.profile_stacks)
+        if args.profile:
+            write_profile(args.profile, timer, cleaner.metrics, sampler)
 
 if __name__ == '__main__':
     main()
@@ -7,207 +7,347 @@ Este script usa o AWS CLI para listar e excluir recursos em uma conta AWS
 import boto3
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
-    parser = argparse.ArgumentParser(description='AWS Resource Cleaner - Uma alternativa ao AWS Nuke')
-    parser.add_argument('--access-key', required=True, help='AWS Access Key ID')
-    parser.add_argument('--secret-key', required=True, help='AWS Secret Access Key')
-    parser.add_argument('--region', required=True, help='AWS Region')
-    parser.add_argument('--no-dry-run', action='store_true', help='Execute a exclusão real (sem isso, apenas simula)')
-    
-    args = parser.parse_args()
-    
-    dry_run = not args.no_dry_run
+from cleaner_common import (
+    ALL_REGIONS, DELETE_WORKERS, DRY_RUN, FILTERED, GLOBAL_REGION, BoundedPool, ClientPool, GroupedRunner,
+    RecordWriter, human_output_to_stderr, parse_regions, resolve_regions, thread_local_stdout
+)
+from api_metrics import ApiMetrics
+from checkpoint_journal import DEFAULT_JOURNAL_PATH, CheckpointJournal
+from completion_tracker import CHECKERS, DELETED, FAILED, TIMED_OUT, CompletionTracker
+from inventory_cache import Inventory, discover
+from rate_limiter import RETRY_CONFIG, AdaptiveRateLimiter
+from resource_filters import FilterConfigError, ResourceFilters, blocked, load_config
+from resource_handlers import parallel_tasks, select_handlers, unique
+from tagging_inventory import ENGINES, LIST, TAGGED_ONLY, TAGGING, UNTAGGED_WARNING, TaggingInventory
+
+# No máximo esta quantidade de regiões é varrida em paralelo
+MAX_WORKERS = 10
+
+# Tipos verificados quando services não é informado; os demais tipos do registro
+# (IAM, AMIs, snapshots, Elastic Beanstalk) só são limpos quando pedidos
+DEFAULT_SERVICES = [
+    'CloudFormationStack', 'EC2Instance', 'EBSVolume', 'RDSInstance', 'LambdaFunction', 'DynamoDBTable',
+    'SecurityGroup', 'S3Bucket',
+]
+
+class SimpleCleaner:
+    """Uma execução do cleaner simples, no formato que os handlers do registro esperam
+
+    Os listers e deleters de resource_handlers recebem este objeto e usam
+    clients, tracker, account_id e discover. Os tipos de uma região são
+    verificados um de cada vez, na ordem do registro (que respeita as
+    dependências entre eles). Os recursos listados vão para inventory; com um
+    inventário em cache (cached), os IDs dele são apenas revalidados. Com
+    journal (CheckpointJournal), os recursos listados são gravados e os já
+    tratados por uma execução interrompida são pulados. Os recursos protegidos
+    pelos filtros (ResourceFilters) não são excluídos.
+    """
+
+    def __init__(self, clients, tracker, account_id, dry_run, inventory, cached=None, filters=None, journal=None):
+        self.clients = clients
+        self.tracker = tracker
+        self.account_id = account_id
+        self.dry_run = dry_run
+        self.inventory = inventory
+        self.cached = cached
+        self.filters = filters
+        self.journal = journal
+
+    def discover(self, region, resource_type, list_all, recheck):
+        """Lista os recursos do tipo, ou só revalida os IDs do inventário em cache quando há um"""
+        return discover(region, resource_type, list_all, recheck, None, cached=self.cached)
+
+    def check_services(self, handlers, region, show_region=False):
+        """Verifica os tipos em ordem e retorna a quantidade de recursos encontrados"""
+        return sum(self.check(handler, region, show_region) for handler in handlers)
+
+    def check(self, handler, region, show_region=False):
+        label = f"{handler.title} [{region}]" if show_region else handler.title
+        print(f"\n🔍 Checking {label}...")
+        try:
+            return self.clean(handler, region)
+        except Exception as e:
+            print(f"  ❌ Error checking {label}: {e}")
+            return 0
+
+    def clean(self, handler, region):
+        """Lista os recursos do tipo e exclui em lotes de handler.batch_size, com até handler.concurrency lotes em paralelo"""
+        lister, deleter = handler.load()
+        resource_type = handler.resource_type
+        count = 0
+        batch = []
+        batches = []
+        resources = unique(lister(self, region))
+        if self.journal is not None:
+            resources = self.journal.listing(region, resource_type, resources, lambda resource: resource.id)
+        with BoundedPool(handler.concurrency) as pool:
+            for resource in resources:
+                self.inventory.add(region, resource_type, resource.id)
+                if self._protected(resource_type, region, resource):
+                    continue
+                count += 1
+                print(f"    {'🔍 Would ' + handler.action if self.dry_run else '🗑️  ' + handler.action_ing.capitalize()} {handler.noun}: {resource.id}{resource.describe()}")
+                if self.dry_run:
+                    self.tracker.record(resource_type, region, resource.id, DRY_RUN, state=resource.state)
+                    continue
+                batch.append(resource)
+                if handler.batch_size is not None and len(batch) >= handler.batch_size:
+                    pool.submit(len(batches), deleter, self, region, batch)
+                    batches.append(batch)
+                    batch = []
+            # A listagem terminou sem erro: o dry-run pode guardar o tipo no inventário
+            self.inventory.complete(region, resource_type)
+            if count:
+                print(f"  {handler.icon} Found {count} {handler.title}")
+            if batch:
+                pool.submit(len(batches), deleter, self, region, batch)
+                batches.append(batch)
+
+        # Um lote que levantou exceção falhou inteiro; os demais retornam só os que falharam
+        errors = []
+        for index, error in pool.errors:
+            errors += [(resource.id, error) for resource in batches[index]]
+        for index, batch_errors in pool.results.items():
+            errors += batch_errors or []
+        failed = set()
+        for resource_id, error in errors:
+            failed.add(resource_id)
+            self.tracker.record(resource_type, region, resource_id, FAILED)
+            print(f"    ❌ Error {handler.action_ing} {handler.noun} {resource_id}: {error}")
+        if not handler.tracks:
+            for index in pool.succeeded:
+                for resource in batches[index]:
+                    if resource.id not in failed:
+                        self.tracker.record(resource_type, region, resource.id, DELETED, duration=pool.durations.get(index))
+
+        # Os tipos seguintes podem depender destas exclusões (ex.: security groups das instâncias)
+        if handler.waits and not self.dry_run:
+            self.tracker.wait(resource_type, region)
+        return count
+
+    def _protected(self, resource_type, region, resource):
+        """True se um filtro do config protege o recurso, que então só é registrado"""
+        if self.filters is None:
+            return False
+        rule = self.filters.protected(resource_type, resource.id, resource.filter_properties(), resource.tags)
+        if rule is None:
+            return False
+        print(f"    🛡️  Skipping {resource_type} {resource.id}: protected by filter ({rule})")
+        self.tracker.record(resource_type, region, resource.id, FILTERED)
+        return True
+
+def run_cleaner(access_key, secret_key, region, dry_run=True, inventory_cache=None, records=None, inventory_engine=LIST, config=None, services=None,
+                journal_path=None, resume=False, metrics=None):
+    """Executa a limpeza e retorna o código de saída (0 em caso de sucesso)
+
+    Pode ser chamada como biblioteca: as credenciais ficam apenas na sessão boto3
+    em memória, sem passar por variáveis de ambiente ou linha de comando. Com um
+    InventoryCache, o dry-run guarda os IDs encontrados e a execução seguinte da
+    mesma conta e regiões parte deles em vez de listar a conta de novo. Com
+    inventory_engine='tagging', os recursos com tags da Tagging API são tratados antes
+    da listagem; com 'tagged-only', só eles são tratados. O config
+    (nuke-config.yml já carregado) bloqueia contas e protege recursos por filtros.
+    services escolhe os tipos de recurso do registro (padrão: DEFAULT_SERVICES). Fora do
+    dry-run, com journal_path, o estado de cada recurso é gravado em um
+    CheckpointJournal; com resume, uma execução interrompida é retomada de onde parou.
+    As chamadas à API da sessão são registradas em metrics (ApiMetrics), se informado.
+    """
+    regions = parse_regions(region)
+    try:
+        handlers = select_handlers(services or DEFAULT_SERVICES)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    services = {handler.resource_type for handler in handlers}
+    regional = [handler for handler in handlers if not handler.is_global]
+    global_handlers = [handler for handler in handlers if handler.is_global]
     
     # Configurar sessão AWS
     session = boto3.Session(
-        aws_access_key_id=args.access_key,
-        aws_secret_access_key=args.secret_key,
-        region_name=args.region
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=next((r for r in regions if r != ALL_REGIONS), 'us-east-1')
     )
+    AdaptiveRateLimiter().install(session)
+    metrics = (metrics or ApiMetrics()).install(session)
     
     # Obter ID da conta
     try:
-        sts = session.client('sts')
+        sts = session.client('sts', config=RETRY_CONFIG)
         account_id = sts.get_caller_identity()["Account"]
     except Exception as e:
         print(f"❌ Erro ao obter ID da conta: {e}")
-        sys.exit(1)
-    
-    print("=" * 60)
-    print(f"{'🔍 DRY RUN MODE' if dry_run else '🚨 EXECUTION MODE'}")
-    print(f"Account ID: {account_id}")
-    print(f"Region: {args.region}")
-    print("=" * 60)
+        return 1
     
-    total_resources = 0
+    filters = None
+    if config:
+        if blocked(config, account_id):
+            print(f"❌ A conta {account_id} está na account-blocklist do config")
+            return 1
+        try:
+            filters = ResourceFilters.from_config(config, account_id)
+        except FilterConfigError as e:
+            print(f"❌ {e}")
+            return 1
     
-    # EC2 Resources
-    print(f"\n🔍 Checking EC2 Resources...")
+    # Expandir 'all' para as regiões habilitadas
     try:
-        ec2 = session.resource('ec2')
-        
-        # Instâncias EC2
-        instances = list(ec2.instances.all())
-        if instances:
-            print(f"  📦 Found {len(instances)} EC2 instances")
-            total_resources += len(instances)
-            for instance in instances:
-                state = instance.state['Name']
-                print(f"    {'🔍 Would terminate' if dry_run else '🗑️  Terminating'} EC2 instance: {instance.id} (state: {state})")
-                if not dry_run and state not in ['terminated', 'terminating']:
-                    instance.terminate()
-        
-        # Volumes EBS
-        volumes = [v for v in ec2.volumes.all() if v.state == 'available']
-        if volumes:
-            print(f"  💾 Found {len(volumes)} available EBS volumes")
-            total_resources += len(volumes)
-            for volume in volumes:
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} EBS volume: {volume.id}")
-                if not dry_run:
-                    volume.delete()
-        
-        # Security Groups
-        security_groups = [sg for sg in ec2.security_groups.all() if sg.group_name != 'default']
-        if security_groups:
-            print(f"  🔒 Found {len(security_groups)} security groups")
-            total_resources += len(security_groups)
-            for sg in security_groups:
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} security group: {sg.id} ({sg.group_name})")
-                if not dry_run:
-                    try:
-                        sg.delete()
-                    except Exception as e:
-                        print(f"    ⚠️  Cannot delete security group {sg.id}: {str(e)}")
-                        
+        regions = resolve_regions(session, regions) or [session.region_name]
     except Exception as e:
-        print(f"  ❌ Error checking EC2 resources: {e}")
+        print(f"❌ Erro ao listar regiões habilitadas: {e}")
+        return 1
     
-    # S3 Buckets
-    print(f"\n🔍 Checking S3 Buckets...")
-    try:
-        s3 = session.resource('s3')
-        buckets = list(s3.buckets.all())
-        
-        if buckets:
-            print(f"  🪣 Found {len(buckets)} S3 buckets")
-            total_resources += len(buckets)
-            for bucket in buckets:
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} S3 bucket: {bucket.name}")
-                if not dry_run:
-                    try:
-                        # Primeiro exclui todos os objetos
-                        bucket.objects.all().delete()
-                        # Depois exclui o bucket
-                        bucket.delete()
-                    except Exception as e:
-                        print(f"    ❌ Error deleting bucket {bucket.name}: {e}")
-    except Exception as e:
-        print(f"  ❌ Error checking S3 buckets: {e}")
+    # Clients compartilhados: as regiões são varridas em paralelo e os buckets S3 esvaziados em paralelo
+    workers = min(len(regions), MAX_WORKERS)
+    clients = ClientPool(session, max_connections=parallel_tasks(handlers, workers) * DELETE_WORKERS)
     
-    # RDS Instances
-    print(f"\n🔍 Checking RDS Instances...")
-    try:
-        rds = session.client('rds')
-        response = rds.describe_db_instances()
-        instances = response.get('DBInstances', [])
-        
-        if instances:
-            print(f"  🗄️  Found {len(instances)} RDS instances")
-            total_resources += len(instances)
-            for instance in instances:
-                instance_id = instance['DBInstanceIdentifier']
-                status = instance['DBInstanceStatus']
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} RDS instance: {instance_id} (status: {status})")
-                if not dry_run:
-                    try:
-                        rds.delete_db_instance(
-                            DBInstanceIdentifier=instance_id,
-                            SkipFinalSnapshot=True,
-                            DeleteAutomatedBackups=True
-                        )
-                    except Exception as e:
-                        print(f"    ❌ Error deleting RDS instance {instance_id}: {e}")
-    except Exception as e:
-        print(f"  ❌ Error checking RDS instances: {e}")
+    inventory = Inventory()
+    cached = None
+    if inventory_cache is not None and not dry_run:
+        cached = inventory_cache.get(account_id, regions)
+    tagging = None
+    if cached is None and inventory_engine in (TAGGING, TAGGED_ONLY):
+        tagging = TaggingInventory(clients, complete=inventory_engine == TAGGED_ONLY)
+        cached = tagging.collect(regions)
     
-    # Lambda Functions
-    print(f"\n🔍 Checking Lambda Functions...")
+    journal = None
+    resumed = False
+    if journal_path and not dry_run:
+        journal = CheckpointJournal(account_id, regions, journal_path)
+    # O journal é fechado (liberando a execução para outro job da mesma conta) mesmo se a limpeza falhar
     try:
-        lambda_client = session.client('lambda')
-        response = lambda_client.list_functions()
-        functions = response.get('Functions', [])
-        
-        if functions:
-            print(f"  ⚡ Found {len(functions)} Lambda functions")
-            total_resources += len(functions)
-            for function in functions:
-                function_name = function['FunctionName']
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} Lambda function: {function_name}")
-                if not dry_run:
-                    try:
-                        lambda_client.delete_function(FunctionName=function_name)
-                    except Exception as e:
-                        print(f"    ❌ Error deleting Lambda function {function_name}: {e}")
-    except Exception as e:
-        print(f"  ❌ Error checking Lambda functions: {e}")
+        if journal is not None:
+            resumed = journal.open(resume)
+            if resumed:
+                # Os IDs listados pela execução interrompida valem mais que qualquer outro inventário
+                cached = journal.inventory()
+        # Estado de cada recurso, com as exclusões assíncronas acompanhadas até o fim
+        tracker = CompletionTracker(clients, listener=records.write if records else None, journal=journal)
     
-    # DynamoDB Tables
-    print(f"\n🔍 Checking DynamoDB Tables...")
-    try:
-        dynamodb = session.client('dynamodb')
-        response = dynamodb.list_tables()
-        tables = response.get('TableNames', [])
-        
-        if tables:
-            print(f"  🗃️  Found {len(tables)} DynamoDB tables")
-            total_resources += len(tables)
-            for table_name in tables:
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} DynamoDB table: {table_name}")
-                if not dry_run:
-                    try:
-                        dynamodb.delete_table(TableName=table_name)
-                    except Exception as e:
-                        print(f"    ❌ Error deleting DynamoDB table {table_name}: {e}")
-    except Exception as e:
-        print(f"  ❌ Error checking DynamoDB tables: {e}")
+        print("=" * 60)
+        print(f"{'🔍 DRY RUN MODE' if dry_run else '🚨 EXECUTION MODE'}")
+        print(f"Account ID: {account_id}")
+        if len(regions) > 1:
+            print(f"Regions: {', '.join(regions)}")
+        else:
+            print(f"Region: {regions[0]}")
+        if resumed:
+            summary = journal.summary()
+            print("♻️  Resuming interrupted run: " + ", ".join(f"{status}={count}" for status, count in sorted(summary.items())))
+            # Volta a acompanhar as exclusões que estavam em andamento
+            for resource_type, resource_region, resource_id, state in journal.in_flight():
+                if resource_type in CHECKERS and resource_type in services:
+                    tracker.track(resource_type, resource_region, resource_id, state)
+        elif tagging is not None:
+            print(f"🏷️  Using inventory from the Tagging API ({tagging.calls} GetResources calls)")
+        elif cached is not None:
+            print(f"♻️  Using inventory from dry-run {cached.age():.0f}s ago")
+        print("=" * 60)
     
-    # CloudFormation Stacks
-    print(f"\n🔍 Checking CloudFormation Stacks...")
-    try:
-        cf = session.client('cloudformation')
-        response = cf.list_stacks(
-            StackStatusFilter=[
-                'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'ROLLBACK_COMPLETE',
-                'UPDATE_ROLLBACK_COMPLETE'
-            ]
-        )
-        stacks = response.get('StackSummaries', [])
-        
-        if stacks:
-            print(f"  📚 Found {len(stacks)} CloudFormation stacks")
-            total_resources += len(stacks)
-            for stack in stacks:
-                stack_name = stack['StackName']
-                print(f"    {'🔍 Would delete' if dry_run else '🗑️  Deleting'} CloudFormation stack: {stack_name}")
-                if not dry_run:
-                    try:
-                        cf.delete_stack(StackName=stack_name)
-                    except Exception as e:
-                        print(f"    ❌ Error deleting CloudFormation stack {stack_name}: {e}")
-    except Exception as e:
-        print(f"  ❌ Error checking CloudFormation stacks: {e}")
+        cleaner = SimpleCleaner(clients, tracker, account_id, dry_run, inventory, cached, filters, journal)
+        region_totals = {}
+    
+        if len(regions) == 1:
+            region_totals[regions[0]] = cleaner.check_services(regional, regions[0])
+        else:
+            # Varre as regiões em paralelo, com o output de cada uma agrupado
+            with thread_local_stdout() as output:
+                runner = GroupedRunner(output)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        region: executor.submit(runner.run, cleaner.check_services, regional, region, True, label=region)
+                        for region in regions
+                    }
+                    region_totals = {region: future.result() for region, future in futures.items()}
+        # Os tipos globais (S3, IAM) vêm depois das regiões: buckets, roles e políticas podem estar em uso por recursos regionais
+        region_totals[GLOBAL_REGION] = cleaner.check_services(global_handlers, GLOBAL_REGION)
+    
+        total_resources = sum(region_totals.values())
+    
+        # Espera as exclusões assíncronas que ainda não terminaram (instâncias RDS, tabelas, stacks)
+        if not dry_run:
+            tracker.wait()
+        # A execução chegou ao fim: não há mais o que retomar
+        if journal is not None:
+            journal.finish()
+    finally:
+        if journal is not None:
+            journal.close()
+    
+    # O inventário do dry-run fica para a execução; depois da execução ele não vale mais
+    if inventory_cache is not None:
+        if dry_run:
+            inventory_cache.put(account_id, regions, inventory)
+        else:
+            inventory_cache.invalidate(account_id, regions)
     
     print("\n" + "=" * 60)
     print(f"📊 SUMMARY:")
     print(f"Total resources found: {total_resources}")
+    if len(regions) > 1:
+        for region in regions + [GLOBAL_REGION]:
+            print(f"  🌎 {region}: {region_totals.get(region, 0)}")
+    print(metrics.describe())
+    if tagging is not None and tagging.complete:
+        print(UNTAGGED_WARNING)
     if dry_run:
         print("🔍 This was a DRY RUN - no resources were actually deleted")
         print("💡 Use --no-dry-run flag to actually delete resources")
     else:
-        print("🚨 Resources have been deleted!")
+        print_completion(tracker.counts())
     print("=" * 60)
+    return 0
+
+def print_completion(counts):
+    """Mostra quantas exclusões foram confirmadas, não terminaram a tempo ou falharam"""
+    deleted = counts.get(DELETED, 0)
+    requested = counts.get(TIMED_OUT, 0)
+    failed = counts.get(FAILED, 0)
+    print(f"✅ Deleted: {deleted}")
+    if counts.get(FILTERED):
+        print(f"🛡️  Protected by filters: {counts[FILTERED]}")
+    if requested:
+        print(f"⏳ Deletion requested, not confirmed in time: {requested}")
+    if failed:
+        print(f"❌ Failed: {failed}")
+    if requested or failed:
+        print(f"⚠️  Deletions requested: {requested + deleted}, confirmed: {deleted}")
+    else:
+        print("🚨 Resources have been deleted!")
+
+def main():
+    parser = argparse.ArgumentParser(description='AWS Resource Cleaner - Uma alternativa ao AWS Nuke')
+    parser.add_argument('--access-key', required=True, help='AWS Access Key ID')
+    parser.add_argument('--secret-key', required=True, help='AWS Secret Access Key')
+    parser.add_argument('--region', required=True, help="AWS Region (lista separada por vírgulas ou 'all' para todas as regiões habilitadas)")
+    parser.add_argument('--no-dry-run', action='store_true', help='Execute a exclusão real (sem isso, apenas simula)')
+    parser.add_argument('--output', choices=['text', 'ndjson'], default='text', help='Formato da saída: texto ou um registro JSON por recurso em stdout (o texto vai para stderr)')
+    parser.add_argument('--services', help='Tipos de recurso do registro a limpar, separados por vírgulas (ex.: EC2Instance,IAMUser; padrão: ' + ','.join(DEFAULT_SERVICES) + ')')
+    parser.add_argument('--config', help='nuke-config.yml com account-blocklist e filtros de recursos protegidos')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_PATH, help='Arquivo SQLite do journal de checkpoint da execução')
+    parser.add_argument('--resume', action='store_true', help='Retoma a execução interrompida registrada no journal')
+    parser.add_argument('--inventory', choices=ENGINES, default=LIST, help='Descoberta dos recursos: listar cada serviço, tratar primeiro os recursos com tags da Tagging API e depois listar, ou só a Tagging API (tagged-only: não encontra recursos sem tags; IAM, S3 e Elastic Beanstalk são sempre listados)')
+    
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else None
+    services = [name.strip() for name in args.services.split(',') if name.strip()] if args.services else None
+    
+    if args.output == 'ndjson':
+        records = RecordWriter(sys.stdout)
+        with human_output_to_stderr():
+            return_code = run_cleaner(
+                args.access_key, args.secret_key, args.region, not args.no_dry_run,
+                records=records, inventory_engine=args.inventory, config=config, services=services,
+                journal_path=args.journal, resume=args.resume
+            )
+        sys.exit(return_code)
+    
+    sys.exit(run_cleaner(
+        args.access_key, args.secret_key, args.region, dry_run=not args.no_dry_run, inventory_engine=args.inventory, config=config,
+        services=services, journal_path=args.journal, resume=args.resume
+    ))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,231 @@
+"""
+Journal de checkpoint das exclusões em SQLite
+Cada recurso planejado, em andamento ou concluído é gravado em disco assim que muda de
+estado. Se a execução for interrompida (timeout, crash), a próxima da mesma conta e
+regiões pode retomá-la: pula o que já terminou, volta a acompanhar as exclusões em
+andamento e revalida só os IDs já listados em vez de listar a conta de novo
+"""
+
+import time
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from cleaner_common import DRY_RUN, FILTERED, REQUESTED
+from completion_tracker import DELETED, PENDING, TIMED_OUT
+from inventory_cache import Inventory
+
+# Arquivo usado quando nenhum é informado (guarda só IDs de recursos, nunca credenciais)
+DEFAULT_JOURNAL_PATH = str(Path(tempfile.gettempdir()) / 'aws-resource-cleaner-journal.db')
+
+# Execuções interrompidas há mais tempo que isso não são retomadas (os IDs podem ter sido reutilizados)
+JOURNAL_TTL = 24 * 60 * 60
+
+# Recursos planejados gravados por transação durante a listagem
+PLAN_BATCH_SIZE = 500
+
+# Uma execução por (arquivo, conta e regiões) de cada vez neste processo: outra execução
+# da mesma conta (ex.: dois jobs web) apagaria o estado desta ao abrir o journal
+_RUN_LOCKS = {}
+_RUN_LOCKS_GUARD = threading.Lock()
+
+def _run_lock(path, run):
+    with _RUN_LOCKS_GUARD:
+        return _RUN_LOCKS.setdefault((str(Path(path).resolve()), run), threading.Lock())
+
+# Recurso listado e ainda não processado
+PLANNED = 'planned'
+
+# Terminaram: não são processados de novo
+FINISHED = {DELETED, FILTERED}
+
+# Exclusão já pedida: não é pedida de novo, só acompanhada até o fim
+IN_FLIGHT = {PENDING, REQUESTED, TIMED_OUT}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    run TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    state TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run, resource_type, region, resource_id)
+);
+CREATE TABLE IF NOT EXISTS listings (
+    run TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    PRIMARY KEY (run, region, resource_type)
+);
+"""
+
+class CheckpointJournal:
+    """Estado das exclusões de uma execução (conta e regiões), gravado em um arquivo SQLite
+
+    Pode ser usado como listener do CompletionTracker (record) ou como destino
+    de ResourceRecords (write/emit), como o RecordWriter. Entre open e close a
+    execução é exclusiva no processo: outra da mesma conta e regiões espera.
+    """
+
+    def __init__(self, account_id, regions, path=DEFAULT_JOURNAL_PATH, ttl=JOURNAL_TTL):
+        self.run = f"{account_id}:{','.join(sorted(regions))}"
+        self.ttl = ttl
+        self.previous = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # Com WAL, NORMAL só sincroniza no checkpoint: um crash perde no máximo os últimos estados,
+        # e esses recursos são só revalidados na retomada
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._run_lock = _run_lock(path, self.run)
+        self._holding = False
+
+    def open(self, resume=False):
+        """Começa a execução; com resume, carrega o estado de uma interrompida recente
+
+        Retorna True se havia o que retomar. Sem resume (ou sem execução
+        recente), o estado antigo da mesma conta e regiões é descartado.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            print("⏳ Waiting for another run on the same account and regions to finish...")
+            self._run_lock.acquire()
+        self._holding = True
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute('SELECT updated_at FROM runs WHERE run = ?', (self.run,)).fetchone()
+            if resume and row is not None and now - row[0] <= self.ttl:
+                self.previous = {
+                    (resource_type, region, resource_id): (status, state)
+                    for resource_type, region, resource_id, status, state in self._connection.execute(
+                        'SELECT resource_type, region, resource_id, status, state FROM resources WHERE run = ?',
+                        (self.run,)
+                    )
+                }
+                self._connection.execute('UPDATE runs SET updated_at = ? WHERE run = ?', (now, self.run))
+                return True
+            self._clear()
+            self._connection.execute('INSERT INTO runs (run, started_at, updated_at) VALUES (?, ?, ?)', (self.run, now, now))
+            return False
+
+    @contextmanager
+    def _transaction(self):
+        # Com isolation_level=None cada comando faz commit sozinho; lotes usam uma transação explícita
+        self._connection.execute('BEGIN')
+        try:
+            yield
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+    def _clear(self):
+        with self._transaction():
+            for table in ('runs', 'resources', 'listings'):
+                self._connection.execute(f'DELETE FROM {table} WHERE run = ?', (self.run,))
+
+    def record(self, resource_type, region, resource_id, status, state=None):
+        """Grava o estado atual de um recurso"""
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO resources (run, resource_type, region, resource_id, status, state, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (run, resource_type, region, resource_id) '
+                'DO UPDATE SET status = excluded.status, state = COALESCE(excluded.state, state), updated_at = excluded.updated_at',
+                (self.run, resource_type, region, resource_id, status, state, time.time())
+            )
+
+    def write(self, record):
+        """Grava um ResourceRecord (registros de dry-run são ignorados)"""
+        if record.result != DRY_RUN:
+            self.record(record.type, record.region, record.id, record.result, record.state)
+
+    def emit(self, resource_type, region, resource_id, result, state=None, duration=None):
+        if result != DRY_RUN:
+            self.record(resource_type, region, resource_id, result, state)
+
+    def plan(self, resource_type, region, resource_ids):
+        """Grava recursos listados; não sobrescreve um estado já gravado"""
+        now = time.time()
+        if not resource_ids:
+            return
+        with self._lock, self._transaction():
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO resources (run, resource_type, region, resource_id, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(self.run, resource_type, region, resource_id, PLANNED, now) for resource_id in resource_ids]
+            )
+
+    def complete(self, region, resource_type):
+        """Marca a listagem do tipo na região como concluída (na retomada ela não é refeita)"""
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO listings (run, region, resource_type) VALUES (?, ?, ?)',
+                (self.run, region, resource_type)
+            )
+
+    def listing(self, region, resource_type, items, item_id):
+        """Itera sobre os recursos listados, gravando-os e pulando os já tratados pela execução interrompida"""
+        planned = []
+        for item in items:
+            resource_id = item_id(item)
+            status, _ = self.previous.get((resource_type, region, resource_id), (None, None))
+            if status in FINISHED or status in IN_FLIGHT:
+                print(f"    ⏭️  Skipping {resource_type} {resource_id}: {status} in the interrupted run")
+                continue
+            planned.append(resource_id)
+            if len(planned) >= PLAN_BATCH_SIZE:
+                self.plan(resource_type, region, planned)
+                planned = []
+            yield item
+        self.plan(resource_type, region, planned)
+        self.complete(region, resource_type)
+
+    def inventory(self):
+        """Inventário com os recursos ainda não terminados dos tipos cuja listagem foi concluída"""
+        inventory = Inventory()
+        with self._lock:
+            listings = self._connection.execute(
+                'SELECT region, resource_type FROM listings WHERE run = ?', (self.run,)
+            ).fetchall()
+        for region, resource_type in listings:
+            inventory.complete(region, resource_type)
+        for (resource_type, region, resource_id), (status, _) in self.previous.items():
+            if status not in FINISHED:
+                inventory.add(region, resource_type, resource_id)
+        return inventory
+
+    def in_flight(self):
+        """(tipo, região, ID, estado) das exclusões que estavam em andamento"""
+        return [
+            (resource_type, region, resource_id, state)
+            for (resource_type, region, resource_id), (status, state) in self.previous.items()
+            if status in IN_FLIGHT
+        ]
+
+    def summary(self):
+        """Quantidade de recursos da execução interrompida por estado"""
+        counts = {}
+        for status, _ in self.previous.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def finish(self):
+        """Descarta o estado depois que a execução chegou ao fim"""
+        with self._lock:
+            self._clear()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+        if self._holding:
+            self._holding = False
+            self._run_lock.release()
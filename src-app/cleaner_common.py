@@ -0,0 +1,496 @@
+"""
+Utilitários compartilhados pelos AWS Resource Cleaners
+Output agrupado por thread, resolução da lista de regiões, paginação em streaming
+e execução de exclusões em lote
+"""
+
+import io
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from rate_limiter import RETRY_CONFIG
+from run_profiler import CLIENTS
+
+# Valor de --region que expande para todas as regiões habilitadas na conta
+ALL_REGIONS = 'all'
+
+# Nome usado nos relatórios para os serviços globais (IAM, listagem do S3)
+GLOBAL_REGION = 'global'
+
+# Quantidade de páginas buscadas à frente enquanto a página atual é processada
+PREFETCH_PAGES = 2
+
+# Máximo de IDs aceitos por chamada de TerminateInstances
+TERMINATE_BATCH_SIZE = 1000
+
+# Exclusões individuais (volumes, snapshots) em andamento ao mesmo tempo
+DELETE_WORKERS = 10
+
+# Conexões HTTP mantidas por client quando a concorrência não é informada
+DEFAULT_MAX_CONNECTIONS = 10
+
+# Resultados dos registros de recurso além dos estados do CompletionTracker:
+# simulado em dry-run, exclusão assíncrona pedida e não acompanhada, ou protegido por um filtro
+DRY_RUN = 'dry-run'
+REQUESTED = 'requested'
+FILTERED = 'filtered'
+
+# Ação registrada para cada tipo de recurso (os demais são excluídos com 'delete')
+RESOURCE_ACTIONS = {
+    'EC2Instance': 'terminate',
+    'ElasticBeanstalkEnvironment': 'terminate',
+    'AMI': 'deregister',
+}
+
+class ThreadLocalOutput:
+    """Stdout que pode ser redirecionado por thread, para o output de cada serviço não se misturar"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def current(self):
+        """Retorna o destino do output da thread atual"""
+        return getattr(self._local, 'target', None) or self.stream
+
+    def write(self, data):
+        return self.current().write(data)
+
+    def flush(self):
+        self.current().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    @contextmanager
+    def redirect(self, target):
+        """Redireciona o output da thread atual para target durante o bloco"""
+        previous = getattr(self._local, 'target', None)
+        self._local.target = target
+        try:
+            yield target
+        finally:
+            self._local.target = previous
+
+def _stdout_handlers(stream):
+    """Handlers de logging que escrevem em stream"""
+    return [
+        handler for handler in logging.getLogger().handlers
+        if isinstance(handler, logging.StreamHandler) and handler.stream is stream
+    ]
+
+@contextmanager
+def thread_local_stdout():
+    """Instala um ThreadLocalOutput como sys.stdout (e nos handlers de logging) durante o bloco"""
+    if isinstance(sys.stdout, ThreadLocalOutput):
+        yield sys.stdout
+        return
+
+    original = sys.stdout
+    output = ThreadLocalOutput(original)
+    handlers = _stdout_handlers(original)
+    sys.stdout = output
+    for handler in handlers:
+        handler.setStream(output)
+    try:
+        yield output
+    finally:
+        for handler in handlers:
+            handler.setStream(original)
+        sys.stdout = original
+
+def install_thread_local_stdout():
+    """Instala um ThreadLocalOutput como sys.stdout de forma permanente (ex.: no servidor web)
+
+    Dentro do processo do Flask várias execuções rodam ao mesmo tempo, então o
+    proxy não pode ser removido ao fim de cada uma como em thread_local_stdout.
+    """
+    if isinstance(sys.stdout, ThreadLocalOutput):
+        return sys.stdout
+
+    output = ThreadLocalOutput(sys.stdout)
+    for handler in _stdout_handlers(sys.stdout):
+        handler.setStream(output)
+    sys.stdout = output
+    return output
+
+def with_current_output(func):
+    """func, para rodar em outra thread, escrevendo no destino do output da thread atual
+
+    As threads de pools não herdam o redirecionamento de quem as usa; sem isso
+    o output delas escaparia do grupo (GroupedRunner) ou do log do job web.
+    """
+    output = sys.stdout
+    if not isinstance(output, ThreadLocalOutput):
+        return func
+    target = output.current()
+
+    def run(*args, **kwargs):
+        with output.redirect(target):
+            return func(*args, **kwargs)
+    return run
+
+class GroupedRunner:
+    """Executa tarefas em paralelo sem intercalar o output de cada uma
+
+    O output de cada tarefa é acumulado e escrito de uma vez quando ela termina.
+    Se o destino recebe linhas (write_line, como o JobOutput de um job web) e a
+    tarefa tem label, cada linha é escrita assim que fica completa, prefixada
+    com o label: o log do job mostra o progresso e nada fica acumulado em memória.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.target = output.current()
+        self._lock = threading.Lock()
+
+    def run(self, func, *args, label=None):
+        """Executa func com o output da thread agrupado e retorna o resultado"""
+        if label is not None and hasattr(self.target, 'write_line'):
+            stream = PrefixedLines(self.target, f"[{label}] ")
+            try:
+                with self.output.redirect(stream):
+                    return func(*args)
+            finally:
+                stream.close()
+
+        buffer = io.StringIO()
+        try:
+            with self.output.redirect(buffer):
+                return func(*args)
+        finally:
+            with self._lock:
+                self.target.write(buffer.getvalue())
+                self.target.flush()
+
+class PrefixedLines:
+    """Stream que entrega cada linha completa, com um prefixo, ao write_line de target
+
+    Linhas em branco são descartadas: entre linhas de várias tarefas elas não separam nada.
+    """
+
+    def __init__(self, target, prefix):
+        self.target = target
+        self.prefix = prefix
+        self._partial = ''
+        # As threads dos pools da tarefa escrevem no mesmo stream
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        with self._lock:
+            lines = (self._partial + data).split('\n')
+            self._partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.target.write_line(self.prefix + line)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._partial.strip():
+            self.target.write_line(self.prefix + self._partial)
+        self._partial = ''
+
+@contextmanager
+def human_output_to_stderr():
+    """Manda o output legível (print e logging) para stderr, deixando stdout só para os registros"""
+    original = sys.stdout
+    handlers = _stdout_handlers(original)
+    for handler in handlers:
+        handler.setStream(sys.stderr)
+    try:
+        with redirect_stdout(sys.stderr):
+            yield
+    finally:
+        for handler in handlers:
+            handler.setStream(original)
+
+class ResourceRecord:
+    """Resultado compacto do processamento de um recurso"""
+
+    __slots__ = ('type', 'id', 'region', 'state', 'action', 'result', 'duration')
+
+    def __init__(self, resource_type, resource_id, region, state=None, action=None, result=None, duration=None):
+        self.type = resource_type
+        self.id = resource_id
+        self.region = region
+        self.state = state
+        self.action = action or RESOURCE_ACTIONS.get(resource_type, 'delete')
+        self.result = result
+        self.duration = duration
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        if self.duration is not None:
+            data['duration'] = round(self.duration, 3)
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+class RecordWriter:
+    """Escreve ResourceRecords como NDJSON: um objeto JSON por linha, enviado assim que fica pronto"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = record.to_json() + '\n'
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def emit(self, resource_type, region, resource_id, result, state=None, duration=None):
+        """Monta e escreve o registro de um recurso"""
+        self.write(ResourceRecord(resource_type, resource_id, region, state, result=result, duration=duration))
+
+class RecordFanout:
+    """Entrega cada ResourceRecord a vários destinos (ex.: RecordWriter e CheckpointJournal)"""
+
+    def __init__(self, *writers):
+        self.writers = [writer for writer in writers if writer is not None]
+
+    def write(self, record):
+        for writer in self.writers:
+            writer.write(record)
+
+    def emit(self, resource_type, region, resource_id, result, state=None, duration=None):
+        self.write(ResourceRecord(resource_type, resource_id, region, state, result=result, duration=duration))
+
+def parse_regions(value):
+    """Converte o valor de --region (lista separada por vírgulas ou 'all') em lista de regiões"""
+    if isinstance(value, (list, tuple)):
+        regions = [str(region).strip() for region in value]
+    else:
+        regions = [region.strip() for region in str(value).split(',')]
+
+    # Remove vazios e duplicados mantendo a ordem
+    return list(dict.fromkeys(region for region in regions if region))
+
+def resolve_regions(session, regions):
+    """Expande 'all' para as regiões habilitadas na conta"""
+    if ALL_REGIONS not in regions:
+        return regions
+
+    ec2 = session.client('ec2')
+    # Sem AllRegions, DescribeRegions retorna apenas as regiões habilitadas
+    response = ec2.describe_regions()
+    return sorted(region['RegionName'] for region in response.get('Regions', []))
+
+class _PrefetchError:
+    """Erro ocorrido na thread de prefetch, relançado no consumidor"""
+
+    def __init__(self, error):
+        self.error = error
+
+_PREFETCH_END = object()
+
+def prefetch(pages, size=PREFETCH_PAGES):
+    """Itera sobre pages em uma thread em segundo plano, mantendo no máximo size páginas à frente"""
+    if size <= 0:
+        yield from pages
+        return
+
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item):
+        # Espera espaço no buffer, desistindo se o consumidor parou de iterar
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_PREFETCH_END)
+        except Exception as e:
+            put(_PrefetchError(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            page = buffer.get()
+            if page is _PREFETCH_END:
+                return
+            if isinstance(page, _PrefetchError):
+                raise page.error
+            yield page
+    finally:
+        stop.set()
+
+def paginate(client, operation, result_key, prefetch_pages=PREFETCH_PAGES, **kwargs):
+    """Itera sobre os itens de todas as páginas de uma operação de listagem
+
+    As próximas páginas são buscadas em segundo plano enquanto os itens da página
+    atual são processados, então a exclusão começa já na primeira página e a memória
+    usada fica limitada a prefetch_pages páginas.
+    """
+    pages = client.get_paginator(operation).paginate(**kwargs)
+    for page in prefetch(pages, prefetch_pages):
+        yield from page.get(result_key, [])
+
+def stream_collection(collection, prefetch_pages=PREFETCH_PAGES):
+    """Itera sobre uma coleção de resources do boto3 página por página, com prefetch"""
+    for page in prefetch(collection.pages(), prefetch_pages):
+        yield from page
+
+def chunked(iterable, size):
+    """Agrupa os itens de iterable em listas de até size itens, sem materializar tudo"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class BoundedPool:
+    """Pool de threads que limita as chamadas em andamento, bloqueando submit quando cheio
+
+    Permite disparar exclusões enquanto a listagem paginada ainda está sendo
+    consumida, sem acumular futures sem limite. Os erros ficam em errors como
+    (chave, erro), as chaves que deram certo em succeeded (com o retorno de
+    cada chamada em results) e o tempo de cada chamada em durations, todos
+    coletados ao sair do bloco with.
+    """
+
+    def __init__(self, workers=DELETE_WORKERS):
+        self.workers = workers
+        self.errors = []
+        self.succeeded = []
+        self.results = {}
+        self.durations = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._in_flight = {}
+
+    def submit(self, key, func, *args, **kwargs):
+        """Agenda func(*args, **kwargs), esperando uma vaga se o pool estiver cheio"""
+        if len(self._in_flight) >= self.workers:
+            done, _ = wait(self._in_flight, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        self._in_flight[self._executor.submit(self._timed, key, with_current_output(func), *args, **kwargs)] = key
+
+    def _timed(self, key, func, /, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.durations[key] = time.monotonic() - start
+
+    def _collect(self, done):
+        for future in done:
+            key = self._in_flight.pop(future)
+            error = future.exception()
+            if error is not None:
+                self.errors.append((key, error))
+            else:
+                self.succeeded.append(key)
+                self.results[key] = future.result()
+
+    def __enter__(self):
+        return self
+
+    def drain(self):
+        """Espera as chamadas em andamento terminarem e coleta os resultados"""
+        if self._in_flight:
+            done, _ = wait(self._in_flight)
+            self._collect(done)
+
+    def __exit__(self, *exc_info):
+        self.drain()
+        self._executor.shutdown()
+
+class ClientPool:
+    """Cache de clients e resources do boto3 por (serviço, região), compartilhado pela execução
+
+    Cada client mantém um pool de até max_connections conexões HTTP com
+    keep-alive, então as conexões TLS abertas na listagem são reaproveitadas
+    por todas as exclusões seguintes em vez de serem refeitas a cada chamada.
+    Clients são thread-safe; os resources são usados apenas para iterar
+    coleções e chamar ações, que não alteram o estado do próprio resource.
+    """
+
+    def __init__(self, session, max_connections=DEFAULT_MAX_CONNECTIONS, timer=None):
+        self.session = session
+        # Com a política de retry, as chamadas que sofreram throttling são repetidas em vez de virar erro
+        self.config = Config(max_pool_connections=max_connections, tcp_keepalive=True).merge(RETRY_CONFIG)
+        # PhaseTimer que mede a criação de cada client e resource (fase 'clients')
+        self.timer = timer
+        self._clients = {}
+        self._resources = {}
+        # Criação de clients a partir da mesma sessão não é thread-safe
+        self._lock = threading.Lock()
+
+    def client(self, service, region=None):
+        """Client do serviço na região (None usa a região da sessão)"""
+        with self._lock:
+            if (service, region) not in self._clients:
+                with self._creating():
+                    self._clients[(service, region)] = self.session.client(
+                        service, region_name=region, config=self.config
+                    )
+            return self._clients[(service, region)]
+
+    def resource(self, service, region=None):
+        """Resource do serviço na região (None usa a região da sessão)"""
+        with self._lock:
+            if (service, region) not in self._resources:
+                with self._creating():
+                    self._resources[(service, region)] = self.session.resource(
+                        service, region_name=region, config=self.config
+                    )
+            return self._resources[(service, region)]
+
+    def _creating(self):
+        return self.timer.phase(CLIENTS) if self.timer is not None else nullcontext()
+
+def terminate_instances(client, instance_ids, batch_size=TERMINATE_BATCH_SIZE):
+    """Termina instâncias EC2 em lotes de até batch_size IDs por chamada
+
+    Se um lote falhar (por exemplo, por uma instância com proteção contra
+    término), a API não termina nenhuma instância dele; nesse caso o lote é
+    refeito instância por instância para isolar as que falharam.
+    Retorna a lista de (instance_id, erro) que não puderam ser terminadas.
+    """
+    errors = []
+    for batch in chunked(instance_ids, batch_size):
+        try:
+            client.terminate_instances(InstanceIds=batch)
+        except ClientError as e:
+            if len(batch) == 1:
+                errors.append((batch[0], e))
+                continue
+            for instance_id in batch:
+                try:
+                    client.terminate_instances(InstanceIds=[instance_id])
+                except ClientError as instance_error:
+                    errors.append((instance_id, instance_error))
+    return errors
+
+def referenced_security_groups(sg):
+    """IDs dos security groups referenciados nas regras de entrada e saída de sg"""
+    return {
+        pair['GroupId']
+        for permission in sg.get('IpPermissions', []) + sg.get('IpPermissionsEgress', [])
+        for pair in permission.get('UserIdGroupPairs', [])
+        if pair.get('GroupId') and pair['GroupId'] != sg['GroupId']
+    }
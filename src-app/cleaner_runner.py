@@ -0,0 +1,67 @@
+"""
+Execução do AWS Resource Cleaner dentro do processo da aplicação web
+O cleaner é importado como biblioteca e roda em threads de um pool, sem iniciar
+um novo interpretador (e reimportar boto3/botocore) a cada requisição
+"""
+
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from api_metrics import ApiMetrics
+from aws_resource_cleaner_simple import run_cleaner
+from cleaner_common import install_thread_local_stdout
+from jobs import JobOutput
+
+# Execuções do cleaner em andamento ao mesmo tempo
+RUN_WORKERS = 4
+
+class InProcessRunner:
+    """Executa o cleaner em threads, gravando o output de cada execução no seu job
+
+    As credenciais são passadas direto para a sessão boto3 da execução e
+    descartadas com ela: não vão para variáveis de ambiente, linha de comando,
+    arquivos ou para o resultado retornado. O inventory_cache guarda apenas
+    IDs de recursos, para a execução reaproveitar a descoberta do dry-run. Com
+    journal_path, uma execução interrompida (ex.: reinício do servidor) é
+    retomada pela próxima da mesma conta e regiões. metrics agrega as chamadas à
+    API de todas as execuções; o resultado de cada uma traz o resumo das suas.
+    """
+
+    def __init__(self, workers=RUN_WORKERS, inventory_cache=None, journal_path=None):
+        self.inventory_cache = inventory_cache
+        self.journal_path = journal_path
+        self.metrics = ApiMetrics()
+        self.output = install_thread_local_stdout()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cleaner')
+
+    def submit_job(self, job, access_key, secret_key):
+        """Agenda a execução de um Job, publicando o output linha a linha enquanto roda"""
+        return self._executor.submit(self._run_job, job, access_key, secret_key)
+
+    def _run_job(self, job, access_key, secret_key):
+        job.start()
+        stream = JobOutput(job)
+        result = self._run(access_key, secret_key, job.region, job.dry_run, stream)
+        stream.close()
+        job.finish(result)
+
+    def _run(self, access_key, secret_key, region, dry_run, stream):
+        """Executa o cleaner com o output da thread redirecionado para stream"""
+        error = ''
+        metrics = ApiMetrics(parent=self.metrics)
+        with self.output.redirect(stream):
+            try:
+                return_code = run_cleaner(
+                    access_key, secret_key, region,
+                    dry_run=dry_run, inventory_cache=self.inventory_cache,
+                    journal_path=self.journal_path, resume=True, metrics=metrics
+                )
+            except Exception:
+                error = traceback.format_exc()
+                return_code = 1
+        return {
+            'success': return_code == 0,
+            'error': error,
+            'return_code': return_code,
+            'metrics': metrics.summary()
+        }
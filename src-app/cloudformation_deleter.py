@@ -0,0 +1,268 @@
+"""
+Exclusão de stacks do CloudFormation na ordem das dependências entre elas
+Uma stack que exporta valores só pode ser excluída depois das que os importam, e stacks
+aninhadas são excluídas pela stack raiz. O grafo montado com ListExports/ListImports e
+com o RootId das stacks define ondas: as stacks de uma onda são excluídas em paralelo e a
+onda seguinte só começa quando elas terminam. Stacks em DELETE_FAILED são excluídas de
+novo mantendo (RetainResources) os recursos que impediram a exclusão
+"""
+
+import time
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import DELETE_WORKERS, REQUESTED, BoundedPool, paginate
+from completion_tracker import DELETED, FAILED
+from deletion_scheduler import DeletionScheduler, DependencyCycleError
+
+# Pedidos de exclusão por stack: o primeiro e as repetições mantendo os recursos que falharam
+MAX_ATTEMPTS = 3
+
+# Backoff entre as consultas com DescribeStacks enquanto a onda está em andamento
+INITIAL_DELAY = 5
+MAX_DELAY = 30
+
+# Tempo máximo para todas as ondas
+TIMEOUT = 3600
+
+class StackResult:
+    """Mudança de estado de uma stack: REQUESTED, DELETED ou FAILED (com o erro)"""
+
+    __slots__ = ('name', 'status', 'error', 'seconds')
+
+    def __init__(self, name, status, error=None, seconds=None):
+        self.name = name
+        self.status = status
+        self.error = error
+        self.seconds = seconds
+
+class CloudFormationStackDeleter:
+    """Exclui stacks de uma região em ondas, respeitando exports/imports e o aninhamento
+
+    Stacks aninhadas não são excluídas diretamente: seguem o resultado da
+    stack raiz. Uma stack cujo export é importado por outra que não vai ser
+    excluída (ou que não conseguiu ser) falha sem o pedido de exclusão, já que
+    o CloudFormation a recusaria. Termination protection é desligada antes.
+    """
+
+    def __init__(self, client, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY, timeout=TIMEOUT,
+                 attempts=MAX_ATTEMPTS, workers=DELETE_WORKERS):
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.attempts = attempts
+        self.workers = workers
+
+    def delete_all(self, stack_names):
+        """Gera um StackResult a cada exclusão pedida, concluída ou que falhou
+
+        stack_names aceita nomes ou StackIds, e os resultados usam o mesmo
+        identificador. As stacks ainda em andamento quando o tempo acaba ficam
+        só com o REQUESTED, para o chamador acompanhar.
+        """
+        stacks = {stack['StackId']: stack for stack in paginate(self.client, 'describe_stacks', 'Stacks')}
+        ids_by_name = {stack['StackName']: stack_id for stack_id, stack in stacks.items()}
+
+        # Stack raiz -> identificadores (dela e das aninhadas selecionadas) que seguem o seu resultado
+        followers = {}
+        nested = []
+        for name in stack_names:
+            stack_id = name if name in stacks else ids_by_name.get(name)
+            if stack_id is None:
+                # Já não existe (DeleteStack de uma stack inexistente também não é erro)
+                yield StackResult(name, DELETED)
+                continue
+            root_id = _root(stacks, stack_id)
+            if root_id == stack_id:
+                followers.setdefault(stack_id, []).append(name)
+            else:
+                nested.append((root_id, name))
+        for root_id, name in nested:
+            if root_id in followers:
+                followers[root_id].append(name)
+            else:
+                yield StackResult(name, FAILED, f"nested in stack {stacks[root_id]['StackName']}, which is not being deleted")
+
+        importers, blocked = self._imports(stacks, ids_by_name, followers)
+
+        # Quem exporta só é excluída depois de quem importa
+        scheduler = DeletionScheduler()
+        for stack_id in followers:
+            scheduler.add(stack_id, depends_on=importers.get(stack_id, ()))
+        try:
+            waves = scheduler.waves()
+        except DependencyCycleError as e:
+            for cycle in e.cycles:
+                print(f"    ⚠️  Circular imports between CloudFormation stacks: {', '.join(stacks[node]['StackName'] for node in cycle)}")
+                scheduler.remove_dependencies(cycle)
+            waves = scheduler.waves()
+
+        deadline = time.monotonic() + self.timeout
+        # Stacks raiz que não foram excluídas (falharam ou continuam em andamento)
+        remaining = set()
+        for wave in waves:
+            ready = []
+            for stack_id in wave:
+                waiting = [importer for importer in importers.get(stack_id, ()) if importer in remaining]
+                reason = blocked.get(stack_id) or (
+                    f"stack {stacks[waiting[0]]['StackName']} imports its exports and was not deleted" if waiting else None
+                )
+                if reason:
+                    remaining.add(stack_id)
+                    yield from _follow(followers[stack_id], StackResult(stack_id, FAILED, reason))
+                else:
+                    ready.append(stack_id)
+            for result in self._delete_wave(ready, stacks, deadline):
+                if result.status != DELETED:
+                    remaining.add(result.name)
+                else:
+                    remaining.discard(result.name)
+                yield from _follow(followers[result.name], result)
+
+    def _imports(self, stacks, ids_by_name, followers):
+        """({raiz exportadora: {raízes importadoras}}, {raiz: motivo de não poder ser excluída})"""
+        exports = [
+            export for export in paginate(self.client, 'list_exports', 'Exports')
+            if export['ExportingStackId'] in stacks and _root(stacks, export['ExportingStackId']) in followers
+        ]
+        with BoundedPool(self.workers) as pool:
+            for export in exports:
+                pool.submit(export['Name'], self._importers, export['Name'])
+        for name, error in pool.errors:
+            print(f"    ⚠️  Cannot list the imports of export {name}: {error}")
+
+        importers = {}
+        blocked = {}
+        for export in exports:
+            exporter_id = _root(stacks, export['ExportingStackId'])
+            for importer_name in pool.results.get(export['Name'], ()):
+                importer_id = ids_by_name.get(importer_name)
+                importer_id = _root(stacks, importer_id) if importer_id else None
+                if importer_id == exporter_id:
+                    # Imports dentro da mesma árvore de stacks aninhadas ficam por conta do CloudFormation
+                    continue
+                if importer_id in followers:
+                    importers.setdefault(exporter_id, set()).add(importer_id)
+                else:
+                    blocked.setdefault(
+                        exporter_id, f"export {export['Name']} is imported by stack {importer_name}, which is not being deleted"
+                    )
+        return importers, blocked
+
+    def _importers(self, export_name):
+        try:
+            return list(paginate(self.client, 'list_imports', 'Imports', ExportName=export_name))
+        except ClientError as e:
+            # ListImports responde com erro quando nenhuma stack importa o export
+            if 'not imported' in e.response['Error'].get('Message', ''):
+                return []
+            raise
+
+    def _delete_wave(self, wave, stacks, deadline):
+        """Exclui as stacks de uma onda em paralelo e gera os resultados até todas terminarem"""
+        with BoundedPool(self.workers) as pool:
+            for stack_id in wave:
+                pool.submit(stack_id, self._delete, stacks[stack_id])
+        for stack_id, error in pool.errors:
+            yield StackResult(stack_id, FAILED, error)
+
+        in_flight = {}
+        attempts = {}
+        for stack_id in pool.succeeded:
+            _print_notes(pool.results[stack_id])
+            in_flight[stack_id] = time.monotonic()
+            attempts[stack_id] = 1
+            yield StackResult(stack_id, REQUESTED, seconds=pool.durations.get(stack_id))
+
+        delay = self.initial_delay
+        while in_flight:
+            if time.monotonic() + delay > deadline:
+                return
+            time.sleep(delay)
+            finished = len(in_flight)
+            retries = []
+            for stack_id, (status, reason) in self._poll(in_flight).items():
+                if status == 'DELETE_COMPLETE':
+                    yield StackResult(stack_id, DELETED, seconds=time.monotonic() - in_flight.pop(stack_id))
+                elif status == 'DELETE_FAILED':
+                    if attempts[stack_id] >= self.attempts:
+                        in_flight.pop(stack_id)
+                        yield StackResult(stack_id, FAILED, reason or status)
+                    else:
+                        retries.append(stack_id)
+
+            with BoundedPool(self.workers) as pool:
+                for stack_id in retries:
+                    attempts[stack_id] += 1
+                    pool.submit(stack_id, self._retain_and_delete, stacks[stack_id])
+            for stack_id in pool.succeeded:
+                _print_notes(pool.results[stack_id])
+            for stack_id, error in pool.errors:
+                in_flight.pop(stack_id)
+                yield StackResult(stack_id, FAILED, error)
+
+            # Com alguma mudança, a próxima rodada volta a consultar logo
+            changed = retries or len(in_flight) < finished
+            delay = self.initial_delay if changed else min(delay * 2, self.max_delay)
+
+    # _delete e _retain_and_delete rodam nas threads do pool: retornam as mensagens
+    # para o gerador mostrá-las na thread de quem consome os resultados
+
+    def _delete(self, stack):
+        stack_id = stack['StackId']
+        notes = []
+        if stack.get('EnableTerminationProtection'):
+            self.client.update_termination_protection(StackName=stack_id, EnableTerminationProtection=False)
+            notes.append(f"🔓 Disabled termination protection of CloudFormation stack {stack['StackName']}")
+        if stack['StackStatus'] == 'DELETE_FAILED':
+            # Falhou em uma execução anterior: a repetição simples falharia de novo
+            notes += self._retain_and_delete(stack)
+        else:
+            self.client.delete_stack(StackName=stack_id)
+        return notes
+
+    def _retain_and_delete(self, stack):
+        """Pede a exclusão de novo, mantendo os recursos que falharam na anterior"""
+        stack_id = stack['StackId']
+        retain = [
+            resource['LogicalResourceId']
+            for resource in paginate(self.client, 'list_stack_resources', 'StackResourceSummaries', StackName=stack_id)
+            if resource['ResourceStatus'] == 'DELETE_FAILED'
+        ]
+        if retain:
+            self.client.delete_stack(StackName=stack_id, RetainResources=retain)
+            return [f"📌 Retrying CloudFormation stack {stack['StackName']} keeping resources: {', '.join(retain)}"]
+        self.client.delete_stack(StackName=stack_id)
+        return [f"🔁 Retrying CloudFormation stack {stack['StackName']}"]
+
+    def _poll(self, in_flight):
+        """{StackId: (estado, motivo)} das stacks em andamento"""
+        def describe(stack_id):
+            try:
+                stack = self.client.describe_stacks(StackName=stack_id)['Stacks'][0]
+            except ClientError as e:
+                if 'does not exist' in e.response['Error'].get('Message', ''):
+                    return 'DELETE_COMPLETE', None
+                raise
+            return stack['StackStatus'], stack.get('StackStatusReason')
+
+        with BoundedPool(self.workers) as pool:
+            for stack_id in in_flight:
+                pool.submit(stack_id, describe, stack_id)
+        # Erro na consulta: a stack continua em andamento até a próxima rodada
+        return {stack_id: pool.results[stack_id] for stack_id in pool.succeeded}
+
+def _root(stacks, stack_id):
+    """Stack raiz da árvore de stacks aninhadas de stack_id"""
+    root_id = stacks[stack_id].get('RootId') or stack_id
+    return root_id if root_id in stacks else stack_id
+
+def _print_notes(notes):
+    for note in notes:
+        print(f"    {note}")
+
+def _follow(names, result):
+    """O resultado da stack raiz repetido para ela e para as aninhadas selecionadas"""
+    for name in names:
+        yield StackResult(name, result.status, result.error, result.seconds)
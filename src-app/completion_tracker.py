@@ -0,0 +1,203 @@
+"""
+Acompanhamento de exclusões assíncronas
+Registra cada exclusão pendente e consulta o estado final com chamadas de describe
+em lote (vários recursos por chamada) e backoff exponencial, em vez de um waiter por recurso
+"""
+
+import time
+import threading
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import BoundedPool, ResourceRecord, chunked
+
+# Estados finais (e o pendente) de cada exclusão
+PENDING = 'pending'
+DELETED = 'deleted'
+FAILED = 'failed'
+TIMED_OUT = 'timeout'
+
+# Backoff entre consultas: começa em INITIAL_DELAY e dobra até MAX_DELAY
+INITIAL_DELAY = 5
+MAX_DELAY = 60
+
+# Tempo máximo de espera por um grupo de exclusões
+TIMEOUT = 1800
+
+def _ec2_instances(client, ids):
+    """Estado de até 200 instâncias por DescribeInstances (filtro não falha para IDs inexistentes)"""
+    statuses = {}
+    for batch in chunked(ids, 200):
+        paginator = client.get_paginator('describe_instances')
+        for page in paginator.paginate(Filters=[{'Name': 'instance-id', 'Values': batch}]):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    state = instance['State']['Name']
+                    statuses[instance['InstanceId']] = DELETED if state == 'terminated' else PENDING
+    return statuses
+
+def _rds_instances(client, ids):
+    """Estado de até 100 instâncias RDS por DescribeDBInstances"""
+    statuses = {}
+    for batch in chunked(ids, 100):
+        paginator = client.get_paginator('describe_db_instances')
+        for page in paginator.paginate(Filters=[{'Name': 'db-instance-id', 'Values': batch}]):
+            for instance in page['DBInstances']:
+                statuses[instance['DBInstanceIdentifier']] = PENDING
+    return statuses
+
+def _cloudformation_stacks(client, ids):
+    """Estado das stacks (pelo nome ou StackId) com DescribeStacks em paralelo
+
+    Uma listagem de ListStacks percorreria também o histórico de stacks
+    excluídas da conta (90 dias) a cada rodada.
+    """
+    def status(stack_id):
+        try:
+            stack = client.describe_stacks(StackName=stack_id)['Stacks'][0]
+        except ClientError as e:
+            if 'does not exist' in e.response['Error'].get('Message', ''):
+                return DELETED
+            raise
+        if stack['StackStatus'] == 'DELETE_COMPLETE':
+            return DELETED
+        return FAILED if stack['StackStatus'] == 'DELETE_FAILED' else PENDING
+
+    with BoundedPool() as pool:
+        for stack_id in ids:
+            pool.submit(stack_id, status, stack_id)
+    if pool.errors:
+        raise pool.errors[0][1]
+    return pool.results
+
+def _dynamodb_tables(client, ids):
+    """Estado das tabelas em uma única listagem de ListTables (tabela listada = ainda existe)"""
+    wanted = set(ids)
+    statuses = {}
+    paginator = client.get_paginator('list_tables')
+    for page in paginator.paginate():
+        for table_name in page['TableNames']:
+            if table_name in wanted:
+                statuses[table_name] = PENDING
+    return statuses
+
+def _beanstalk_environments(client, ids):
+    """Estado de até 100 ambientes por DescribeEnvironments"""
+    statuses = {}
+    for batch in chunked(ids, 100):
+        response = client.describe_environments(EnvironmentIds=batch, IncludeDeleted=True)
+        for env in response['Environments']:
+            statuses[env['EnvironmentId']] = DELETED if env['Status'] == 'Terminated' else PENDING
+    return statuses
+
+# Tipo de recurso -> (serviço do client, função que consulta vários IDs de uma vez)
+# IDs que a consulta não retorna são considerados excluídos
+CHECKERS = {
+    'EC2Instance': ('ec2', _ec2_instances),
+    'RDSInstance': ('rds', _rds_instances),
+    'CloudFormationStack': ('cloudformation', _cloudformation_stacks),
+    'DynamoDBTable': ('dynamodb', _dynamodb_tables),
+    'ElasticBeanstalkEnvironment': ('elasticbeanstalk', _beanstalk_environments),
+}
+
+class CompletionTracker:
+    """Registra o estado de cada exclusão e espera as assíncronas terminarem
+
+    listener, se informado, recebe um ResourceRecord sempre que um recurso
+    chega a um estado final, com a duração desde o track quando não informada.
+    journal (CheckpointJournal), se informado, recebe todas as mudanças de
+    estado, inclusive as exclusões que passam a ser acompanhadas.
+    """
+
+    def __init__(self, clients, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY, timeout=TIMEOUT, listener=None, journal=None):
+        self.clients = clients
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.listener = listener
+        self.journal = journal
+        self._statuses = {}
+        self._states = {}
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def record(self, resource_type, region, resource_id, status, state=None, duration=None):
+        """Registra o estado de uma exclusão (síncrona ou que já falhou)"""
+        key = (resource_type, region, resource_id)
+        with self._lock:
+            self._statuses[key] = status
+            if state is not None:
+                self._states[key] = state
+            state = self._states.get(key)
+            started = self._started.get(key)
+        if self.journal is not None:
+            self.journal.record(resource_type, region, resource_id, status, state)
+        if status == PENDING:
+            return
+        if self.listener is not None:
+            if duration is None and started is not None:
+                duration = time.monotonic() - started
+            self.listener(ResourceRecord(resource_type, resource_id, region, state, result=status, duration=duration))
+
+    def track(self, resource_type, region, resource_id, state=None):
+        """Registra uma exclusão assíncrona que precisa ser acompanhada até o fim"""
+        with self._lock:
+            self._started[(resource_type, region, resource_id)] = time.monotonic()
+        self.record(resource_type, region, resource_id, PENDING, state)
+
+    def pending(self, resource_type=None, region=None):
+        """Exclusões ainda pendentes, opcionalmente de um tipo e região"""
+        with self._lock:
+            return [
+                key for key, status in self._statuses.items()
+                if status == PENDING
+                and (resource_type is None or key[0] == resource_type)
+                and (region is None or key[1] == region)
+            ]
+
+    def wait(self, resource_type=None, region=None):
+        """Consulta em lote, com backoff, até as exclusões pendentes terminarem ou o tempo acabar"""
+        delay = self.initial_delay
+        deadline = time.monotonic() + self.timeout
+        while True:
+            self.poll(resource_type, region)
+            pending = self.pending(resource_type, region)
+            if not pending:
+                return
+            if time.monotonic() + delay > deadline:
+                for key in pending:
+                    self.record(*key, TIMED_OUT)
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+    def poll(self, resource_type=None, region=None):
+        """Faz uma rodada de consultas: uma chamada em lote por tipo e região"""
+        groups = {}
+        for key in self.pending(resource_type, region):
+            groups.setdefault(key[:2], []).append(key[2])
+
+        for (group_type, group_region), ids in groups.items():
+            service, checker = CHECKERS[group_type]
+            try:
+                statuses = checker(self.clients.client(service, group_region), ids)
+            except ClientError:
+                # Erro transitório na consulta: tenta de novo na próxima rodada
+                continue
+            for resource_id in ids:
+                status = statuses.get(resource_id, DELETED)
+                # Só mudanças de estado são registradas (cada registro é uma escrita no journal)
+                if status != PENDING:
+                    self.record(group_type, group_region, resource_id, status)
+
+    def statuses(self):
+        """Cópia de {(tipo, região, id): estado}"""
+        with self._lock:
+            return dict(self._statuses)
+
+    def counts(self):
+        """Quantidade de exclusões por estado"""
+        counts = {}
+        for status in self.statuses().values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
@@ -0,0 +1,130 @@
+"""
+Agendador de exclusões com dependências
+Monta um grafo (DAG) entre tipos de recurso ou recursos individuais e executa as
+exclusões em ondas topológicas, com paralelismo total dentro de cada onda
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from cleaner_common import with_current_output
+
+class DependencyCycleError(Exception):
+    """Dependências circulares entre nós do grafo
+
+    cycles tem os ciclos (componentes fortemente conexos), cada um uma lista de
+    nós; nodes tem todos os nós em algum ciclo. Nós que só dependem de um
+    ciclo não aparecem: basta quebrar as dependências dentro de cada ciclo.
+    """
+
+    def __init__(self, cycles):
+        self.cycles = cycles
+        self.nodes = [node for cycle in cycles for node in cycle]
+        super().__init__(f"Dependência circular entre: {', '.join(map(str, self.nodes))}")
+
+class DeletionScheduler:
+    """Grafo de exclusões: cada nó só roda depois que todas as suas dependências terminaram"""
+
+    def __init__(self):
+        self._funcs = {}
+        self._dependencies = {}
+
+    def __contains__(self, key):
+        return key in self._funcs
+
+    def add(self, key, func=None, depends_on=()):
+        """Adiciona um nó; dependências que não estão no grafo são ignoradas"""
+        self._funcs[key] = func
+        self._dependencies.setdefault(key, set()).update(depends_on)
+
+    def add_dependency(self, key, dependency):
+        """Indica que key só pode ser excluído depois de dependency"""
+        self._dependencies.setdefault(key, set()).add(dependency)
+
+    def remove_dependencies(self, keys):
+        """Remove as dependências entre os nós informados (por exemplo, depois de quebrar um ciclo)"""
+        keys = set(keys)
+        for key in keys:
+            self._dependencies.get(key, set()).difference_update(keys)
+
+    def waves(self):
+        """Ordena os nós em ondas topológicas (algoritmo de Kahn)
+
+        Os nós de uma onda não dependem uns dos outros e podem rodar em paralelo.
+        Lança DependencyCycleError com os ciclos se houver algum.
+        """
+        remaining = {
+            key: {dep for dep in self._dependencies.get(key, ()) if dep in self._funcs and dep != key}
+            for key in self._funcs
+        }
+        waves = []
+        while remaining:
+            wave = [key for key, deps in remaining.items() if not deps]
+            if not wave:
+                raise DependencyCycleError(_cycles(remaining))
+            for key in wave:
+                del remaining[key]
+            for deps in remaining.values():
+                deps.difference_update(wave)
+            waves.append(wave)
+        return waves
+
+    def run(self, workers=1, wrap=None):
+        """Executa os nós onda a onda e retorna {nó: resultado}
+
+        wrap(func, nó) é chamado no lugar de func() em cada nó, permitindo por
+        exemplo agrupar o output de cada tarefa.
+        """
+        call = with_current_output(wrap or (lambda func, key: func()))
+        results = {}
+        for wave in self.waves():
+            if workers > 1 and len(wave) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {key: executor.submit(call, self._funcs[key], key) for key in wave}
+                    results.update((key, future.result()) for key, future in futures.items())
+            else:
+                for key in wave:
+                    results[key] = call(self._funcs[key], key)
+        return results
+
+def _cycles(dependencies):
+    """Componentes fortemente conexos com mais de um nó (algoritmo de Tarjan, sem recursão)"""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    cycles = []
+    for root in dependencies:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(dependencies[root]))]
+        while work:
+            node, edges = work[-1]
+            for dep in edges:
+                if dep not in index:
+                    # Desce para dep; a iteração das arestas de node continua depois
+                    index[dep] = low[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(dependencies[dep])))
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cycles.append(component)
+    return cycles
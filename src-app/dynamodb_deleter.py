@@ -0,0 +1,144 @@
+"""
+Exclusão de tabelas do DynamoDB dentro do limite de operações de controle simultâneas
+O DynamoDB aceita um número limitado de CreateTable/UpdateTable/DeleteTable em andamento
+por conta e região; acima dele, DeleteTable falha com LimitExceededException. As exclusões
+são disparadas em uma janela deslizante desse tamanho, reabastecida conforme o
+DescribeTable confirma que as tabelas sumiram
+"""
+
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import DELETE_WORKERS, REQUESTED, BoundedPool
+from completion_tracker import DELETED, FAILED
+
+# Operações de controle simultâneas por conta e região (cota padrão do DynamoDB)
+MAX_TABLE_OPERATIONS = 500
+
+# Backoff entre as consultas com DescribeTable enquanto a janela está cheia
+INITIAL_DELAY = 1
+MAX_DELAY = 20
+
+# Tempo máximo esperando a janela abrir espaço
+TIMEOUT = 1800
+
+# Depois de reduzida, a janela cresce 1 a cada WINDOW_GROWTH exclusões confirmadas
+WINDOW_GROWTH = 10
+
+class TableResult:
+    """Mudança de estado de uma tabela: REQUESTED, DELETED ou FAILED (com o erro)"""
+
+    __slots__ = ('name', 'status', 'error', 'seconds')
+
+    def __init__(self, name, status, error=None, seconds=None):
+        self.name = name
+        self.status = status
+        self.error = error
+        self.seconds = seconds
+
+class DynamoDBTableDeleter:
+    """Exclui tabelas de uma região mantendo no máximo window exclusões em andamento
+
+    Tabelas com deletion protection têm a proteção desligada antes. Tabelas
+    ocupadas (sendo criadas ou atualizadas) são tentadas de novo depois. Se a
+    conta tem um limite menor que window, o LimitExceededException reduz a
+    janela para as exclusões que estavam em andamento; ela volta a crescer,
+    até window, conforme as exclusões são confirmadas.
+    """
+
+    def __init__(self, client, window=MAX_TABLE_OPERATIONS, initial_delay=INITIAL_DELAY,
+                 max_delay=MAX_DELAY, timeout=TIMEOUT, workers=DELETE_WORKERS):
+        self.client = client
+        self.window = window
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.workers = workers
+
+    def delete_all(self, table_names):
+        """Gera um TableResult a cada exclusão pedida, confirmada ou que falhou
+
+        Termina assim que a última exclusão é pedida: as que ainda estiverem
+        em andamento ficam só com o REQUESTED, para o chamador acompanhar.
+        """
+        queue = deque(table_names)
+        busy = []
+        in_flight = {}
+        window = self.window
+        # Exclusões confirmadas desde o último ajuste da janela
+        confirmed = 0
+        delay = self.initial_delay
+        deadline = time.monotonic() + self.timeout
+        while queue or busy:
+            while queue and len(in_flight) < window:
+                name = queue.popleft()
+                start = time.monotonic()
+                try:
+                    self._delete(name)
+                except ClientError as e:
+                    code = e.response['Error']['Code']
+                    if code == 'LimitExceededException':
+                        # O limite da conta é o que já está em andamento
+                        queue.appendleft(name)
+                        window = max(1, len(in_flight))
+                        confirmed = 0
+                        print(f"    ⏳ DynamoDB table operation limit reached: keeping {window} deletions in flight")
+                        break
+                    if code == 'ResourceInUseException':
+                        busy.append(name)
+                    elif code == 'ResourceNotFoundException':
+                        yield TableResult(name, DELETED)
+                    else:
+                        yield TableResult(name, FAILED, e)
+                    continue
+                in_flight[name] = start
+                yield TableResult(name, REQUESTED, seconds=time.monotonic() - start)
+
+            if not queue and not busy:
+                return
+            if time.monotonic() + delay > deadline:
+                for name in list(queue) + busy:
+                    yield TableResult(name, FAILED, f"no free slot for DeleteTable after {self.timeout}s")
+                return
+            time.sleep(delay)
+            gone = self._poll(in_flight)
+            for name in gone:
+                yield TableResult(name, DELETED, seconds=time.monotonic() - in_flight.pop(name))
+            if window < self.window:
+                confirmed += len(gone)
+                window = min(self.window, window + confirmed // WINDOW_GROWTH)
+                confirmed %= WINDOW_GROWTH
+            # Com espaço livre, a próxima rodada volta a consultar logo
+            delay = self.initial_delay if gone else min(delay * 2, self.max_delay)
+            queue.extend(busy)
+            busy = []
+
+    def _delete(self, name):
+        try:
+            self.client.delete_table(TableName=name)
+        except ClientError as e:
+            error = e.response['Error']
+            if error['Code'] != 'ValidationException' or 'protect' not in error.get('Message', '').lower():
+                raise
+            print(f"    🔓 Disabling deletion protection of DynamoDB table {name}")
+            self.client.update_table(TableName=name, DeletionProtectionEnabled=False)
+            self.client.delete_table(TableName=name)
+
+    def _poll(self, in_flight):
+        """Tabelas em andamento que o DescribeTable já não encontra"""
+        def gone(name):
+            try:
+                self.client.describe_table(TableName=name)
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                    return True
+                raise
+            return False
+
+        with BoundedPool(self.workers) as pool:
+            for name in in_flight:
+                pool.submit(name, gone, name)
+        # Erro na consulta: a tabela continua na janela até a próxima rodada
+        return [name for name in pool.succeeded if pool.results[name]]
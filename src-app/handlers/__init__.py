@@ -0,0 +1,4 @@
+"""
+Listers e deleters de cada tipo de recurso, um módulo por serviço
+Importados sob demanda pelo registro em resource_handlers
+"""
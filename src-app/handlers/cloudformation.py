@@ -0,0 +1,59 @@
+"""
+Stacks do CloudFormation
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import REQUESTED, paginate
+from cloudformation_deleter import CloudFormationStackDeleter
+from completion_tracker import DELETED
+from resource_handlers import Resource
+
+# Stacks que podem ser excluídas (as em DELETE_FAILED são repetidas mantendo os recursos que falharam)
+STACK_STATUSES = ['CREATE_COMPLETE', 'UPDATE_COMPLETE', 'ROLLBACK_COMPLETE', 'UPDATE_ROLLBACK_COMPLETE', 'DELETE_FAILED']
+
+def list_stacks(cleaner, region):
+    """Stacks que podem ser excluídas, identificadas pelo nome (como no aws-nuke e no cleaner simples)
+
+    É pelo nome que os filtros do nuke-config.yml, os registros e o journal
+    identificam a stack; o DescribeStacks e o DeleteStack aceitam o nome.
+    """
+    cf = cleaner.clients.client('cloudformation', region)
+    stacks = cleaner.discover(
+        region, 'CloudFormationStack',
+        lambda: paginate(cf, 'list_stacks', 'StackSummaries', StackStatusFilter=STACK_STATUSES),
+        lambda ids: _describe_stacks(cf, ids)
+    )
+    for stack in stacks:
+        stack_id = stack['StackId']
+        yield Resource(
+            stack['StackName'], state=stack['StackStatus'], properties={'StackId': stack_id},
+            tags=lambda stack_id=stack_id: cf.describe_stacks(StackName=stack_id)['Stacks'][0].get('Tags')
+        )
+
+def _describe_stacks(cf, stack_names):
+    """Stacks do inventário (pelo nome) que ainda existem e podem ser excluídas"""
+    for stack_name in stack_names:
+        try:
+            stacks = cf.describe_stacks(StackName=stack_name)['Stacks']
+        except ClientError:
+            continue
+        yield from (stack for stack in stacks if stack['StackStatus'] in STACK_STATUSES)
+
+def delete_stacks(cleaner, region, stacks):
+    """Exclui as stacks em ondas, na ordem dos exports/imports entre elas
+
+    Cada onda é acompanhada até o fim; o tracker só fica com as que ainda
+    estiverem em andamento quando o tempo do deleter acabar.
+    """
+    states = {stack.id: stack.state for stack in stacks}
+    deleter = CloudFormationStackDeleter(cleaner.clients.client('cloudformation', region))
+    errors = []
+    for result in deleter.delete_all(list(states)):
+        if result.status == REQUESTED:
+            cleaner.tracker.track('CloudFormationStack', region, result.name, states[result.name])
+        elif result.status == DELETED:
+            cleaner.tracker.record('CloudFormationStack', region, result.name, DELETED, duration=result.seconds)
+        else:
+            errors.append((result.name, result.error))
+    return errors
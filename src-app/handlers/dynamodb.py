@@ -0,0 +1,35 @@
+"""
+Tabelas do DynamoDB
+"""
+
+from cleaner_common import REQUESTED, paginate
+from completion_tracker import DELETED
+from dynamodb_deleter import DynamoDBTableDeleter
+from resource_handlers import Resource
+
+def list_tables(cleaner, region):
+    dynamodb = cleaner.clients.client('dynamodb', region)
+    tables = cleaner.discover(region, 'DynamoDBTable', lambda: paginate(dynamodb, 'list_tables', 'TableNames'), iter)
+    for table_name in tables:
+        yield Resource(table_name, name=table_name, tags=lambda name=table_name: _tags(dynamodb, name))
+
+def _tags(dynamodb, table_name):
+    arn = dynamodb.describe_table(TableName=table_name)['Table']['TableArn']
+    return dynamodb.list_tags_of_resource(ResourceArn=arn).get('Tags')
+
+def delete_tables(cleaner, region, tables):
+    """Exclui as tabelas com no máximo o limite de operações do DynamoDB em andamento
+
+    DeleteTable é assíncrono; o tracker acompanha as que ainda não sumiram
+    quando a última exclusão é pedida.
+    """
+    deleter = DynamoDBTableDeleter(cleaner.clients.client('dynamodb', region))
+    errors = []
+    for result in deleter.delete_all([table.id for table in tables]):
+        if result.status == REQUESTED:
+            cleaner.tracker.track('DynamoDBTable', region, result.name)
+        elif result.status == DELETED:
+            cleaner.tracker.record('DynamoDBTable', region, result.name, DELETED, duration=result.seconds)
+        else:
+            errors.append((result.name, result.error))
+    return errors
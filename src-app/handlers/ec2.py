@@ -0,0 +1,142 @@
+"""
+Instâncias, volumes, AMIs, snapshots e security groups do EC2
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import BoundedPool, paginate, referenced_security_groups, stream_collection, terminate_instances as terminate_batch
+from completion_tracker import DELETED
+from deletion_scheduler import DeletionScheduler, DependencyCycleError
+from inventory_cache import filtered
+from resource_handlers import Resource
+
+def list_instances(cleaner, region):
+    ec2 = cleaner.clients.resource('ec2', region)
+    instances = cleaner.discover(
+        region, 'EC2Instance',
+        lambda: stream_collection(ec2.instances.all()),
+        lambda ids: filtered(lambda filters: ec2.instances.filter(Filters=filters), 'instance-id', ids)
+    )
+    for instance in instances:
+        yield Resource(instance.id, state=instance.state['Name'], tags=instance.tags)
+
+def terminate_instances(cleaner, region, instances):
+    """Termina um lote com TerminateInstances e acompanha o término, que libera volumes e security groups"""
+    pending_ids = []
+    for instance in instances:
+        if instance.state == 'terminated':
+            continue
+        cleaner.tracker.track('EC2Instance', region, instance.id, instance.state)
+        if instance.state != 'shutting-down':
+            pending_ids.append(instance.id)
+    return terminate_batch(cleaner.clients.client('ec2', region), pending_ids)
+
+def list_volumes(cleaner, region):
+    ec2 = cleaner.clients.resource('ec2', region)
+    volumes = cleaner.discover(
+        region, 'EBSVolume',
+        lambda: stream_collection(ec2.volumes.all()),
+        lambda ids: filtered(lambda filters: ec2.volumes.filter(Filters=filters), 'volume-id', ids)
+    )
+    # Volumes em uso só ficam livres depois que as instâncias terminam
+    for volume in volumes:
+        if volume.state != 'in-use':
+            yield Resource(volume.id, state=volume.state, tags=volume.tags)
+
+def delete_volume(cleaner, region, volumes):
+    cleaner.clients.client('ec2', region).delete_volume(VolumeId=volumes[0].id)
+
+def list_images(cleaner, region):
+    ec2 = cleaner.clients.client('ec2', region)
+    images = cleaner.discover(
+        region, 'AMI',
+        lambda: paginate(ec2, 'describe_images', 'Images', Owners=['self']),
+        lambda ids: filtered(
+            lambda filters: paginate(ec2, 'describe_images', 'Images', Owners=['self'], Filters=filters),
+            'image-id', ids
+        )
+    )
+    for image in images:
+        yield Resource(image['ImageId'], name=image.get('Name'), state=image.get('State'), tags=image.get('Tags'))
+
+def deregister_image(cleaner, region, images):
+    """O deregister libera os snapshots da AMI para serem excluídos"""
+    cleaner.clients.client('ec2', region).deregister_image(ImageId=images[0].id)
+
+def list_snapshots(cleaner, region):
+    ec2 = cleaner.clients.resource('ec2', region)
+    owner = [cleaner.account_id]
+    snapshots = cleaner.discover(
+        region, 'EBSSnapshot',
+        lambda: stream_collection(ec2.snapshots.filter(OwnerIds=owner)),
+        lambda ids: filtered(lambda filters: ec2.snapshots.filter(OwnerIds=owner, Filters=filters), 'snapshot-id', ids)
+    )
+    for snapshot in snapshots:
+        yield Resource(
+            snapshot.id, state=snapshot.state, tags=snapshot.tags,
+            properties={'Description': snapshot.description}
+        )
+
+def delete_snapshot(cleaner, region, snapshots):
+    cleaner.clients.client('ec2', region).delete_snapshot(SnapshotId=snapshots[0].id)
+
+def list_security_groups(cleaner, region):
+    """Security groups exceto o default, que não pode ser excluído"""
+    # Sempre lista todos: o grafo de referências precisa dos grupos que não estão no inventário
+    ec2 = cleaner.clients.client('ec2', region)
+    for sg in paginate(ec2, 'describe_security_groups', 'SecurityGroups'):
+        if sg['GroupName'] != 'default':
+            yield Resource(sg['GroupId'], name=sg['GroupName'], tags=sg.get('Tags'), data=sg)
+
+def delete_security_groups(cleaner, region, security_groups):
+    """Exclui os security groups em ondas, respeitando as referências entre eles"""
+    ec2 = cleaner.clients.client('ec2', region)
+    groups = {sg.id: sg.data for sg in security_groups}
+
+    # Um grupo referenciado nas regras de outro só pode ser excluído depois dele
+    scheduler = DeletionScheduler()
+    for group_id, sg in groups.items():
+        scheduler.add(group_id)
+        for referenced_id in referenced_security_groups(sg):
+            if referenced_id in groups:
+                scheduler.add_dependency(referenced_id, group_id)
+    try:
+        waves = scheduler.waves()
+    except DependencyCycleError as e:
+        # Referências circulares: remove as regras entre os grupos de cada ciclo
+        for cycle in map(set, e.cycles):
+            for group_id in cycle:
+                _revoke_references(ec2, groups[group_id], cycle)
+            scheduler.remove_dependencies(cycle)
+        waves = scheduler.waves()
+
+    # O grupo default não é excluído, então suas regras que apontam para os outros são removidas
+    default = [{'Name': 'group-name', 'Values': ['default']}]
+    for sg in paginate(ec2, 'describe_security_groups', 'SecurityGroups', Filters=default):
+        _revoke_references(ec2, sg, groups)
+
+    errors = []
+    for wave in waves:
+        with BoundedPool() as pool:
+            for group_id in wave:
+                pool.submit(group_id, ec2.delete_security_group, GroupId=group_id)
+        for group_id in pool.succeeded:
+            cleaner.tracker.record('SecurityGroup', region, group_id, DELETED, duration=pool.durations.get(group_id))
+        errors += pool.errors
+    return errors
+
+def _revoke_references(ec2, sg, group_ids):
+    """Remove as regras de sg que referenciam algum dos security groups em group_ids"""
+    for key, revoke in [
+        ('IpPermissions', ec2.revoke_security_group_ingress),
+        ('IpPermissionsEgress', ec2.revoke_security_group_egress)
+    ]:
+        permissions = [
+            permission for permission in sg.get(key, [])
+            if any(pair.get('GroupId') in group_ids for pair in permission.get('UserIdGroupPairs', []))
+        ]
+        if permissions:
+            try:
+                revoke(GroupId=sg['GroupId'], IpPermissions=permissions)
+            except ClientError as e:
+                print(f"    ⚠️  Cannot revoke rules of security group {sg['GroupId']}: {e}")
@@ -0,0 +1,32 @@
+"""
+Ambientes do Elastic Beanstalk
+"""
+
+from cleaner_common import chunked, paginate
+from inventory_cache import RECHECK_BATCH_SIZE
+from resource_handlers import Resource
+
+def list_environments(cleaner, region):
+    eb = cleaner.clients.client('elasticbeanstalk', region)
+    environments = cleaner.discover(
+        region, 'ElasticBeanstalkEnvironment',
+        lambda: paginate(eb, 'describe_environments', 'Environments', IncludeDeleted=False),
+        # O inventário (e o journal) guarda o EnvironmentId, não o nome
+        lambda ids: (
+            env
+            for batch in chunked(ids, RECHECK_BATCH_SIZE)
+            for env in paginate(eb, 'describe_environments', 'Environments', EnvironmentIds=batch, IncludeDeleted=False)
+        )
+    )
+    for env in environments:
+        arn = env['EnvironmentArn']
+        yield Resource(
+            env['EnvironmentId'], name=env['EnvironmentName'], state=env['Status'],
+            tags=lambda arn=arn: eb.list_tags_for_resource(ResourceArn=arn).get('ResourceTags')
+        )
+
+def terminate_environment(cleaner, region, environments):
+    """O término exclui as stacks, instâncias e security groups do ambiente"""
+    env = environments[0]
+    cleaner.clients.client('elasticbeanstalk', region).terminate_environment(EnvironmentId=env.id)
+    cleaner.tracker.track('ElasticBeanstalkEnvironment', region, env.id, env.state)
@@ -0,0 +1,237 @@
+"""
+Usuários, roles e políticas gerenciadas do IAM
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import BoundedPool, paginate
+from resource_handlers import Resource
+
+# Roles essenciais que não devem ser excluídas (nomes que contêm estes trechos)
+ESSENTIAL_ROLES = ['OrganizationAccountAccessRole', 'AWSServiceRoleFor']
+
+def list_users(cleaner, region):
+    """Usuários IAM, exceto o usuário das credenciais em uso"""
+    iam = cleaner.clients.client('iam')
+    try:
+        current_user = iam.get_user()['User']['UserName']
+    except Exception:
+        current_user = None
+    for user in paginate(iam, 'list_users', 'Users'):
+        user_name = user['UserName']
+        if user_name == current_user:
+            print(f"    ⏭️  Skipping current user: {user_name}")
+            continue
+        yield Resource(user_name, name=user_name, tags=lambda user_name=user_name: iam.list_user_tags(UserName=user_name)['Tags'])
+
+def delete_user(cleaner, region, users):
+    """Remove tudo o que prende o usuário (etapas em paralelo) e depois o exclui"""
+    iam = cleaner.clients.client('iam')
+    user_name = users[0].id
+    _teardown(iam, user_name, USER_STEPS)
+    iam.delete_user(UserName=user_name)
+
+def _delete_access_keys(iam, user_name):
+    for key in paginate(iam, 'list_access_keys', 'AccessKeyMetadata', prefetch_pages=0, UserName=user_name):
+        iam.delete_access_key(UserName=user_name, AccessKeyId=key['AccessKeyId'])
+
+def _detach_user_policies(iam, user_name):
+    # A remoção das políticas pode ter desanexado a mesma política ao mesmo tempo
+    for policy in paginate(iam, 'list_attached_user_policies', 'AttachedPolicies', prefetch_pages=0, UserName=user_name):
+        _ignore_missing(iam.detach_user_policy, UserName=user_name, PolicyArn=policy['PolicyArn'])
+
+def _delete_user_inline_policies(iam, user_name):
+    for policy_name in paginate(iam, 'list_user_policies', 'PolicyNames', prefetch_pages=0, UserName=user_name):
+        iam.delete_user_policy(UserName=user_name, PolicyName=policy_name)
+
+def _remove_from_groups(iam, user_name):
+    for group in paginate(iam, 'list_groups_for_user', 'Groups', prefetch_pages=0, UserName=user_name):
+        iam.remove_user_from_group(GroupName=group['GroupName'], UserName=user_name)
+
+def _delete_login_profile(iam, user_name):
+    # Usuários sem acesso ao console não têm login profile
+    _ignore_missing(iam.delete_login_profile, UserName=user_name)
+
+def _delete_mfa_devices(iam, user_name):
+    for device in paginate(iam, 'list_mfa_devices', 'MFADevices', prefetch_pages=0, UserName=user_name):
+        serial_number = device['SerialNumber']
+        iam.deactivate_mfa_device(UserName=user_name, SerialNumber=serial_number)
+        # Dispositivos virtuais continuam na conta depois de desativados; os de hardware não têm ARN de mfa/
+        if ':mfa/' in serial_number:
+            iam.delete_virtual_mfa_device(SerialNumber=serial_number)
+
+def _delete_signing_certificates(iam, user_name):
+    for certificate in paginate(iam, 'list_signing_certificates', 'Certificates', prefetch_pages=0, UserName=user_name):
+        iam.delete_signing_certificate(UserName=user_name, CertificateId=certificate['CertificateId'])
+
+def _delete_ssh_public_keys(iam, user_name):
+    for key in paginate(iam, 'list_ssh_public_keys', 'SSHPublicKeys', prefetch_pages=0, UserName=user_name):
+        iam.delete_ssh_public_key(UserName=user_name, SSHPublicKeyId=key['SSHPublicKeyId'])
+
+# Tudo o que faz DeleteUser falhar com DeleteConflict; as etapas são independentes entre si
+USER_STEPS = [
+    _delete_access_keys,
+    _detach_user_policies,
+    _delete_user_inline_policies,
+    _remove_from_groups,
+    _delete_login_profile,
+    _delete_mfa_devices,
+    _delete_signing_certificates,
+    _delete_ssh_public_keys,
+]
+
+def list_roles(cleaner, region):
+    """Roles IAM, exceto as essenciais para o acesso à conta e as ligadas a serviços"""
+    iam = cleaner.clients.client('iam')
+    for role in paginate(iam, 'list_roles', 'Roles'):
+        role_name = role['RoleName']
+        if any(essential in role_name for essential in ESSENTIAL_ROLES):
+            print(f"    ⏭️  Skipping essential role: {role_name}")
+            continue
+        yield Resource(
+            role_name, name=role_name, properties={'Path': role.get('Path')},
+            tags=lambda role_name=role_name: iam.list_role_tags(RoleName=role_name)['Tags']
+        )
+
+def delete_role(cleaner, region, roles):
+    """Remove tudo o que prende a role (etapas em paralelo) e depois a exclui"""
+    iam = cleaner.clients.client('iam')
+    role_name = roles[0].id
+    _teardown(iam, role_name, ROLE_STEPS)
+    iam.delete_role(RoleName=role_name)
+
+def _detach_role_policies(iam, role_name):
+    for policy in paginate(iam, 'list_attached_role_policies', 'AttachedPolicies', prefetch_pages=0, RoleName=role_name):
+        _ignore_missing(iam.detach_role_policy, RoleName=role_name, PolicyArn=policy['PolicyArn'])
+
+def _delete_role_inline_policies(iam, role_name):
+    for policy_name in paginate(iam, 'list_role_policies', 'PolicyNames', prefetch_pages=0, RoleName=role_name):
+        iam.delete_role_policy(RoleName=role_name, PolicyName=policy_name)
+
+def _delete_instance_profiles(iam, role_name):
+    """Tira a role dos instance profiles e os exclui (um instance profile tem no máximo uma role)"""
+    for profile in paginate(iam, 'list_instance_profiles_for_role', 'InstanceProfiles', prefetch_pages=0, RoleName=role_name):
+        profile_name = profile['InstanceProfileName']
+        iam.remove_role_from_instance_profile(InstanceProfileName=profile_name, RoleName=role_name)
+        iam.delete_instance_profile(InstanceProfileName=profile_name)
+
+ROLE_STEPS = [
+    _detach_role_policies,
+    _delete_role_inline_policies,
+    _delete_instance_profiles,
+]
+
+def _teardown(iam, principal, steps):
+    """Executa as etapas de remoção de um usuário ou role em paralelo
+
+    Cada etapa lista e remove um tipo de vínculo. O limitador de taxa da
+    sessão segura as chamadas ao IAM de todos os principais ao mesmo tempo.
+    Levanta o primeiro erro depois que todas as etapas terminam.
+    """
+    with BoundedPool(len(steps)) as pool:
+        for step in steps:
+            pool.submit(step.__name__, step, iam, principal)
+    if pool.errors:
+        raise pool.errors[0][1]
+
+def _ignore_missing(call, **kwargs):
+    """Executa call ignorando NoSuchEntity (o vínculo já foi removido)"""
+    try:
+        call(**kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchEntity':
+            raise
+
+class Caller:
+    """Principais das credenciais em uso, que a remoção das políticas não pode tocar
+
+    Desanexar deles uma política gerenciada pela conta tiraria o acesso da
+    própria execução no meio da limpeza (as ondas seguintes falhariam com AccessDenied).
+    """
+
+    __slots__ = ('user', 'groups', 'role')
+
+    def __init__(self, user=None, groups=(), role=None):
+        self.user = user
+        self.groups = frozenset(groups)
+        self.role = role
+
+    def holds(self, kind, name):
+        """True se o usuário, grupo ou role é das credenciais em uso"""
+        if kind == 'user':
+            return name == self.user
+        if kind == 'group':
+            return name in self.groups
+        return kind == 'role' and name == self.role
+
+def _caller(cleaner, iam):
+    """Usuário (e grupos dele) ou role das credenciais em uso"""
+    try:
+        arn = cleaner.clients.client('sts').get_caller_identity()['Arn']
+    except Exception as e:
+        print(f"    ⚠️  Cannot identify the credentials in use: {e}")
+        return Caller()
+    resource = arn.split(':', 5)[-1]
+    if resource.startswith('user/'):
+        user_name = resource.split('/')[-1]
+        groups = [group['GroupName'] for group in paginate(iam, 'list_groups_for_user', 'Groups', UserName=user_name)]
+        return Caller(user=user_name, groups=groups)
+    if resource.startswith('assumed-role/'):
+        return Caller(role=resource.split('/')[1])
+    return Caller()
+
+def list_policies(cleaner, region):
+    """Políticas gerenciadas pela própria conta
+
+    As credenciais em uso são identificadas uma única vez e vão no data de
+    cada política, para o deleter não desanexá-la delas.
+    """
+    iam = cleaner.clients.client('iam')
+    caller = _caller(cleaner, iam)
+    for policy in paginate(iam, 'list_policies', 'Policies', Scope='Local'):
+        policy_arn = policy['Arn']
+        yield Resource(
+            policy_arn, name=policy['PolicyName'], data=caller,
+            tags=lambda policy_arn=policy_arn: iam.list_policy_tags(PolicyArn=policy_arn)['Tags']
+        )
+
+# Parâmetro do Detach*Policy e chave do ListEntitiesForPolicy de cada tipo de principal
+ENTITY_KINDS = [
+    ('group', 'PolicyGroups', 'GroupName'),
+    ('user', 'PolicyUsers', 'UserName'),
+    ('role', 'PolicyRoles', 'RoleName'),
+]
+
+def delete_policy(cleaner, region, policies):
+    """Desanexa a política de todos os usuários, grupos e roles e exclui as versões, em paralelo, e depois a política
+
+    Não depende da remoção dos usuários e roles ter rodado antes: os anexos
+    vêm do ListEntitiesForPolicy, que também inclui os grupos. Uma política
+    anexada às credenciais em uso não é tocada e volta como não excluída.
+    """
+    iam = cleaner.clients.client('iam')
+    policy = policies[0]
+    policy_arn = policy.id
+    caller = policy.data or Caller()
+    entities = [
+        (kind, key, entity[key])
+        for page in iam.get_paginator('list_entities_for_policy').paginate(PolicyArn=policy_arn)
+        for kind, page_key, key in ENTITY_KINDS
+        for entity in page.get(page_key, [])
+    ]
+    held = [f"{kind} {name}" for kind, _, name in entities if caller.holds(kind, name)]
+    if held:
+        return [(policy_arn, f"attached to the credentials in use ({', '.join(held)}); kept so the run keeps its access")]
+    detach = {'group': iam.detach_group_policy, 'user': iam.detach_user_policy, 'role': iam.detach_role_policy}
+    with BoundedPool() as pool:
+        for kind, key, name in entities:
+            pool.submit((kind, name), _ignore_missing, detach[kind], PolicyArn=policy_arn, **{key: name})
+        # A versão padrão só sai junto com a política
+        for version in paginate(iam, 'list_policy_versions', 'Versions', prefetch_pages=0, PolicyArn=policy_arn):
+            if not version['IsDefaultVersion']:
+                pool.submit(('version', version['VersionId']), iam.delete_policy_version,
+                            PolicyArn=policy_arn, VersionId=version['VersionId'])
+    if pool.errors:
+        (kind, name), error = pool.errors[0]
+        raise RuntimeError(f"Cannot remove {kind} {name} of the policy: {error}")
+    iam.delete_policy(PolicyArn=policy_arn)
@@ -0,0 +1,28 @@
+"""
+Funções do Lambda
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import paginate
+from resource_handlers import Resource
+
+def list_functions(cleaner, region):
+    lambda_client = cleaner.clients.client('lambda', region)
+    # Sem consulta em lote para funções: a própria exclusão revalida o inventário
+    functions = cleaner.discover(
+        region, 'LambdaFunction',
+        lambda: paginate(lambda_client, 'list_functions', 'Functions'),
+        lambda ids: ({'FunctionName': name} for name in ids)
+    )
+    for function in functions:
+        name = function['FunctionName']
+        yield Resource(name, name=name, tags=lambda name=name: lambda_client.get_function(FunctionName=name).get('Tags'))
+
+def delete_function(cleaner, region, functions):
+    # Com um inventário em cache a função pode já ter sido excluída: o objetivo foi atingido
+    try:
+        cleaner.clients.client('lambda', region).delete_function(FunctionName=functions[0].id)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
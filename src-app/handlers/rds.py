@@ -0,0 +1,30 @@
+"""
+Instâncias do RDS
+"""
+
+from cleaner_common import paginate
+from inventory_cache import filtered
+from resource_handlers import Resource
+
+def list_instances(cleaner, region):
+    rds = cleaner.clients.client('rds', region)
+    instances = cleaner.discover(
+        region, 'RDSInstance',
+        lambda: paginate(rds, 'describe_db_instances', 'DBInstances'),
+        lambda ids: filtered(
+            lambda filters: paginate(rds, 'describe_db_instances', 'DBInstances', Filters=filters),
+            'db-instance-id', ids
+        )
+    )
+    for instance in instances:
+        yield Resource(instance['DBInstanceIdentifier'], state=instance['DBInstanceStatus'], tags=instance.get('TagList'))
+
+def delete_instance(cleaner, region, instances):
+    """Exclui sem snapshot final; a exclusão é acompanhada até liberar os security groups"""
+    instance = instances[0]
+    cleaner.clients.client('rds', region).delete_db_instance(
+        DBInstanceIdentifier=instance.id,
+        SkipFinalSnapshot=True,
+        DeleteAutomatedBackups=True
+    )
+    cleaner.tracker.track('RDSInstance', region, instance.id, instance.state)
@@ -0,0 +1,36 @@
+"""
+Buckets do S3
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import GLOBAL_REGION, stream_collection
+from completion_tracker import DELETED
+from resource_handlers import Resource
+from s3_emptier import S3BucketEmptier
+
+def list_buckets(cleaner, region):
+    s3 = cleaner.clients.resource('s3')
+    for bucket in stream_collection(s3.buckets.all()):
+        yield Resource(bucket.name, name=bucket.name, tags=lambda name=bucket.name: _tags(s3.meta.client, name))
+
+def _tags(s3, bucket_name):
+    # Um bucket sem tags responde NoSuchTagSet
+    try:
+        return s3.get_bucket_tagging(Bucket=bucket_name)['TagSet']
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchTagSet':
+            return []
+        raise
+
+def empty_and_delete_buckets(cleaner, region, buckets):
+    """Esvazia (versões, delete markers e multipart uploads) e exclui vários buckets ao mesmo tempo"""
+    errors = []
+    for result in S3BucketEmptier(cleaner.clients).empty_and_delete_all([bucket.id for bucket in buckets]):
+        if result.deleted:
+            print(f"    {result.summary()}")
+            cleaner.tracker.record('S3Bucket', GLOBAL_REGION, result.name, DELETED, duration=result.seconds)
+        else:
+            key, error = result.errors[0]
+            errors.append((result.name, f"{len(result.errors)} errors, {key}: {error}"))
+    return errors
@@ -0,0 +1,134 @@
+"""
+Inventário de recursos e cache do inventário descoberto no dry-run
+Guarda apenas os identificadores dos recursos encontrados, por conta e regiões, para
+que a execução logo depois do dry-run comece a excluir sem listar a conta de novo
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from cleaner_common import chunked
+
+# Tempo que um inventário continua válido depois do dry-run
+INVENTORY_TTL = 600
+
+# Inventários mantidos ao mesmo tempo (os usados há mais tempo saem primeiro)
+INVENTORY_MAX_ENTRIES = 32
+
+# IDs por chamada ao revalidar um inventário em cache (limite dos filtros do RDS)
+RECHECK_BATCH_SIZE = 100
+
+class Inventory:
+    """Identificadores encontrados por (região, tipo de recurso)
+
+    Um tipo só conta como inventariado depois que a sua listagem terminou sem
+    erro (complete); tipos incompletos voltam a ser listados na execução.
+    """
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self._ids = {}
+        self._complete = set()
+        self._lock = threading.Lock()
+
+    def add(self, region, resource_type, resource_id):
+        with self._lock:
+            self._ids.setdefault((region, resource_type), []).append(resource_id)
+
+    def complete(self, region, resource_type):
+        """Marca a listagem do tipo na região como concluída"""
+        with self._lock:
+            self._complete.add((region, resource_type))
+
+    def get(self, region, resource_type):
+        """IDs do tipo na região, ou None se ele não foi inventariado por completo"""
+        with self._lock:
+            if (region, resource_type) not in self._complete:
+                return None
+            return list(self._ids.get((region, resource_type), []))
+
+    def found(self, region, resource_type):
+        """IDs do tipo na região já encontrados, mesmo que o tipo não tenha sido inventariado por completo"""
+        with self._lock:
+            return list(self._ids.get((region, resource_type), []))
+
+    def age(self):
+        """Segundos desde a criação do inventário"""
+        return time.monotonic() - self.created_at
+
+class InventoryCache:
+    """Cache LRU com TTL de inventários por (conta, regiões)"""
+
+    def __init__(self, ttl=INVENTORY_TTL, max_entries=INVENTORY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(account_id, regions):
+        return account_id, tuple(sorted(regions))
+
+    def get(self, account_id, regions):
+        """Inventário ainda válido da conta e regiões, ou None"""
+        key = self.key(account_id, regions)
+        with self._lock:
+            inventory = self._entries.get(key)
+            if inventory is None:
+                return None
+            if inventory.age() > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return inventory
+
+    def put(self, account_id, regions, inventory):
+        key = self.key(account_id, regions)
+        with self._lock:
+            self._entries[key] = inventory
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account_id, regions):
+        """Descarta o inventário (por exemplo, depois que os recursos foram excluídos)"""
+        with self._lock:
+            self._entries.pop(self.key(account_id, regions), None)
+
+def discover(region, resource_type, list_all, recheck, item_id, inventory=None, cached=None):
+    """Itera sobre os recursos de um tipo: revalida os IDs de um inventário pronto ou lista a conta
+
+    O inventário pronto (cached) pode vir do dry-run ou da Tagging API; tipos
+    que ele não cobre por completo são listados, mas os IDs que ele já tem são
+    revalidados antes (com item_id, sem repetir na listagem). Os recursos
+    encontrados são registrados em inventory, e o tipo é marcado como completo
+    quando a iteração termina.
+    """
+    ids = cached.get(region, resource_type) if cached else None
+    if ids is not None:
+        items = recheck(ids)
+    else:
+        found = cached.found(region, resource_type) if cached else []
+        items = _found_first(found, list_all, recheck, item_id) if found else list_all()
+    for item in items:
+        if inventory is not None:
+            inventory.add(region, resource_type, item_id(item))
+        yield item
+    if inventory is not None:
+        inventory.complete(region, resource_type)
+
+def _found_first(ids, list_all, recheck, item_id):
+    seen = set()
+    for item in recheck(ids):
+        if item_id is not None:
+            seen.add(item_id(item))
+        yield item
+    for item in list_all():
+        if item_id is None or item_id(item) not in seen:
+            yield item
+
+def filtered(list_filtered, name, ids):
+    """Recursos cujo ID está em ids, consultados em lotes com um filtro da API"""
+    for batch in chunked(ids, RECHECK_BATCH_SIZE):
+        yield from list_filtered([{'Name': name, 'Values': batch}])
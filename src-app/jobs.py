@@ -0,0 +1,241 @@
+"""
+Execuções assíncronas do AWS Resource Cleaner
+Cada execução vira um job com ID, estado consultável e o output gravado linha a
+linha em um arquivo temporário enquanto roda, para ser paginado ou transmitido
+via Server-Sent Events sem manter o output inteiro em memória
+"""
+
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+
+# Estados de um job
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Jobs terminados mantidos em memória para consulta
+JOB_HISTORY = 100
+
+# Linhas mais recentes de cada job mantidas em memória
+LOG_BUFFER_LINES = 1000
+
+# A cada quantas linhas a posição no arquivo é indexada (para ler a partir de um offset)
+LOG_INDEX_INTERVAL = 1000
+
+# Linhas por página de /api/jobs/<id>/output (padrão e máximo)
+PAGE_LIMIT = 1000
+MAX_PAGE_LIMIT = 10000
+
+# Intervalo entre comentários de keep-alive no stream SSE, para proxies não derrubarem a conexão
+KEEPALIVE_SECONDS = 15
+
+class JobLog:
+    """Output de um job em um arquivo temporário, com as linhas recentes em um ring buffer
+
+    A memória usada fica limitada ao ring buffer e a um índice esparso com a
+    posição de uma a cada index_interval linhas. O arquivo é removido ao fechar.
+    """
+
+    def __init__(self, buffer_lines=LOG_BUFFER_LINES, index_interval=LOG_INDEX_INTERVAL):
+        self.index_interval = index_interval
+        self.count = 0
+        self._recent = deque(maxlen=buffer_lines)
+        self._index = []
+        self._file = tempfile.TemporaryFile(prefix='cleaner-job-', suffix='.log')
+        self._lock = threading.Lock()
+
+    def append(self, line):
+        """Grava uma linha (sem a quebra de linha) e retorna o seu offset"""
+        with self._lock:
+            position = self._file.seek(0, 2)
+            if self.count % self.index_interval == 0:
+                self._index.append(position)
+            self._file.write(line.encode('utf-8') + b'\n')
+            self._recent.append(line)
+            self.count += 1
+            return self.count - 1
+
+    def read(self, offset=0, limit=PAGE_LIMIT):
+        """Até limit linhas a partir de offset: do ring buffer se ainda estiverem nele, senão do arquivo"""
+        with self._lock:
+            end = min(self.count, offset + limit)
+            if offset >= end:
+                return []
+            first_recent = self.count - len(self._recent)
+            if offset >= first_recent:
+                return list(islice(self._recent, offset - first_recent, end - first_recent))
+
+            block = offset // self.index_interval
+            self._file.seek(self._index[block])
+            lines = []
+            for line_number in range(block * self.index_interval, end):
+                raw = self._file.readline()
+                if line_number >= offset:
+                    lines.append(raw[:-1].decode('utf-8'))
+            return lines
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class JobOutput:
+    """Stream de output de um job: cada linha completa vai para o JobLog"""
+
+    def __init__(self, job):
+        self.job = job
+        self._partial = ''
+        # A thread do job e as dos pools dela escrevem no mesmo stream
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        with self._lock:
+            lines = (self._partial + data).split('\n')
+            self._partial = lines.pop()
+        for line in lines:
+            self.job.append_output(line)
+        return len(data)
+
+    def write_line(self, line):
+        """Grava uma linha pronta (usado pelo GroupedRunner para não acumular o output das regiões)"""
+        self.job.append_output(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Grava o que sobrou sem quebra de linha no fim"""
+        if self._partial:
+            self.job.append_output(self._partial)
+            self._partial = ''
+
+class Job:
+    """Uma execução do cleaner; nunca guarda as credenciais usadas"""
+
+    def __init__(self, region, dry_run):
+        self.id = uuid.uuid4().hex
+        self.region = region
+        self.dry_run = dry_run
+        self.status = QUEUED
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.log = JobLog()
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def append_output(self, line):
+        """Grava uma linha de output e acorda quem está acompanhando o stream"""
+        with self._condition:
+            self.log.append(line)
+            self._condition.notify_all()
+
+    def wait_output(self, offset, limit=PAGE_LIMIT, timeout=None):
+        """Linhas a partir de offset, esperando até timeout por novas se ainda não houver
+
+        Retorna lista vazia se o tempo acabou ou o job terminou sem novas linhas.
+        """
+        with self._condition:
+            if offset >= self.log.count and not self.finished:
+                self._condition.wait(timeout)
+        return self.log.read(offset, limit)
+
+    def wait(self, timeout=None):
+        """Espera o job terminar; retorna False se o tempo acabou antes"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.finished, timeout)
+
+    def start(self):
+        with self._condition:
+            self.started_at = time.time()
+            self.status = RUNNING
+            self._condition.notify_all()
+
+    def finish(self, result):
+        # O estado final muda junto com a notificação, para o stream não perder o fim
+        with self._condition:
+            self.result = result
+            self.finished_at = time.time()
+            self.status = SUCCEEDED if result['success'] else FAILED
+            self._condition.notify_all()
+
+    def close(self):
+        """Remove o arquivo de output"""
+        self.log.close()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'region': self.region,
+            'dry_run': self.dry_run,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'output_lines': self.log.count,
+        }
+        if self.result is not None:
+            data.update(
+                success=self.result['success'],
+                error=self.result['error'],
+                return_code=self.result['return_code'],
+                metrics=self.result.get('metrics')
+            )
+        return data
+
+class JobManager:
+    """Cria jobs, executa-os no InProcessRunner e guarda os mais recentes"""
+
+    def __init__(self, runner, history=JOB_HISTORY):
+        self.runner = runner
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, access_key, secret_key, region, dry_run=True):
+        """Agenda uma execução e retorna o job imediatamente"""
+        job = Job(region, dry_run)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self.runner.submit_job(job, access_key, secret_key)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        # Descarta os jobs terminados mais antigos além do limite do histórico
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            self._jobs.pop(job_id).close()
+
+def sse_stream(job, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+    """Gera o stream SSE de um job, retomando depois de last_event_id se informado
+
+    Cada linha de output é um evento 'output' cujo ID é o offset da linha; o
+    stream termina com um evento 'done' com o estado final do job.
+    """
+    yield f"event: status\ndata: {json.dumps({'status': job.status})}\n\n"
+    offset = int(last_event_id) + 1 if last_event_id is not None else 0
+    while True:
+        lines = job.wait_output(offset, timeout=keepalive)
+        for line in lines:
+            yield f"id: {offset}\nevent: output\ndata: {json.dumps({'line': line}, ensure_ascii=False)}\n\n"
+            offset += 1
+        if lines:
+            continue
+        if job.finished:
+            yield f"event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            return
+        yield ': keep-alive\n\n'
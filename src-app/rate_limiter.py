@@ -0,0 +1,151 @@
+"""
+Limite de taxa adaptativo por serviço e região
+Um token bucket por serviço AWS e região na frente de todos os clients da sessão: reduz a taxa
+quando a API responde com throttling e volta a subir aos poucos com as respostas bem-sucedidas
+"""
+
+import time
+import threading
+
+from botocore.config import Config
+
+# Códigos de erro que indicam throttling (variam conforme o serviço)
+THROTTLE_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'SlowDown',
+}
+
+# Os limites da AWS são por região; os serviços globais têm um só limite para a conta
+GLOBAL_SERVICES = {'iam', 'sts', 's3-control'}
+
+# Taxa máxima (chamadas por segundo) de cada serviço; serviços fora da lista usam DEFAULT_MAX_RATE
+MAX_RATES = {
+    'iam': 10,
+    'cloudformation': 10,
+    'elastic-beanstalk': 10,
+    'sts': 10,
+}
+DEFAULT_MAX_RATE = 50
+
+# Taxa mínima, para o bucket nunca travar de vez
+MIN_RATE = 0.5
+
+# Ajuste da taxa: cai pela metade a cada throttling e sobe RATE_INCREASE a cada sucesso
+RATE_DECREASE = 0.5
+RATE_INCREASE = 0.5
+
+# Tentativas por chamada; o modo standard do botocore repete as respostas de throttling
+# (combinado pelo ClientPool ao Config de cada client)
+RETRY_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'standard'})
+
+class TokenBucket:
+    """Token bucket com taxa ajustável (aumento aditivo, redução multiplicativa)"""
+
+    def __init__(self, max_rate, min_rate=MIN_RATE):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self.throttles = 0
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        # Acumula no máximo um segundo de tokens, para não liberar rajadas depois de ociosidade
+        self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """Espera até haver um token disponível e o consome"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def throttled(self):
+        """Reduz a taxa e descarta os tokens acumulados depois de um throttling"""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        """Aumenta a taxa aos poucos até o máximo do serviço"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+class AdaptiveRateLimiter:
+    """Um TokenBucket por serviço e região, ligado aos eventos do botocore de uma sessão"""
+
+    def __init__(self, max_rates=None, default_max_rate=DEFAULT_MAX_RATE):
+        self.max_rates = dict(MAX_RATES, **(max_rates or {}))
+        self.default_max_rate = default_max_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, service, region=None):
+        """TokenBucket do serviço na região (o mesmo para todas as regiões nos serviços globais)
+
+        Throttling em uma região não reduz a taxa das outras.
+        """
+        key = (service, None if service in GLOBAL_SERVICES else region)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.max_rates.get(service, self.default_max_rate))
+            return self._buckets[key]
+
+    def install(self, session):
+        """Passa todas as chamadas dos clients criados por session pelo limitador
+
+        Os handlers são registrados nos eventos da sessão, que são copiados para
+        cada client e resource criados depois (inclusive os de outros módulos).
+        A política de retry (RETRY_CONFIG) vem do Config dos clients do ClientPool.
+        """
+        session.events.register('before-send', self._before_send)
+        session.events.register('needs-retry', self._needs_retry)
+        return self
+
+    def throttles(self):
+        """Quantidade de respostas com throttling por serviço (somando as regiões)"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        throttles = {}
+        for (service, _), bucket in buckets.items():
+            if bucket.throttles:
+                throttles[service] = throttles.get(service, 0) + bucket.throttles
+        return throttles
+
+    def _before_send(self, event_name, request=None, **kwargs):
+        # Cada tentativa (inclusive os retries) consome um token
+        self.bucket(_service(event_name), _region(getattr(request, 'context', None))).acquire()
+
+    def _needs_retry(self, event_name, response=None, caught_exception=None, request_dict=None, **kwargs):
+        # Só observa a resposta; a decisão de repetir continua com o botocore
+        if response is None:
+            return
+        http_response, parsed = response
+        code = parsed.get('Error', {}).get('Code')
+        bucket = self.bucket(_service(event_name), _region((request_dict or {}).get('context')))
+        if code in THROTTLE_CODES or http_response.status_code == 429:
+            bucket.throttled()
+        elif http_response.status_code < 400:
+            bucket.succeeded()
+
+def _service(event_name):
+    """Nome do serviço em eventos como 'before-send.ec2.DescribeInstances'"""
+    return event_name.split('.')[1]
+
+def _region(context):
+    """Região do client que fez a chamada, guardada pelo botocore no contexto da requisição"""
+    return (context or {}).get('client_region')
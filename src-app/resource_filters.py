@@ -0,0 +1,203 @@
+"""
+Filtros de proteção no formato do nuke-config.yml (aws-nuke)
+Os filtros da conta são compilados uma única vez: valores exatos e tags viram conjuntos
+consultados por hash e os globs, regex e 'contains' de cada propriedade viram uma única
+expressão regular, então a checagem de cada recurso descoberto custa praticamente O(1)
+"""
+
+import re
+import fnmatch
+
+import yaml
+
+# Tipos de filtro suportados ('type' no config)
+EXACT = 'exact'
+GLOB = 'glob'
+REGEX = 'regex'
+CONTAINS = 'contains'
+
+# Propriedade comparada pelos filtros escritos só como texto (o identificador do recurso)
+ID_PROPERTY = 'ID'
+
+# Propriedades 'tag:Chave' comparam o valor da tag Chave
+TAG_PREFIX = 'tag:'
+
+# Filtros que valem para todos os tipos de recurso
+GLOBAL_FILTERS = '__global__'
+
+# Nomes de tipo do aws-nuke que diferem dos usados pelos cleaners
+NUKE_RESOURCE_TYPES = {
+    'EC2Volume': 'EBSVolume',
+    'EC2Snapshot': 'EBSSnapshot',
+    'EC2Image': 'AMI',
+    'EC2SecurityGroup': 'SecurityGroup',
+    'CloudformationStack': 'CloudFormationStack',
+}
+
+class FilterConfigError(Exception):
+    """Config de filtros inválida ou com um tipo de filtro não suportado"""
+
+def load_config(path):
+    """Lê um nuke-config.yml"""
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+def blocked(config, account_id):
+    """True se a conta está na account-blocklist do config"""
+    return str(account_id) in {str(account) for account in config.get('account-blocklist') or []}
+
+# Flags no início de uma regex (ex.: '(?i)^prod'), que só valem no início da expressão inteira
+LEADING_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+def _pattern(filter_type, value):
+    """Expressão regular (para re.search) equivalente a um filtro não exato
+
+    As regex são unidas às dos outros filtros da propriedade, então as flags
+    do início viram um grupo com escopo: '(?i)^prod' -> '(?i:^prod)'.
+    """
+    if filter_type == GLOB:
+        return '^' + fnmatch.translate(value)
+    if filter_type == REGEX:
+        flags = LEADING_FLAGS.match(value)
+        pattern = f"(?{flags.group(1)}:{value[flags.end():]})" if flags else value
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise FilterConfigError(f"Regex inválida no filtro: {value} ({e})")
+        return pattern
+    return re.escape(value)
+
+def _filter_type(rule, value):
+    # Sem 'type', valores com curingas (ex.: 'important-*' do FILTERED_CONFIG) são globs
+    filter_type = rule.get('type')
+    if filter_type is None:
+        return GLOB if any(char in value for char in '*?[') else EXACT
+    if filter_type not in (EXACT, GLOB, REGEX, CONTAINS):
+        raise FilterConfigError(f"Tipo de filtro não suportado: {filter_type}")
+    return filter_type
+
+class ValueMatcher:
+    """Compara o valor de uma propriedade com todos os filtros dela de uma vez"""
+
+    def __init__(self):
+        self.exact = set()
+        self.patterns = []
+        self._regex = None
+
+    def add(self, filter_type, value):
+        if filter_type == EXACT:
+            self.exact.add(value)
+        else:
+            self.patterns.append(_pattern(filter_type, value))
+
+    def compile(self):
+        if self.patterns:
+            self._regex = re.compile('|'.join(f'(?:{pattern})' for pattern in self.patterns))
+        return self
+
+    def match(self, value):
+        if value is None:
+            return False
+        value = str(value)
+        return value in self.exact or (self._regex is not None and self._regex.search(value) is not None)
+
+class TypeFilters:
+    """Filtros compilados de um tipo de recurso"""
+
+    def __init__(self, rules):
+        self.matchers = {}
+        self.inverted = []
+        self.needs_tags = False
+        # Tags com valor exato ficam em um índice (chave, valor) consultado por hash
+        self.tag_index = set()
+        for rule in rules:
+            if not isinstance(rule, dict):
+                rule = {'property': ID_PROPERTY, 'value': rule}
+            prop = rule.get('property', ID_PROPERTY)
+            value = str(rule.get('value', ''))
+            filter_type = _filter_type(rule, value)
+            if prop.startswith(TAG_PREFIX):
+                self.needs_tags = True
+            if str(rule.get('invert', '')).lower() == 'true':
+                # Como no aws-nuke, cada filtro invertido vale sozinho: protege o que não casa com ele
+                matcher = ValueMatcher()
+                matcher.add(filter_type, value)
+                self.inverted.append((prop, matcher.compile()))
+            elif prop.startswith(TAG_PREFIX) and filter_type == EXACT:
+                self.tag_index.add((prop[len(TAG_PREFIX):], value))
+            else:
+                self.matchers.setdefault(prop, ValueMatcher()).add(filter_type, value)
+        for matcher in self.matchers.values():
+            matcher.compile()
+
+    def match(self, properties, tags):
+        """A propriedade (ou tag) que protege o recurso, ou None"""
+        for key, value in tags.items():
+            if (key, value) in self.tag_index:
+                return f"{TAG_PREFIX}{key}={value}"
+        for prop, matcher in self.matchers.items():
+            value = _value(prop, properties, tags)
+            if matcher.match(value):
+                return f"{prop}={value}"
+        for prop, matcher in self.inverted:
+            value = _value(prop, properties, tags)
+            if not matcher.match(value):
+                return f"{prop}={value} (invert)"
+        return None
+
+def _value(prop, properties, tags):
+    if prop.startswith(TAG_PREFIX):
+        return tags.get(prop[len(TAG_PREFIX):])
+    return properties.get(prop)
+
+def _tags(tags):
+    """Normaliza tags no formato da API ([{'Key', 'Value'}]) ou um dicionário"""
+    if not tags:
+        return {}
+    if isinstance(tags, dict):
+        return tags
+    return {tag['Key']: tag.get('Value', '') for tag in tags}
+
+class ResourceFilters:
+    """Filtros de uma conta, por tipo de recurso, compilados a partir do nuke-config.yml"""
+
+    def __init__(self, filters):
+        by_type = {}
+        for resource_type, rules in (filters or {}).items():
+            resource_type = NUKE_RESOURCE_TYPES.get(resource_type, resource_type)
+            by_type.setdefault(resource_type, []).extend(rules or [])
+        global_rules = by_type.pop(GLOBAL_FILTERS, [])
+        self.by_type = {resource_type: TypeFilters(rules + global_rules) for resource_type, rules in by_type.items()}
+        self.global_filters = TypeFilters(global_rules) if global_rules else None
+
+    @classmethod
+    def from_config(cls, config, account_id):
+        """Filtros da conta no config; None se ela não tem nenhum"""
+        account = (config.get('accounts') or {}).get(str(account_id)) or {}
+        filters = account.get('filters')
+        return cls(filters) if filters else None
+
+    def needs_tags(self, resource_type):
+        """True se algum filtro do tipo olha tags (para buscar as tags só quando necessário)"""
+        filters = self.by_type.get(resource_type, self.global_filters)
+        return filters is not None and filters.needs_tags
+
+    def protected(self, resource_type, resource_id, properties=None, tags=None):
+        """Descrição do filtro que protege o recurso, ou None se ele pode ser excluído
+
+        tags pode ser uma função, chamada só se algum filtro do tipo usa tags;
+        se ela falhar, o recurso é tratado como protegido.
+        """
+        filters = self.by_type.get(resource_type, self.global_filters)
+        if filters is None:
+            return None
+        properties = dict(properties or {}, **{ID_PROPERTY: resource_id})
+        if callable(tags):
+            if not filters.needs_tags:
+                tags = None
+            else:
+                try:
+                    tags = tags()
+                except Exception as e:
+                    return f"tags unavailable: {e}"
+        return filters.match(properties, _tags(tags))
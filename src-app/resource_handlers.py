@@ -0,0 +1,201 @@
+"""
+Registro dos tipos de recurso que os cleaners sabem excluir
+Cada tipo declara onde estão o lister e o deleter, o tamanho do lote, o limite de
+chamadas em paralelo e de quais tipos depende. Os módulos em handlers/ só são
+importados quando o tipo é selecionado para a execução
+"""
+
+import importlib
+import threading
+
+from cleaner_common import DELETE_WORKERS, RESOURCE_ACTIONS, TERMINATE_BATCH_SIZE
+
+# Lote sem limite: o deleter recebe todos os recursos encontrados de uma vez
+ALL_AT_ONCE = None
+
+# Usuários, roles e políticas removidos ao mesmo tempo; cada um já faz as suas etapas em paralelo
+# e o limitador de taxa da sessão mantém o total de chamadas dentro do limite do IAM
+IAM_WORKERS = 4
+
+class Resource:
+    """Recurso encontrado por um lister
+
+    name e state aparecem no output e, com properties, ficam disponíveis para
+    os filtros; tags pode ser uma função, chamada só se algum filtro usa tags.
+    data guarda a resposta da API que o deleter precisar.
+    """
+
+    __slots__ = ('id', 'name', 'state', 'tags', 'properties', 'data')
+
+    def __init__(self, resource_id, name=None, state=None, tags=None, properties=None, data=None):
+        self.id = resource_id
+        self.name = name
+        self.state = state
+        self.tags = tags
+        self.properties = properties
+        self.data = data
+
+    def filter_properties(self):
+        """Propriedades comparadas pelos filtros do nuke-config.yml"""
+        properties = {'Name': self.name, 'State': self.state}
+        properties.update(self.properties or {})
+        return properties
+
+    def describe(self):
+        """Detalhes mostrados depois do ID no output"""
+        details = [self.name] if self.name and self.name != self.id else []
+        if self.state:
+            details.append(f"state: {self.state}")
+        return f" ({', '.join(details)})" if details else ""
+
+class ResourceHandler:
+    """Declaração de um tipo de recurso
+
+    lister(cleaner, region) gera Resources; deleter(cleaner, region, resources)
+    exclui um lote e retorna os (ID, erro) que falharam. Com tracks, o deleter
+    registra ele mesmo os resultados no tracker (exclusões assíncronas ou com
+    duração própria); senão, os que não falharam são registrados como excluídos.
+    Com waits, a onda só termina quando as exclusões acompanhadas terminarem.
+    """
+
+    def __init__(self, resource_type, title, noun, icon, module, lister, deleter, is_global=False,
+                 depends_on=(), batch_size=1, concurrency=DELETE_WORKERS, tracks=False, waits=False):
+        self.resource_type = resource_type
+        self.title = title
+        self.noun = noun
+        self.icon = icon
+        self.module = module
+        self.lister_name = lister
+        self.deleter_name = deleter
+        self.is_global = is_global
+        self.depends_on = tuple(depends_on)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.tracks = tracks
+        self.waits = waits
+        self.action = RESOURCE_ACTIONS.get(resource_type, 'delete')
+        # 'terminating', 'deregistering', 'deleting'
+        self.action_ing = (self.action[:-1] if self.action.endswith('e') else self.action) + 'ing'
+        self._functions = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Importa o módulo do tipo (só na primeira vez) e retorna (lister, deleter)"""
+        with self._lock:
+            if self._functions is None:
+                module = importlib.import_module(self.module)
+                self._functions = getattr(module, self.lister_name), getattr(module, self.deleter_name)
+            return self._functions
+
+# Na ordem em que os tipos aparecem no output; as dependências definem a ordem real de exclusão
+HANDLERS = [
+    # Ambientes do Beanstalk são donos das próprias stacks, instâncias e security groups
+    ResourceHandler(
+        'ElasticBeanstalkEnvironment', 'Elastic Beanstalk', 'Elastic Beanstalk environment', '🌱',
+        'handlers.elasticbeanstalk', 'list_environments', 'terminate_environment',
+        tracks=True, waits=True
+    ),
+    # Stacks são excluídas antes dos recursos que gerenciam
+    ResourceHandler(
+        'CloudFormationStack', 'CloudFormation Stacks', 'CloudFormation stack', '📚',
+        'handlers.cloudformation', 'list_stacks', 'delete_stacks',
+        depends_on=['ElasticBeanstalkEnvironment'], batch_size=ALL_AT_ONCE, concurrency=1, tracks=True, waits=True
+    ),
+    ResourceHandler(
+        'EC2Instance', 'EC2 Instances', 'EC2 instance', '📦',
+        'handlers.ec2', 'list_instances', 'terminate_instances',
+        depends_on=['CloudFormationStack'], batch_size=TERMINATE_BATCH_SIZE, concurrency=1, tracks=True, waits=True
+    ),
+    ResourceHandler(
+        'EBSVolume', 'EBS Volumes', 'EBS volume', '💾',
+        'handlers.ec2', 'list_volumes', 'delete_volume',
+        depends_on=['EC2Instance']
+    ),
+    ResourceHandler(
+        'AMI', 'AMIs', 'AMI', '💿',
+        'handlers.ec2', 'list_images', 'deregister_image',
+        depends_on=['EC2Instance']
+    ),
+    # Snapshots usados por AMIs só podem ser excluídos depois do deregister
+    ResourceHandler(
+        'EBSSnapshot', 'EBS Snapshots', 'snapshot', '📸',
+        'handlers.ec2', 'list_snapshots', 'delete_snapshot',
+        depends_on=['AMI']
+    ),
+    ResourceHandler(
+        'RDSInstance', 'RDS Instances', 'RDS instance', '🗄️ ',
+        'handlers.rds', 'list_instances', 'delete_instance',
+        depends_on=['CloudFormationStack'], tracks=True, waits=True
+    ),
+    ResourceHandler(
+        'LambdaFunction', 'Lambda Functions', 'Lambda function', '⚡',
+        'handlers.lambda_functions', 'list_functions', 'delete_function',
+        depends_on=['CloudFormationStack']
+    ),
+    # O deleter mantém uma janela de exclusões do tamanho do limite de operações do DynamoDB
+    ResourceHandler(
+        'DynamoDBTable', 'DynamoDB Tables', 'DynamoDB table', '🗃️ ',
+        'handlers.dynamodb', 'list_tables', 'delete_tables',
+        depends_on=['CloudFormationStack'], batch_size=ALL_AT_ONCE, concurrency=1, tracks=True
+    ),
+    # Security groups ficam presos (DependencyViolation) enquanto houver ENIs usando;
+    # o deleter recebe todos de uma vez para respeitar as referências entre eles
+    ResourceHandler(
+        'SecurityGroup', 'Security Groups', 'security group', '🔒',
+        'handlers.ec2', 'list_security_groups', 'delete_security_groups',
+        depends_on=['EC2Instance', 'RDSInstance', 'LambdaFunction'], batch_size=ALL_AT_ONCE, concurrency=1, tracks=True
+    ),
+    # O S3BucketEmptier já esvazia vários buckets em paralelo
+    ResourceHandler(
+        'S3Bucket', 'S3 Buckets', 'S3 bucket', '🪣',
+        'handlers.s3', 'list_buckets', 'empty_and_delete_buckets',
+        is_global=True, depends_on=['CloudFormationStack'], batch_size=ALL_AT_ONCE, concurrency=1, tracks=True
+    ),
+    ResourceHandler(
+        'IAMUser', 'IAM Users', 'IAM user', '👤',
+        'handlers.iam', 'list_users', 'delete_user',
+        is_global=True, depends_on=['CloudFormationStack'], concurrency=IAM_WORKERS
+    ),
+    ResourceHandler(
+        'IAMRole', 'IAM Roles', 'IAM role', '🎭',
+        'handlers.iam', 'list_roles', 'delete_role',
+        is_global=True, depends_on=['CloudFormationStack', 'EC2Instance', 'LambdaFunction'],
+        concurrency=IAM_WORKERS
+    ),
+    # O deleter desanexa a política de usuários, grupos e roles por conta própria,
+    # então ela não precisa esperar a remoção dos usuários e roles
+    ResourceHandler(
+        'IAMPolicy', 'IAM Policies', 'IAM policy', '📜',
+        'handlers.iam', 'list_policies', 'delete_policy',
+        is_global=True, depends_on=['CloudFormationStack'], concurrency=IAM_WORKERS
+    ),
+]
+
+def select_handlers(resource_types=None):
+    """Handlers dos tipos escolhidos (todos se resource_types for vazio), na ordem do registro"""
+    if not resource_types:
+        return list(HANDLERS)
+    known = {handler.resource_type for handler in HANDLERS}
+    unknown = sorted(set(resource_types) - known)
+    if unknown:
+        raise ValueError(f"Tipos de recurso desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(sorted(known))})")
+    return [handler for handler in HANDLERS if handler.resource_type in resource_types]
+
+def unique(resources):
+    """Pula os recursos repetidos (a primeira passada da Tagging API e a listagem podem trazer o mesmo)"""
+    seen = set()
+    for resource in resources:
+        if resource.id not in seen:
+            seen.add(resource.id)
+            yield resource
+
+def parallel_tasks(handlers, workers):
+    """Tarefas que podem usar clients ao mesmo tempo, para dimensionar o pool de conexões
+
+    Com S3Bucket selecionado, o S3BucketEmptier esvazia vários buckets em
+    paralelo; o módulo dele só é importado nesse caso.
+    """
+    if any(handler.resource_type == 'S3Bucket' for handler in handlers):
+        from s3_emptier import BUCKET_WORKERS
+        return max(workers, BUCKET_WORKERS)
+    return workers
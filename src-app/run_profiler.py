@@ -0,0 +1,203 @@
+"""
+Perfil de tempo de uma execução do cleaner
+O PhaseTimer mede quanto cada tipo de recurso (em cada região) passou em cada fase:
+criação de clients, descoberta, filtros, exclusão e espera. O StackSampler amostra as
+pilhas de todas as threads durante a execução e gera o formato 'folded' (uma pilha por
+linha com a contagem), aceito pelo flamegraph.pl e pelo speedscope
+"""
+
+import re
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Fases de um tipo de recurso
+CLIENTS = 'clients'
+DISCOVERY = 'discovery'
+FILTERING = 'filtering'
+DELETION = 'deletion'
+WAITING = 'waiting'
+# Tempo do tipo fora das outras fases (output, journal, o próprio loop)
+OTHER = 'other'
+
+PHASES = (CLIENTS, DISCOVERY, FILTERING, DELETION, WAITING, OTHER)
+
+# Escopo das fases que não pertencem a um tipo de recurso (ex.: inventário da Tagging API)
+RUN = 'run'
+
+# Intervalo entre amostras do StackSampler, em segundos
+SAMPLE_INTERVAL = 0.005
+
+_NO_PHASE = nullcontext()
+
+class PhaseTimer:
+    """Tempo por (tipo de recurso, região, fase), medido na thread que executa cada fase
+
+    As fases podem ser aninhadas: o tempo de uma fase interna (ex.: criar o
+    client durante a descoberta) é descontado da externa, então a soma das
+    fases de um tipo é o tempo de parede da sua thread. Desabilitado, não mede
+    nada e não custa mais que uma chamada de função.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _scope(self, resource_type, region):
+        previous = getattr(self._local, 'scope', (RUN, None))
+        self._local.scope = (resource_type, region)
+        try:
+            yield
+        finally:
+            self._local.scope = previous
+
+    def scope(self, resource_type, region):
+        """As fases medidas dentro do bloco (nesta thread) são do tipo na região"""
+        return self._scope(resource_type, region) if self.enabled else _NO_PHASE
+
+    @contextmanager
+    def _phase(self, phase):
+        stack = self._local.__dict__.setdefault('stack', [])
+        # [início, tempo das fases internas]
+        entry = [time.perf_counter(), 0.0]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - entry[0]
+            if stack:
+                stack[-1][1] += elapsed
+            self._add(getattr(self._local, 'scope', (RUN, None)), phase, elapsed - entry[1])
+
+    def phase(self, phase):
+        """Mede o bloco como a fase do escopo atual"""
+        return self._phase(phase) if self.enabled else _NO_PHASE
+
+    def _add(self, scope, phase, seconds):
+        key = scope + (phase,)
+        with self._lock:
+            total = self._totals.setdefault(key, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def timed(self, iterable, phase):
+        """Itera sobre iterable medindo cada next() como a fase (ex.: a paginação da descoberta)"""
+        if not self.enabled:
+            return iterable
+        return self._timed(iter(iterable), phase)
+
+    def _timed(self, iterator, phase):
+        while True:
+            with self._phase(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def scoped(self, func, resource_type, region):
+        """func executada no escopo do tipo (para as chamadas que rodam em outras threads)"""
+        if not self.enabled:
+            return func
+
+        def run(*args, **kwargs):
+            with self._scope(resource_type, region):
+                return func(*args, **kwargs)
+        return run
+
+    def breakdown(self):
+        """Tempo de cada fase por tipo e região e o total de cada fase"""
+        with self._lock:
+            totals = sorted(self._totals.items(), key=lambda item: (item[0][0], item[0][1] or '', item[0][2]))
+        phases = [
+            {'resource_type': resource_type, 'region': region, 'phase': phase, 'seconds': round(seconds, 6), 'count': count}
+            for (resource_type, region, phase), (seconds, count) in totals
+        ]
+        by_phase = {}
+        for (_, _, phase), (seconds, _) in totals:
+            by_phase[phase] = by_phase.get(phase, 0.0) + seconds
+        return {
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'totals': {phase: round(seconds, 6) for phase, seconds in by_phase.items()},
+            'phases': phases
+        }
+
+    def describe(self):
+        """Linha do resumo da execução com o total de cada fase"""
+        totals = self.breakdown()['totals']
+        return "⏱️  Phases: " + ", ".join(f"{phase} {totals[phase]:.2f}s" for phase in PHASES if phase in totals)
+
+class StackSampler:
+    """Amostra periodicamente as pilhas de todas as threads (perfil de tempo de parede)
+
+    Cada pilha vira 'thread;módulo:função;...' da base até o topo, então dá
+    para separar o tempo do botocore/boto3 (e da rede, nos frames do urllib3
+    e do ssl) do tempo do próprio cleaner. Threads de pools aparecem agrupadas
+    pelo prefixo do nome.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: _thread_group(thread.name) for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.stacks[_folded(names.get(ident, 'thread'), frame)] += 1
+            self.samples += 1
+
+    def write(self, path):
+        """Grava as pilhas no formato folded ('pilha contagem' por linha)"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _thread_group(name):
+    # ThreadPoolExecutor-3_7 e cleaner_2 viram ThreadPoolExecutor e cleaner
+    return re.sub(r'[-_\d]+$', '', name) or name
+
+def _folded(thread_name, frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{frame.f_globals.get('__name__', code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    frames.append(thread_name)
+    # ';' separa os frames no formato folded
+    return ';'.join(name.replace(';', ':') for name in reversed(frames))
+
+def write_profile(path, timer, metrics=None, sampler=None):
+    """Grava o perfil da execução em JSON: as fases e, se houver, o tempo gasto na API por operação"""
+    profile = timer.breakdown()
+    if metrics is not None:
+        profile['api'] = metrics.summary()
+    if sampler is not None:
+        profile['samples'] = sampler.samples
+        profile['sample_interval'] = sampler.interval
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
@@ -0,0 +1,146 @@
+"""
+Esvaziamento de buckets S3 em alta vazão
+Remove versões, delete markers e multipart uploads pendentes antes de excluir o bucket
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cleaner_common import DELETE_WORKERS, BoundedPool, prefetch
+
+# Máximo de chaves aceitas por chamada de DeleteObjects
+DELETE_OBJECTS_BATCH_SIZE = 1000
+
+# Buckets esvaziados ao mesmo tempo
+BUCKET_WORKERS = 4
+
+# Máximo de passadas de listagem + exclusão por bucket
+MAX_PASSES = 5
+
+class BucketResult:
+    """Resultado do esvaziamento de um bucket"""
+
+    def __init__(self, name):
+        self.name = name
+        self.objects_deleted = 0
+        self.uploads_aborted = 0
+        self.errors = []
+        self.seconds = 0.0
+        self.deleted = False
+
+    @property
+    def throughput(self):
+        """Objetos excluídos por segundo"""
+        return self.objects_deleted / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        """Linha de resumo do bucket para o output dos cleaners"""
+        stats = f"{self.objects_deleted} objects in {self.seconds:.1f}s ({self.throughput:.0f} objects/s)"
+        if self.deleted:
+            return f"✅ Deleted S3 bucket {self.name}: {stats}"
+        key, error = self.errors[0]
+        return f"❌ Error deleting bucket {self.name} ({len(self.errors)} errors, {stats}): {key}: {error}"
+
+class S3BucketEmptier:
+    """Esvazia e exclui buckets S3 usando DeleteObjects em lotes e workers paralelos"""
+
+    def __init__(self, clients, workers=DELETE_WORKERS, bucket_workers=BUCKET_WORKERS):
+        self.clients = clients
+        self.workers = workers
+        self.bucket_workers = bucket_workers
+
+    def _client(self, region=None):
+        """Client S3 da região do bucket, vindo do ClientPool compartilhado"""
+        return self.clients.client('s3', region)
+
+    def _bucket_client(self, bucket_name):
+        """Client S3 apontando para a região onde o bucket está"""
+        location = self._client().get_bucket_location(Bucket=bucket_name)
+        # Buckets em us-east-1 retornam LocationConstraint vazio
+        return self._client(location.get('LocationConstraint') or 'us-east-1')
+
+    def empty_and_delete(self, bucket_name):
+        """Esvazia o bucket (versões, delete markers e multipart uploads) e o exclui"""
+        result = BucketResult(bucket_name)
+        start = time.monotonic()
+        try:
+            s3 = self._bucket_client(bucket_name)
+            self._abort_multipart_uploads(s3, bucket_name, result)
+            self._delete_versions(s3, bucket_name, result)
+            if not result.errors:
+                s3.delete_bucket(Bucket=bucket_name)
+                result.deleted = True
+        except Exception as e:
+            result.errors.append((bucket_name, e))
+        result.seconds = time.monotonic() - start
+        return result
+
+    def empty_and_delete_all(self, bucket_names):
+        """Processa vários buckets ao mesmo tempo, retornando os resultados conforme terminam"""
+        with ThreadPoolExecutor(max_workers=self.bucket_workers) as executor:
+            futures = [executor.submit(self.empty_and_delete, name) for name in bucket_names]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _abort_multipart_uploads(self, s3, bucket_name, result):
+        """Aborta os multipart uploads em andamento, que impedem a exclusão do bucket"""
+        paginator = s3.get_paginator('list_multipart_uploads')
+        with BoundedPool(self.workers) as pool:
+            for page in prefetch(paginator.paginate(Bucket=bucket_name)):
+                for upload in page.get('Uploads') or []:
+                    result.uploads_aborted += 1
+                    pool.submit(
+                        upload['Key'], s3.abort_multipart_upload,
+                        Bucket=bucket_name, Key=upload['Key'], UploadId=upload['UploadId']
+                    )
+        result.uploads_aborted -= len(pool.errors)
+        result.errors.extend(pool.errors)
+
+    def _delete_versions(self, s3, bucket_name, result):
+        """Exclui todas as versões e delete markers, repetindo passadas até o bucket ficar vazio"""
+        # Objetos gravados durante a exclusão, ou uma listagem interrompida porque as
+        # chaves do marcador foram excluídas, ficam para a passada seguinte
+        for _ in range(MAX_PASSES):
+            deleted_before = result.objects_deleted
+            try:
+                found = self._delete_pass(s3, bucket_name, result)
+            except Exception:
+                if result.objects_deleted == deleted_before:
+                    raise
+                continue
+            if not found or result.errors:
+                return
+
+    def _delete_pass(self, s3, bucket_name, result):
+        """Uma passada de ListObjectVersions com lotes de DeleteObjects paralelos; retorna quantas entradas listou"""
+        lock = threading.Lock()
+
+        def delete_batch(batch):
+            response = s3.delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': batch, 'Quiet': True}
+            )
+            # Em modo Quiet a resposta traz apenas as chaves que falharam
+            failed = response.get('Errors', [])
+            with lock:
+                result.objects_deleted += len(batch) - len(failed)
+                for error in failed:
+                    result.errors.append((error.get('Key'), error.get('Message', error.get('Code'))))
+
+        paginator = s3.get_paginator('list_object_versions')
+        found = 0
+        batch = []
+        with BoundedPool(self.workers) as pool:
+            for page in prefetch(paginator.paginate(Bucket=bucket_name)):
+                # Buckets sem versionamento também retornam os objetos aqui (VersionId 'null')
+                for entry in (page.get('Versions') or []) + (page.get('DeleteMarkers') or []):
+                    found += 1
+                    batch.append({'Key': entry['Key'], 'VersionId': entry['VersionId']})
+                    if len(batch) == DELETE_OBJECTS_BATCH_SIZE:
+                        pool.submit(batch[0]['Key'], delete_batch, batch)
+                        batch = []
+            if batch:
+                pool.submit(batch[0]['Key'], delete_batch, batch)
+        result.errors.extend(pool.errors)
+        return found
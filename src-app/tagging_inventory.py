@@ -0,0 +1,123 @@
+"""
+Inventário em massa pela Resource Groups Tagging API
+GetResources retorna até 100 ARNs por chamada de vários serviços ao mesmo tempo, em vez
+de uma listagem por serviço. A API só enxerga recursos que têm (ou já tiveram) tags: por padrão o
+inventário é só uma primeira passada (os recursos com tags são tratados primeiro e cada
+tipo ainda é listado, para os sem tags); só com tagged-only ele substitui a listagem
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from cleaner_common import with_current_output
+from inventory_cache import Inventory
+
+# Motores de inventário: listar cada serviço, consultar a Tagging API antes de listar
+# ou confiar só na Tagging API (mais rápido, mas não vê recursos que nunca tiveram tags)
+LIST = 'list'
+TAGGING = 'tagging'
+TAGGED_ONLY = 'tagged-only'
+
+ENGINES = (LIST, TAGGING, TAGGED_ONLY)
+
+# Aviso do resumo das execuções com tagged-only
+UNTAGGED_WARNING = "⚠️  Tagged-only inventory: resources without tags were not checked (use --inventory list for a complete sweep)"
+
+# Máximo de recursos por página de GetResources
+RESOURCES_PER_PAGE = 100
+
+def _last_segment(resource):
+    return resource.split('/')[-1]
+
+def _lambda_function(resource):
+    # function:nome ou function:nome:versão
+    return resource.split(':')[0]
+
+def _cloudformation_stack(resource):
+    # stack/nome/uuid: o nome, como na listagem (é com ele que os filtros e os registros identificam a stack)
+    return resource.split('/')[0]
+
+def _dynamodb_table(resource):
+    # Streams e índices aparecem como table/nome/stream/...; só a tabela interessa
+    return None if '/' in resource else resource
+
+# (serviço, tipo no ARN) -> (tipo de recurso dos cleaners, extrai o ID do resto do ARN)
+RESOURCE_TYPES = {
+    ('ec2', 'instance'): ('EC2Instance', _last_segment),
+    ('ec2', 'volume'): ('EBSVolume', _last_segment),
+    ('ec2', 'snapshot'): ('EBSSnapshot', _last_segment),
+    ('ec2', 'image'): ('AMI', _last_segment),
+    ('ec2', 'security-group'): ('SecurityGroup', _last_segment),
+    ('rds', 'db'): ('RDSInstance', _last_segment),
+    ('lambda', 'function'): ('LambdaFunction', _lambda_function),
+    ('dynamodb', 'table'): ('DynamoDBTable', _dynamodb_table),
+    ('cloudformation', 'stack'): ('CloudFormationStack', _cloudformation_stack),
+}
+# Ambientes do Elastic Beanstalk ficam de fora: o ARN (environment/aplicação/nome) não traz
+# o EnvironmentId com que os cleaners identificam o ambiente, então eles são sempre listados
+
+def parse_arn(arn):
+    """Converte um ARN em (tipo de recurso, ID), ou None se o tipo não é tratado pelos cleaners"""
+    parts = arn.split(':', 5)
+    if len(parts) < 6:
+        return None
+    service, resource = parts[2], parts[5]
+    # O tipo vem antes do primeiro '/' (instance/i-123) ou ':' (function:nome)
+    separator = min((resource.find(sep) for sep in '/:' if sep in resource), default=-1)
+    if separator < 0:
+        return None
+    resource_type, rest = resource[:separator], resource[separator + 1:]
+    if (service, resource_type) not in RESOURCE_TYPES:
+        return None
+    name, extract = RESOURCE_TYPES[(service, resource_type)]
+    resource_id = extract(rest)
+    return (name, resource_id) if resource_id else None
+
+class TaggingInventory:
+    """Monta um Inventory das regiões com GetResources, em paralelo por região
+
+    Com complete, os tipos cobertos são marcados como inventariados e não são
+    listados (tagged-only); senão os IDs encontrados só adiantam a descoberta.
+    """
+
+    def __init__(self, clients, workers=None, complete=False):
+        self.clients = clients
+        self.workers = workers
+        self.complete = complete
+        self.calls = 0
+
+    def collect(self, regions):
+        """Inventário dos tipos cobertos pela Tagging API
+
+        Os cleaners listam normalmente os tipos incompletos (e as regiões em que
+        a consulta falhou), então o inventário nunca esconde um tipo inteiro.
+        """
+        inventory = Inventory()
+        with ThreadPoolExecutor(max_workers=self.workers or max(1, len(regions))) as executor:
+            for pages in executor.map(with_current_output(self._collect_region), regions, [inventory] * len(regions)):
+                self.calls += pages
+        return inventory
+
+    def _collect_region(self, region, inventory):
+        client = self.clients.client('resourcegroupstaggingapi', region)
+        found = []
+        pages = 0
+        try:
+            paginator = client.get_paginator('get_resources')
+            filters = sorted({f"{service}:{resource_type}" for service, resource_type in RESOURCE_TYPES})
+            for page in paginator.paginate(ResourcesPerPage=RESOURCES_PER_PAGE, ResourceTypeFilters=filters):
+                pages += 1
+                for mapping in page.get('ResourceTagMappingList', []):
+                    parsed = parse_arn(mapping['ResourceARN'])
+                    if parsed:
+                        found.append(parsed)
+        except Exception as e:
+            print(f"  ⚠️  Tagging API unavailable in {region}, listing each service instead: {e}")
+            return pages
+
+        for resource_type, resource_id in found:
+            inventory.add(region, resource_type, resource_id)
+        # Só marca os tipos como completos depois de percorrer todas as páginas
+        if self.complete:
+            for resource_type, _ in RESOURCE_TYPES.values():
+                inventory.complete(region, resource_type)
+        return pages
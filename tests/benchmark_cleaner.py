@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the AWS Resource Cleaner
+
+Builds a synthetic account (EC2 instances, volumes, snapshots, versioned S3
+buckets, Lambda functions and IAM entities) on moto and measures, for each
+cleaner and inventory engine, the dry-run and the execute: wall time, API calls
+and peak RSS. Each scenario runs in its own process, so peak RSS is not shared
+between scenarios. Results can be saved as JSON and compared between commits:
+
+    python tests/benchmark_cleaner.py --size small --save before.json
+    python tests/benchmark_cleaner.py --size small --compare before.json
+
+By default moto runs in-process (peak RSS then includes moto's own state); with
+--endpoint-url the account is built on a moto server instead, which should be
+started with MOTO_EC2_LOAD_DEFAULT_AMIS=false so that only the synthetic
+resources exist:
+
+    MOTO_EC2_LOAD_DEFAULT_AMIS=false moto_server -p 5001
+    python tests/benchmark_cleaner.py --endpoint-url http://localhost:5001
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import zipfile
+from collections import Counter
+
+SRC_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src-app')
+
+REGION = 'us-east-1'
+
+# Without moto's default AMIs (and their ~1400 snapshots) the account only has the synthetic resources;
+# moto accepts any image ID in RunInstances
+IMAGE_ID = 'ami-12345678'
+
+# Resources created per type for each account size
+SIZES = {
+    'small': {
+        'instances': 100, 'volumes': 100, 'snapshots': 100,
+        'buckets': 5, 'object_versions': 50,
+        'functions': 20, 'users': 20, 'roles': 20, 'policies': 20
+    },
+    'medium': {
+        'instances': 500, 'volumes': 500, 'snapshots': 500,
+        'buckets': 20, 'object_versions': 200,
+        'functions': 100, 'users': 100, 'roles': 100, 'policies': 100
+    },
+    'large': {
+        'instances': 2000, 'volumes': 2000, 'snapshots': 2000,
+        'buckets': 50, 'object_versions': 500,
+        'functions': 200, 'users': 300, 'roles': 300, 'policies': 300
+    },
+}
+
+# (cleaner, inventory engine) measured by default
+SCENARIOS = [
+    ('simple', 'list'),
+    ('simple', 'tagging'),
+    ('simple', 'tagged-only'),
+    ('main', 'list'),
+    ('main', 'tagging'),
+    ('main', 'tagged-only'),
+]
+
+# Objects written per put in the versioned buckets (each put of the same key adds a version)
+OBJECT_KEYS = 10
+
+TAGS = [{'Key': 'benchmark', 'Value': 'true'}]
+
+LAMBDA_ROLE_POLICY = json.dumps({
+    'Version': '2012-10-17',
+    'Statement': [{'Effect': 'Allow', 'Principal': {'Service': 'lambda.amazonaws.com'}, 'Action': 'sts:AssumeRole'}]
+})
+
+POLICY_DOCUMENT = json.dumps({
+    'Version': '2012-10-17',
+    'Statement': [{'Effect': 'Allow', 'Action': 's3:ListBucket', 'Resource': '*'}]
+})
+
+class ApiCallCounter:
+    """Counts every API call made through botocore, by service and operation"""
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def install(self):
+        from botocore.client import BaseClient
+        make_api_call = BaseClient._make_api_call
+        counter = self
+
+        def counted(client, operation_name, api_params):
+            counter.calls[f"{client.meta.service_model.service_name}:{operation_name}"] += 1
+            return make_api_call(client, operation_name, api_params)
+
+        BaseClient._make_api_call = counted
+        return self
+
+    def reset(self):
+        self.calls = Counter()
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def lambda_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('handler.py', 'def handler(event, context):\n    return event\n')
+    return buffer.getvalue()
+
+def build_account(counts, region=REGION):
+    """Creates the synthetic account in the current moto backend"""
+    import boto3
+    ec2 = boto3.client('ec2', region_name=region)
+    tag_spec = lambda resource_type: [{'ResourceType': resource_type, 'Tags': TAGS}]
+
+    remaining = counts['instances']
+    while remaining:
+        batch = min(remaining, 1000)
+        ec2.run_instances(ImageId=IMAGE_ID, MinCount=batch, MaxCount=batch, TagSpecifications=tag_spec('instance'))
+        remaining -= batch
+
+    volume_ids = []
+    for _ in range(max(counts['volumes'], 1 if counts['snapshots'] else 0)):
+        volume_ids.append(ec2.create_volume(
+            Size=1, AvailabilityZone=f"{region}a", TagSpecifications=tag_spec('volume')
+        )['VolumeId'])
+    for i in range(counts['snapshots']):
+        ec2.create_snapshot(VolumeId=volume_ids[i % len(volume_ids)], TagSpecifications=tag_spec('snapshot'))
+
+    s3 = boto3.client('s3', region_name=region)
+    for i in range(counts['buckets']):
+        bucket = f"benchmark-bucket-{i}"
+        s3.create_bucket(Bucket=bucket)
+        s3.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={'Status': 'Enabled'})
+        for version in range(counts['object_versions']):
+            s3.put_object(Bucket=bucket, Key=f"object-{version % OBJECT_KEYS}", Body=b'x')
+
+    iam = boto3.client('iam', region_name=region)
+    lambda_role = iam.create_role(RoleName='benchmark-lambda', AssumeRolePolicyDocument=LAMBDA_ROLE_POLICY)['Role']['Arn']
+    aws_lambda = boto3.client('lambda', region_name=region)
+    code = lambda_zip()
+    for i in range(counts['functions']):
+        aws_lambda.create_function(
+            FunctionName=f"benchmark-function-{i}", Runtime='python3.12', Role=lambda_role,
+            Handler='handler.handler', Code={'ZipFile': code}, Tags={'benchmark': 'true'}
+        )
+
+    policy_arns = [
+        iam.create_policy(PolicyName=f"benchmark-policy-{i}", PolicyDocument=POLICY_DOCUMENT)['Policy']['Arn']
+        for i in range(counts['policies'])
+    ]
+    for i in range(counts['users']):
+        user = f"benchmark-user-{i}"
+        iam.create_user(UserName=user)
+        iam.create_access_key(UserName=user)
+        if policy_arns:
+            iam.attach_user_policy(UserName=user, PolicyArn=policy_arns[i % len(policy_arns)])
+    for i in range(counts['roles']):
+        role = f"benchmark-role-{i}"
+        iam.create_role(RoleName=role, AssumeRolePolicyDocument=LAMBDA_ROLE_POLICY)
+        if policy_arns:
+            iam.attach_role_policy(RoleName=role, PolicyArn=policy_arns[i % len(policy_arns)])
+
+def run_cleaner(cleaner, engine, dry_run, journal_path, poll_delay):
+    """Runs one cleaner with its output discarded"""
+    if cleaner == 'simple':
+        from aws_resource_cleaner_simple import run_cleaner as run_simple
+        run_simple(
+            'benchmark', 'benchmark', REGION, dry_run=dry_run, inventory_engine=engine, journal_path=journal_path
+        )
+    else:
+        from aws_resource_cleaner import AWSResourceCleaner
+        instance = AWSResourceCleaner(
+            'benchmark', 'benchmark', REGION, dry_run=dry_run, inventory_engine=engine, journal_path=journal_path
+        )
+        # moto finishes the deletions right away; the first poll would only add a fixed sleep
+        instance.tracker.initial_delay = poll_delay
+        instance.run()
+
+def run_scenario(cleaner, engine, counts, poll_delay, endpoint_url=None):
+    """Builds the account and measures the dry-run and the execute of one scenario"""
+    sys.path.insert(0, SRC_APP)
+    os.environ.update(
+        AWS_ACCESS_KEY_ID='benchmark', AWS_SECRET_ACCESS_KEY='benchmark', AWS_DEFAULT_REGION=REGION,
+        MOTO_EC2_LOAD_DEFAULT_AMIS='false'
+    )
+    counter = ApiCallCounter().install()
+
+    if endpoint_url:
+        os.environ['AWS_ENDPOINT_URL'] = endpoint_url
+        urllib.request.urlopen(urllib.request.Request(f"{endpoint_url}/moto-api/reset", method='POST')).close()
+        mock = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        mock = mock_aws()
+
+    results = []
+    with mock, tempfile.TemporaryDirectory() as workdir:
+        build_account(counts)
+        for dry_run in (True, False):
+            counter.reset()
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                run_cleaner(cleaner, engine, dry_run, os.path.join(workdir, 'journal.db'), poll_delay)
+            seconds = time.perf_counter() - start
+            results.append({
+                'cleaner': cleaner,
+                'inventory': engine,
+                'mode': 'dry-run' if dry_run else 'execute',
+                'seconds': round(seconds, 3),
+                'api_calls': sum(counter.calls.values()),
+                'calls_by_operation': dict(counter.calls.most_common()),
+                'peak_rss_mb': round(peak_rss_mb(), 1)
+            })
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+def key(result):
+    return (result['cleaner'], result['inventory'], result['mode'])
+
+def print_results(results, baseline=None):
+    previous = {key(result): result for result in (baseline or {}).get('results', [])}
+    print(f"{'cleaner':8} {'inventory':12} {'mode':8} {'wall (s)':>18} {'API calls':>18} {'peak RSS (MB)':>20}")
+    for result in results:
+        old = previous.get(key(result))
+        columns = []
+        for field, fmt in [('seconds', '.2f'), ('api_calls', 'd'), ('peak_rss_mb', '.1f')]:
+            value = format(result[field], fmt)
+            if old is not None and old[field]:
+                value += f" ({(result[field] - old[field]) / old[field]:+.0%})"
+            columns.append(value)
+        print(f"{result['cleaner']:8} {result['inventory']:12} {result['mode']:8} {columns[0]:>18} {columns[1]:>18} {columns[2]:>20}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the AWS Resource Cleaner on a synthetic moto account')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help='Synthetic account size')
+    parser.add_argument('--scenarios', help="Comma-separated cleaner:inventory pairs (default: all, e.g. 'simple:list,main:tagging')")
+    parser.add_argument('--endpoint-url', help='Use a moto server (e.g. http://localhost:5001) instead of the in-process mock')
+    parser.add_argument('--poll-delay', type=float, default=0, help='First completion poll delay of the main cleaner (default: 0)')
+    parser.add_argument('--save', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    counts = SIZES[args.size]
+
+    # Child process: measures a single scenario and prints its results as JSON
+    if args.scenario:
+        cleaner, engine = args.scenario.split(':')
+        print(json.dumps(run_scenario(cleaner, engine, counts, args.poll_delay, args.endpoint_url)))
+        return 0
+
+    scenarios = [tuple(pair.split(':')) for pair in args.scenarios.split(',')] if args.scenarios else SCENARIOS
+    print(f"🧪 Benchmarking AWS Resource Cleaner ({args.size} account: "
+          + ", ".join(f"{name}={count}" for name, count in counts.items()) + ")")
+    print("=" * 60)
+
+    results = []
+    for cleaner, engine in scenarios:
+        print(f"   ⏱️  {cleaner} cleaner, {engine} inventory...")
+        command = [sys.executable, os.path.abspath(__file__), '--size', args.size, '--scenario', f"{cleaner}:{engine}",
+                   '--poll-delay', str(args.poll_delay)]
+        if args.endpoint_url:
+            command += ['--endpoint-url', args.endpoint_url]
+        process = subprocess.run(command, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f"   ❌ Scenario failed:\n{process.stderr}")
+            return 1
+        results += json.loads(process.stdout.strip().splitlines()[-1])
+
+    report = {
+        'commit': git_commit(),
+        'size': args.size,
+        'counts': counts,
+        'python': platform.python_version(),
+        'endpoint': args.endpoint_url or 'in-process',
+        'results': results
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {baseline.get('commit')} ({baseline.get('size')} account)")
+    print("=" * 60)
+    print_results(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to {args.save}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""
+Shared pytest setup: makes the src-app modules importable from the tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src-app'))
@@ -0,0 +1,67 @@
+"""
+Tests for the API call metrics: aggregation per operation and the Prometheus text format
+"""
+
+from api_metrics import LATENCY_BUCKETS, METRIC_PREFIX, ApiMetrics
+
+class FakeHttpResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def samples(text):
+    """{'name{labels}': value} of the sample lines of a Prometheus exposition"""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+def test_calls_are_aggregated_per_operation():
+    metrics = ApiMetrics()
+    metrics.observe('ec2', 'DescribeInstances', 0.02)
+    metrics.observe('ec2', 'DescribeInstances', 0.3, retries=2)
+    metrics.observe('s3', 'DeleteObjects', 0.1, error_code='AccessDenied')
+
+    summary = metrics.summary()
+    assert (summary['calls'], summary['retries'], summary['errors']) == (3, 2, 1)
+    slowest = summary['operations'][0]
+    assert (slowest['service'], slowest['operation'], slowest['calls'], slowest['max_seconds']) \
+        == ('ec2', 'DescribeInstances', 2, 0.3)
+
+def test_prometheus_exposes_counters_and_a_cumulative_histogram():
+    metrics = ApiMetrics()
+    metrics.observe('ec2', 'DescribeInstances', 0.02)
+    metrics.observe('ec2', 'DescribeInstances', 0.3, retries=1)
+    metrics.observe('ec2', 'DescribeInstances', 60, error_code='RequestLimitExceeded')
+    metrics._needs_retry('needs-retry.ec2.DescribeInstances', (FakeHttpResponse(400), {'Error': {'Code': 'Throttling'}}))
+
+    text = metrics.prometheus()
+    values = samples(text)
+    labels = 'service="ec2",operation="DescribeInstances"'
+    assert f"# TYPE {METRIC_PREFIX}_calls_total counter" in text
+    assert f"# TYPE {METRIC_PREFIX}_call_duration_seconds histogram" in text
+    assert values[f'{METRIC_PREFIX}_calls_total{{{labels}}}'] == '3'
+    assert values[f'{METRIC_PREFIX}_retries_total{{{labels}}}'] == '1'
+    assert values[f'{METRIC_PREFIX}_throttles_total{{{labels}}}'] == '1'
+    assert values[f'{METRIC_PREFIX}_errors_total{{{labels},code="RequestLimitExceeded"}}'] == '1'
+
+    buckets = [values[f'{METRIC_PREFIX}_call_duration_seconds_bucket{{{labels},le="{limit}"}}']
+               for limit in LATENCY_BUCKETS + ('+Inf',)]
+    assert buckets[LATENCY_BUCKETS.index(0.025)] == '1'
+    assert buckets[LATENCY_BUCKETS.index(0.5)] == '2'
+    assert buckets[-2] == '2'
+    assert buckets[-1] == '3'
+    assert values[f'{METRIC_PREFIX}_call_duration_seconds_count{{{labels}}}'] == '3'
+    assert float(values[f'{METRIC_PREFIX}_call_duration_seconds_sum{{{labels}}}']) == 60.32
+
+def test_label_values_are_escaped():
+    metrics = ApiMetrics()
+    metrics.observe('s3', 'DeleteObjects', 0.1, error_code='Bad "quote"\\')
+    assert 'code="Bad \\"quote\\"\\\\"' in metrics.prometheus()
+
+def test_runs_also_record_into_the_process_metrics():
+    process = ApiMetrics()
+    first, second = ApiMetrics(parent=process), ApiMetrics(parent=process)
+    first.observe('iam', 'ListUsers', 0.1)
+    second.observe('iam', 'ListUsers', 0.2)
+    second.throttled('iam', 'ListUsers')
+
+    assert first.summary()['calls'] == 1
+    assert process.summary()['calls'] == 2
+    assert process.summary()['throttles'] == 1
@@ -0,0 +1,169 @@
+"""
+Tests for the SQLite checkpoint journal: resume, clearing and per-run locking
+"""
+
+import threading
+
+from checkpoint_journal import PLANNED, CheckpointJournal
+from completion_tracker import DELETED
+from cleaner_common import REQUESTED
+from handlers.elasticbeanstalk import list_environments
+from inventory_cache import discover
+
+REGION = 'us-east-1'
+
+def interrupted_run(path):
+    """A run that listed three instances and stopped before finishing"""
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    assert journal.open() is False
+    assert list(journal.listing(REGION, 'EC2Instance', ['i-1', 'i-2', 'i-3'], lambda item: item)) == ['i-1', 'i-2', 'i-3']
+    journal.record('EC2Instance', REGION, 'i-1', DELETED)
+    journal.record('EC2Instance', REGION, 'i-2', REQUESTED, 'shutting-down')
+    journal.close()
+
+def test_resume_skips_finished_and_in_flight(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    interrupted_run(path)
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    try:
+        assert journal.open(resume=True) is True
+        assert journal.summary() == {DELETED: 1, REQUESTED: 1, PLANNED: 1}
+        assert journal.in_flight() == [('EC2Instance', REGION, 'i-2', 'shutting-down')]
+        assert sorted(journal.inventory().get(REGION, 'EC2Instance')) == ['i-2', 'i-3']
+        assert list(journal.listing(REGION, 'EC2Instance', ['i-1', 'i-2', 'i-3', 'i-4'], lambda item: item)) \
+            == ['i-3', 'i-4']
+    finally:
+        journal.close()
+
+def test_open_without_resume_clears_the_run(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    interrupted_run(path)
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    assert journal.open() is False
+    journal.close()
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    try:
+        assert journal.open(resume=True) is True
+        assert journal.summary() == {}
+    finally:
+        journal.close()
+
+def test_finish_and_expired_runs_are_not_resumed(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    interrupted_run(path)
+
+    expired = CheckpointJournal('123456789012', [REGION], path=path, ttl=-1)
+    assert expired.open(resume=True) is False
+    expired.close()
+
+    interrupted_run(path)
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    journal.open(resume=True)
+    journal.finish()
+    journal.close()
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    try:
+        assert journal.open(resume=True) is False
+    finally:
+        journal.close()
+
+def test_runs_are_keyed_by_account_and_regions(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    interrupted_run(path)
+
+    other = CheckpointJournal('123456789012', [REGION, 'eu-west-1'], path=path)
+    assert other.open(resume=True) is False
+    other.close()
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    try:
+        assert journal.open(resume=True) is True
+    finally:
+        journal.close()
+
+def test_same_run_waits_for_the_open_one(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    first = CheckpointJournal('123456789012', [REGION], path=path)
+    second = CheckpointJournal('123456789012', [REGION], path=path)
+    first.open()
+
+    waiting = threading.Thread(target=second.open)
+    waiting.start()
+    waiting.join(0.2)
+    assert waiting.is_alive()
+
+    first.close()
+    waiting.join(5)
+    assert not waiting.is_alive()
+    second.close()
+
+class FakePaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        return [self.method(**kwargs)]
+
+class FakeBeanstalk:
+    """Environments whose journal ID (EnvironmentId) differs from their name"""
+
+    def __init__(self, environments):
+        self.environments = environments
+        self.calls = []
+
+    def get_paginator(self, operation):
+        return FakePaginator(getattr(self, operation))
+
+    def describe_environments(self, IncludeDeleted, EnvironmentIds=None, EnvironmentNames=None):
+        self.calls.append({'EnvironmentIds': EnvironmentIds, 'EnvironmentNames': EnvironmentNames})
+        return {'Environments': [
+            env for env in self.environments
+            if (EnvironmentIds is None or env['EnvironmentId'] in EnvironmentIds)
+            and (EnvironmentNames is None or env['EnvironmentName'] in EnvironmentNames)
+        ]}
+
+class FakeClients:
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, service, region=None):
+        return self._client
+
+class ResumingCleaner:
+    """Discovers resources the way the cleaners do when resuming: only the journaled IDs are rechecked"""
+
+    def __init__(self, client, cached):
+        self.clients = FakeClients(client)
+        self.cached = cached
+
+    def discover(self, region, resource_type, list_all, recheck):
+        return discover(region, resource_type, list_all, recheck, None, cached=self.cached)
+
+def test_resume_rechecks_environments_by_id(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    environments = [
+        {'EnvironmentId': f'e-{name}', 'EnvironmentName': name, 'EnvironmentArn': f'arn:aws:elasticbeanstalk:{REGION}:123456789012:environment/app/{name}',
+         'Status': 'Ready'}
+        for name in ('web', 'worker')
+    ]
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    journal.open()
+    assert list(journal.listing(REGION, 'ElasticBeanstalkEnvironment', ['e-web', 'e-worker'], lambda item: item)) \
+        == ['e-web', 'e-worker']
+    journal.record('ElasticBeanstalkEnvironment', REGION, 'e-web', DELETED)
+    journal.close()
+
+    journal = CheckpointJournal('123456789012', [REGION], path=path)
+    try:
+        assert journal.open(resume=True) is True
+        eb = FakeBeanstalk(environments)
+        resources = list(list_environments(ResumingCleaner(eb, journal.inventory()), REGION))
+    finally:
+        journal.close()
+
+    assert [(resource.id, resource.name) for resource in resources] == [('e-worker', 'worker')]
+    assert eb.calls == [{'EnvironmentIds': ['e-worker'], 'EnvironmentNames': None}]
@@ -0,0 +1,155 @@
+"""
+Tests for the CloudFormation deleter: import order, nested stacks and DELETE_FAILED retries
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import REQUESTED
+from cloudformation_deleter import CloudFormationStackDeleter
+from completion_tracker import DELETED, FAILED
+
+class FakePaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        return [self.method(**kwargs)]
+
+class FakeCloudFormation:
+    """Stacks finish deleting on the next DescribeStacks, after failing `failures` times"""
+
+    def __init__(self, stacks, exports=(), failures=None):
+        # {name: {'root': name, 'status': ..., 'protected': bool}}
+        self.stacks = stacks
+        # [(export name, exporting stack, [importing stacks])]
+        self.exports = exports
+        self.failures = dict(failures or {})
+        self.deletes = []
+        self.unprotected = []
+
+    def get_paginator(self, operation):
+        return FakePaginator(getattr(self, operation))
+
+    def _summary(self, name):
+        stack = self.stacks[name]
+        return {
+            'StackId': f'arn:{name}', 'StackName': name, 'StackStatus': stack['status'],
+            'RootId': f"arn:{stack['root']}" if stack.get('root') else None,
+            'EnableTerminationProtection': stack.get('protected', False),
+            'StackStatusReason': 'resource Bucket failed' if stack['status'] == 'DELETE_FAILED' else None,
+        }
+
+    def describe_stacks(self, StackName=None):
+        if StackName is None:
+            return {'Stacks': [self._summary(name) for name, stack in self.stacks.items()
+                               if stack['status'] != 'DELETE_COMPLETE']}
+        name = StackName.split(':', 1)[1]
+        stack = self.stacks[name]
+        if stack['status'] == 'DELETE_IN_PROGRESS':
+            if self.failures.get(name):
+                self.failures[name] -= 1
+                stack['status'] = 'DELETE_FAILED'
+            else:
+                for other in self.stacks.values():
+                    if other is stack or other.get('root') == name:
+                        other['status'] = 'DELETE_COMPLETE'
+        return {'Stacks': [self._summary(name)]}
+
+    def list_exports(self):
+        return {'Exports': [{'Name': export, 'ExportingStackId': f'arn:{stack}'} for export, stack, _ in self.exports]}
+
+    def list_imports(self, ExportName):
+        importers = next(importers for export, _, importers in self.exports if export == ExportName)
+        if not importers:
+            raise ClientError({'Error': {'Code': 'ValidationError',
+                                         'Message': f'Export {ExportName} is not imported by any stack.'}}, 'ListImports')
+        return {'Imports': importers}
+
+    def list_stack_resources(self, StackName):
+        return {'StackResourceSummaries': [
+            {'LogicalResourceId': 'Bucket', 'ResourceStatus': 'DELETE_FAILED'},
+            {'LogicalResourceId': 'Queue', 'ResourceStatus': 'DELETE_COMPLETE'},
+        ]}
+
+    def update_termination_protection(self, StackName, EnableTerminationProtection):
+        self.unprotected.append(StackName)
+
+    def delete_stack(self, StackName, RetainResources=None):
+        name = StackName.split(':', 1)[1]
+        self.deletes.append((name, RetainResources))
+        self.stacks[name]['status'] = 'DELETE_IN_PROGRESS'
+
+def stack(status='CREATE_COMPLETE', **kwargs):
+    return dict(status=status, **kwargs)
+
+def delete_all(client, names, **kwargs):
+    deleter = CloudFormationStackDeleter(client, initial_delay=0.001, max_delay=0.002, **kwargs)
+    results = {}
+    for result in deleter.delete_all(names):
+        results.setdefault(result.name, []).append(result)
+    return results
+
+def final(results):
+    return {name: changes[-1].status for name, changes in results.items()}
+
+def test_importers_are_deleted_before_exporters():
+    client = FakeCloudFormation(
+        {'network': stack(protected=True), 'app': stack(), 'unused': stack()},
+        exports=[('vpc-id', 'network', ['app']), ('unused-value', 'unused', [])],
+    )
+
+    results = delete_all(client, ['network', 'app', 'unused'])
+
+    assert final(results) == {'network': DELETED, 'app': DELETED, 'unused': DELETED}
+    order = [name for name, _ in client.deletes]
+    assert order.index('app') < order.index('network')
+    assert client.unprotected == ['arn:network']
+
+def test_export_imported_by_a_kept_stack_blocks_deletion():
+    client = FakeCloudFormation(
+        {'network': stack(), 'kept': stack()},
+        exports=[('vpc-id', 'network', ['kept'])],
+    )
+
+    results = delete_all(client, ['network'])
+
+    assert final(results) == {'network': FAILED}
+    assert 'kept' in results['network'][-1].error
+    assert client.deletes == []
+
+def test_nested_stacks_follow_their_root():
+    client = FakeCloudFormation({
+        'root': stack(), 'child': stack(root='root'),
+        'other-root': stack(), 'orphan': stack(root='other-root'),
+    })
+
+    results = delete_all(client, ['child', 'root', 'orphan'])
+
+    assert final(results) == {'root': DELETED, 'child': DELETED, 'orphan': FAILED}
+    assert [change.status for change in results['child']] == [REQUESTED, DELETED]
+    assert client.deletes == [('root', None)]
+
+def test_delete_failed_is_retried_keeping_failed_resources():
+    client = FakeCloudFormation(
+        {'bucket': stack(), 'old': stack('DELETE_FAILED')},
+        failures={'bucket': 1},
+    )
+
+    results = delete_all(client, ['bucket', 'old'])
+
+    assert final(results) == {'bucket': DELETED, 'old': DELETED}
+    assert sorted(client.deletes, key=str) == [('bucket', None), ('bucket', ['Bucket']), ('old', ['Bucket'])]
+
+def test_gives_up_after_the_last_attempt():
+    client = FakeCloudFormation({'stuck': stack()}, failures={'stuck': 10})
+
+    results = delete_all(client, ['stuck'], attempts=2)
+
+    assert final(results) == {'stuck': FAILED}
+    assert results['stuck'][-1].error == 'resource Bucket failed'
+    assert len(client.deletes) == 2
+
+def test_missing_stack_counts_as_deleted():
+    results = delete_all(FakeCloudFormation({}), ['gone'])
+
+    assert final(results) == {'gone': DELETED}
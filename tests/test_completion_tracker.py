@@ -0,0 +1,98 @@
+"""
+Tests for the completion tracker: batched polling, state changes and timeouts
+"""
+
+from completion_tracker import DELETED, FAILED, PENDING, TIMED_OUT, CompletionTracker
+
+class FakeEC2:
+    """Instances report 'shutting-down' until their countdown reaches zero"""
+
+    def __init__(self, countdown):
+        self.countdown = dict(countdown)
+        self.calls = 0
+
+    def get_paginator(self, operation):
+        assert operation == 'describe_instances'
+        return self
+
+    def paginate(self, Filters):
+        self.calls += 1
+        instances = []
+        for instance_id in Filters[0]['Values']:
+            if instance_id not in self.countdown:
+                continue
+            left = self.countdown[instance_id]
+            self.countdown[instance_id] = left - 1
+            instances.append({'InstanceId': instance_id,
+                              'State': {'Name': 'terminated' if left <= 0 else 'shutting-down'}})
+        return [{'Reservations': [{'Instances': instances}]}]
+
+class FakeClients:
+    def __init__(self, ec2):
+        self.ec2 = ec2
+
+    def client(self, service, region=None):
+        assert service == 'ec2'
+        return self.ec2
+
+class FakeJournal:
+    def __init__(self):
+        self.records = []
+
+    def record(self, resource_type, region, resource_id, status, state=None):
+        self.records.append((resource_id, status))
+
+def make_tracker(ec2, **kwargs):
+    records = []
+    journal = FakeJournal()
+    tracker = CompletionTracker(FakeClients(ec2), initial_delay=0.001, max_delay=0.002,
+                                listener=records.append, journal=journal, **kwargs)
+    return tracker, records, journal
+
+def test_poll_records_only_state_changes():
+    ec2 = FakeEC2({'i-1': 0, 'i-2': 2})
+    tracker, records, journal = make_tracker(ec2)
+    tracker.track('EC2Instance', 'us-east-1', 'i-1', 'running')
+    tracker.track('EC2Instance', 'us-east-1', 'i-2', 'running')
+
+    tracker.poll()
+    tracker.poll()
+
+    assert tracker.statuses() == {
+        ('EC2Instance', 'us-east-1', 'i-1'): DELETED,
+        ('EC2Instance', 'us-east-1', 'i-2'): PENDING,
+    }
+    # One batched call per poll; still-pending instances are not written again
+    assert ec2.calls == 2
+    assert journal.records == [('i-1', PENDING), ('i-2', PENDING), ('i-1', DELETED)]
+    assert [(record.id, record.result, record.state) for record in records] == [('i-1', DELETED, 'running')]
+    assert records[0].duration is not None
+
+def test_missing_resources_count_as_deleted():
+    tracker, _, _ = make_tracker(FakeEC2({}))
+    tracker.track('EC2Instance', 'us-east-1', 'i-gone')
+
+    tracker.wait()
+
+    assert tracker.counts() == {DELETED: 1}
+
+def test_wait_filters_by_type_and_region():
+    ec2 = FakeEC2({'i-1': 1, 'i-2': 1})
+    tracker, _, _ = make_tracker(ec2)
+    tracker.track('EC2Instance', 'us-east-1', 'i-1')
+    tracker.track('EC2Instance', 'eu-west-1', 'i-2')
+    tracker.record('EBSVolume', 'us-east-1', 'vol-1', FAILED)
+
+    tracker.wait('EC2Instance', 'us-east-1')
+
+    assert tracker.pending() == [('EC2Instance', 'eu-west-1', 'i-2')]
+    assert tracker.counts() == {DELETED: 1, PENDING: 1, FAILED: 1}
+
+def test_wait_times_out():
+    tracker, records, _ = make_tracker(FakeEC2({'i-1': 1000}), timeout=0.01)
+    tracker.track('EC2Instance', 'us-east-1', 'i-1')
+
+    tracker.wait()
+
+    assert tracker.counts() == {TIMED_OUT: 1}
+    assert [record.result for record in records] == [TIMED_OUT]
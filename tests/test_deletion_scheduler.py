@@ -0,0 +1,78 @@
+"""
+Tests for the dependency scheduler: wave order, cycle detection and execution
+"""
+
+import pytest
+
+from deletion_scheduler import DeletionScheduler, DependencyCycleError
+
+def test_waves_follow_dependencies():
+    """Each node runs in a later wave than everything it depends on"""
+    scheduler = DeletionScheduler()
+    scheduler.add('vpc', depends_on=['subnet', 'igw'])
+    scheduler.add('subnet', depends_on=['instance'])
+    scheduler.add('igw')
+    scheduler.add('instance')
+
+    waves = scheduler.waves()
+
+    assert [sorted(wave) for wave in waves] == [['igw', 'instance'], ['subnet'], ['vpc']]
+
+def test_unknown_and_self_dependencies_are_ignored():
+    """Dependencies outside the graph or on the node itself don't block it"""
+    scheduler = DeletionScheduler()
+    scheduler.add('a', depends_on=['missing', 'a'])
+
+    assert scheduler.waves() == [['a']]
+
+def test_cycle_reports_only_cycle_members():
+    """Nodes that only depend on a cycle are not reported as part of it"""
+    scheduler = DeletionScheduler()
+    scheduler.add('a', depends_on=['b'])
+    scheduler.add('b', depends_on=['a'])
+    scheduler.add('c', depends_on=['a'])
+    scheduler.add('d', depends_on=['e'])
+    scheduler.add('e', depends_on=['d'])
+
+    with pytest.raises(DependencyCycleError) as error:
+        scheduler.waves()
+
+    assert sorted(sorted(cycle) for cycle in error.value.cycles) == [['a', 'b'], ['d', 'e']]
+    assert sorted(error.value.nodes) == ['a', 'b', 'd', 'e']
+
+def test_removing_cycle_dependencies_unblocks_waves():
+    """Breaking the dependencies inside a cycle lets the scheduler order the rest"""
+    scheduler = DeletionScheduler()
+    scheduler.add('a', depends_on=['b'])
+    scheduler.add('b', depends_on=['a'])
+    scheduler.add('c', depends_on=['a'])
+
+    with pytest.raises(DependencyCycleError) as error:
+        scheduler.waves()
+    for cycle in error.value.cycles:
+        scheduler.remove_dependencies(cycle)
+
+    assert [sorted(wave) for wave in scheduler.waves()] == [['a', 'b'], ['c']]
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_run_executes_in_wave_order(workers):
+    """run() returns every result and never starts a node before its dependencies"""
+    finished = []
+    scheduler = DeletionScheduler()
+    for key, deps in {'first': [], 'second': [], 'last': ['first', 'second']}.items():
+        scheduler.add(key, lambda key=key: finished.append(key) or key.upper(), depends_on=deps)
+
+    results = scheduler.run(workers=workers)
+
+    assert results == {'first': 'FIRST', 'second': 'SECOND', 'last': 'LAST'}
+    assert finished[-1] == 'last'
+
+def test_run_wraps_each_node():
+    """wrap receives the node function and its key"""
+    scheduler = DeletionScheduler()
+    scheduler.add('a', lambda: 1)
+    scheduler.add('b', lambda: 2)
+
+    results = scheduler.run(workers=2, wrap=lambda func, key: (key, func()))
+
+    assert results == {'a': ('a', 1), 'b': ('b', 2)}
@@ -0,0 +1,99 @@
+"""
+Tests for the DynamoDB deleter: operation limit window, retries and deletion protection
+"""
+
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+import dynamodb_deleter
+from cleaner_common import REQUESTED
+from completion_tracker import DELETED, FAILED
+from dynamodb_deleter import DynamoDBTableDeleter
+
+def client_error(code, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message or code}}, 'DeleteTable')
+
+class FakeDynamoDB:
+    """Tables take two DescribeTable calls to disappear after DeleteTable"""
+
+    def __init__(self, limit, busy=(), protected=(), broken=(), throttle_once=False):
+        self.limit = limit
+        self.busy = set(busy)
+        self.protected = set(protected)
+        self.broken = set(broken)
+        self.throttle_once = throttle_once
+        self.deleting = {}
+        self.max_in_flight = 0
+        self.unprotected = []
+
+    def delete_table(self, TableName):
+        if TableName in self.broken:
+            raise client_error('AccessDeniedException')
+        if TableName in self.busy:
+            self.busy.discard(TableName)
+            raise client_error('ResourceInUseException')
+        if TableName in self.protected:
+            raise client_error('ValidationException', 'Resource cannot be deleted as it is currently protected')
+        if len(self.deleting) >= self.limit:
+            if self.throttle_once:
+                self.limit = float('inf')
+            raise client_error('LimitExceededException')
+        self.deleting[TableName] = 2
+        self.max_in_flight = max(self.max_in_flight, len(self.deleting))
+
+    def update_table(self, TableName, DeletionProtectionEnabled):
+        assert DeletionProtectionEnabled is False
+        self.protected.discard(TableName)
+        self.unprotected.append(TableName)
+
+    def describe_table(self, TableName):
+        left = self.deleting.get(TableName, 0)
+        if left <= 1:
+            self.deleting.pop(TableName, None)
+            raise client_error('ResourceNotFoundException')
+        self.deleting[TableName] = left - 1
+        return {'Table': {'TableName': TableName, 'TableStatus': 'DELETING'}}
+
+def delete_all(client, names, window):
+    deleter = DynamoDBTableDeleter(client, window=window, initial_delay=0.001, max_delay=0.002)
+    return list(deleter.delete_all(names))
+
+def test_window_shrinks_to_the_account_limit():
+    client = FakeDynamoDB(limit=3, busy=['busy'])
+    names = [f'table-{number}' for number in range(10)] + ['busy']
+
+    results = delete_all(client, names, window=5)
+
+    assert client.max_in_flight == 3
+    assert {result.name for result in results if result.status == REQUESTED} == set(names)
+    assert not [result for result in results if result.status == FAILED]
+
+def test_window_grows_back_after_throttling():
+    client = FakeDynamoDB(limit=2, throttle_once=True)
+    names = [f'table-{number}' for number in range(dynamodb_deleter.WINDOW_GROWTH * 20)]
+
+    results = delete_all(client, names, window=6)
+
+    assert client.max_in_flight == 6
+    assert Counter(result.status for result in results)[REQUESTED] == len(names)
+
+def test_deletion_protection_and_errors():
+    client = FakeDynamoDB(limit=10, protected=['protected'], broken=['broken'])
+
+    results = {result.name: result for result in delete_all(client, ['protected', 'broken'], window=10)
+               if result.status != DELETED}
+
+    assert client.unprotected == ['protected']
+    assert results['protected'].status == REQUESTED
+    assert results['broken'].status == FAILED
+    assert results['broken'].error.response['Error']['Code'] == 'AccessDeniedException'
+
+def test_missing_table_counts_as_deleted():
+    class Missing(FakeDynamoDB):
+        def delete_table(self, TableName):
+            raise client_error('ResourceNotFoundException')
+
+    results = delete_all(Missing(limit=1), ['gone'], window=1)
+
+    assert [(result.name, result.status) for result in results] == [('gone', DELETED)]
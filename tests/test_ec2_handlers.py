@@ -0,0 +1,82 @@
+"""
+Tests for batched EC2 instance termination and its per-instance fallback
+"""
+
+from botocore.exceptions import ClientError
+
+from cleaner_common import terminate_instances
+from handlers import ec2 as ec2_handlers
+from resource_handlers import Resource
+
+def protected_error():
+    return ClientError(
+        {'Error': {'Code': 'OperationNotPermitted', 'Message': 'termination protection'}}, 'TerminateInstances'
+    )
+
+class FakeEC2:
+    """Terminates instances in batches; a batch with a protected instance fails whole, like the API"""
+
+    def __init__(self, protected=()):
+        self.protected = set(protected)
+        self.calls = []
+        self.terminated = set()
+
+    def terminate_instances(self, InstanceIds):
+        self.calls.append(list(InstanceIds))
+        if self.protected & set(InstanceIds):
+            raise protected_error()
+        self.terminated.update(InstanceIds)
+
+def test_instances_are_terminated_in_batches():
+    ec2 = FakeEC2()
+    ids = [f'i-{n}' for n in range(5)]
+    assert terminate_instances(ec2, ids, batch_size=2) == []
+    assert ec2.calls == [['i-0', 'i-1'], ['i-2', 'i-3'], ['i-4']]
+    assert ec2.terminated == set(ids)
+
+def test_failed_batch_is_retried_one_instance_at_a_time():
+    ec2 = FakeEC2(protected={'i-1'})
+    errors = terminate_instances(ec2, ['i-0', 'i-1', 'i-2', 'i-3'], batch_size=3)
+
+    assert [instance_id for instance_id, _ in errors] == ['i-1']
+    assert ec2.calls == [['i-0', 'i-1', 'i-2'], ['i-0'], ['i-1'], ['i-2'], ['i-3']]
+    assert ec2.terminated == {'i-0', 'i-2', 'i-3'}
+
+def test_single_instance_batch_is_not_retried():
+    ec2 = FakeEC2(protected={'i-0'})
+    errors = terminate_instances(ec2, ['i-0'])
+    assert [instance_id for instance_id, _ in errors] == ['i-0']
+    assert ec2.calls == [['i-0']]
+
+class FakeClients:
+    def __init__(self, ec2):
+        self.ec2 = ec2
+
+    def client(self, service, region=None):
+        return self.ec2
+
+class FakeTracker:
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, resource_type, region, resource_id, state=None):
+        self.tracked.append((resource_id, state))
+
+class FakeCleaner:
+    def __init__(self, ec2):
+        self.clients = FakeClients(ec2)
+        self.tracker = FakeTracker()
+
+def test_handler_tracks_instances_and_skips_those_already_stopping():
+    ec2 = FakeEC2()
+    cleaner = FakeCleaner(ec2)
+    instances = [
+        Resource('i-run', state='running'),
+        Resource('i-down', state='shutting-down'),
+        Resource('i-gone', state='terminated'),
+        Resource('i-stop', state='stopped'),
+    ]
+
+    assert ec2_handlers.terminate_instances(cleaner, 'us-east-1', instances) == []
+    assert ec2.calls == [['i-run', 'i-stop']]
+    assert cleaner.tracker.tracked == [('i-run', 'running'), ('i-down', 'shutting-down'), ('i-stop', 'stopped')]
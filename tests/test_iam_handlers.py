@@ -0,0 +1,280 @@
+"""
+Tests for the IAM handlers: per-principal teardown of users and roles and managed policy removal
+"""
+
+import pytest
+from botocore.exceptions import ClientError
+
+from handlers import iam as iam_handlers
+
+class FakePaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        return [self.method(**kwargs)]
+
+class FakeClients:
+    def __init__(self, **clients):
+        self.clients = clients
+
+    def client(self, service):
+        return self.clients[service]
+
+class FakeCleaner:
+    def __init__(self, iam, sts=None):
+        self.clients = FakeClients(iam=iam, sts=sts)
+
+def no_such_entity():
+    return ClientError({'Error': {'Code': 'NoSuchEntity', 'Message': 'not found'}}, 'IAM')
+
+class FakeIAM:
+    """Users, roles and what attaches to them, removed by the matching IAM calls"""
+
+    def __init__(self):
+        self.users = {}
+        self.roles = {}
+        self.groups = {}
+        self.policies = {}
+        self.deleted = []
+
+    def get_paginator(self, operation):
+        return FakePaginator(getattr(self, operation))
+
+    def add_user(self, name, **attachments):
+        user = {'keys': [], 'policies': [], 'inline': [], 'groups': [], 'login': False, 'mfa': [],
+                'certificates': [], 'ssh': []}
+        user.update(attachments)
+        self.users[name] = user
+        for group in user['groups']:
+            self.groups.setdefault(group, set()).add(name)
+
+    def add_role(self, name, **attachments):
+        role = {'policies': [], 'inline': [], 'profiles': []}
+        role.update(attachments)
+        self.roles[name] = role
+
+    # Users
+
+    def list_access_keys(self, UserName):
+        return {'AccessKeyMetadata': [{'AccessKeyId': key} for key in self.users[UserName]['keys']]}
+
+    def delete_access_key(self, UserName, AccessKeyId):
+        self.users[UserName]['keys'].remove(AccessKeyId)
+
+    def list_attached_user_policies(self, UserName):
+        return {'AttachedPolicies': [{'PolicyArn': arn} for arn in self.users[UserName]['policies']]}
+
+    def detach_user_policy(self, UserName, PolicyArn):
+        if PolicyArn not in self.users[UserName]['policies']:
+            raise no_such_entity()
+        self.users[UserName]['policies'].remove(PolicyArn)
+
+    def list_user_policies(self, UserName):
+        return {'PolicyNames': list(self.users[UserName]['inline'])}
+
+    def delete_user_policy(self, UserName, PolicyName):
+        self.users[UserName]['inline'].remove(PolicyName)
+
+    def list_groups_for_user(self, UserName):
+        return {'Groups': [{'GroupName': group} for group in self.users[UserName]['groups']]}
+
+    def remove_user_from_group(self, GroupName, UserName):
+        self.users[UserName]['groups'].remove(GroupName)
+        self.groups[GroupName].discard(UserName)
+
+    def delete_login_profile(self, UserName):
+        if not self.users[UserName]['login']:
+            raise no_such_entity()
+        self.users[UserName]['login'] = False
+
+    def list_mfa_devices(self, UserName):
+        return {'MFADevices': [{'SerialNumber': serial} for serial in self.users[UserName]['mfa']]}
+
+    def deactivate_mfa_device(self, UserName, SerialNumber):
+        self.users[UserName]['mfa'].remove(SerialNumber)
+
+    def delete_virtual_mfa_device(self, SerialNumber):
+        self.deleted.append(('mfa', SerialNumber))
+
+    def list_signing_certificates(self, UserName):
+        return {'Certificates': [{'CertificateId': cert} for cert in self.users[UserName]['certificates']]}
+
+    def delete_signing_certificate(self, UserName, CertificateId):
+        self.users[UserName]['certificates'].remove(CertificateId)
+
+    def list_ssh_public_keys(self, UserName):
+        return {'SSHPublicKeys': [{'SSHPublicKeyId': key} for key in self.users[UserName]['ssh']]}
+
+    def delete_ssh_public_key(self, UserName, SSHPublicKeyId):
+        self.users[UserName]['ssh'].remove(SSHPublicKeyId)
+
+    def delete_user(self, UserName):
+        user = self.users[UserName]
+        if any(user[key] for key in ('keys', 'policies', 'inline', 'groups', 'mfa', 'certificates', 'ssh')) or user['login']:
+            raise ClientError({'Error': {'Code': 'DeleteConflict', 'Message': 'still attached'}}, 'DeleteUser')
+        del self.users[UserName]
+        self.deleted.append(('user', UserName))
+
+    # Roles
+
+    def list_attached_role_policies(self, RoleName):
+        return {'AttachedPolicies': [{'PolicyArn': arn} for arn in self.roles[RoleName]['policies']]}
+
+    def detach_role_policy(self, RoleName, PolicyArn):
+        if PolicyArn not in self.roles[RoleName]['policies']:
+            raise no_such_entity()
+        self.roles[RoleName]['policies'].remove(PolicyArn)
+
+    def list_role_policies(self, RoleName):
+        return {'PolicyNames': list(self.roles[RoleName]['inline'])}
+
+    def delete_role_policy(self, RoleName, PolicyName):
+        self.roles[RoleName]['inline'].remove(PolicyName)
+
+    def list_instance_profiles_for_role(self, RoleName):
+        return {'InstanceProfiles': [{'InstanceProfileName': name} for name in self.roles[RoleName]['profiles']]}
+
+    def remove_role_from_instance_profile(self, InstanceProfileName, RoleName):
+        self.roles[RoleName]['profiles'].remove(InstanceProfileName)
+
+    def delete_instance_profile(self, InstanceProfileName):
+        self.deleted.append(('instance-profile', InstanceProfileName))
+
+    # Managed policies
+
+    def list_entities_for_policy(self, PolicyArn):
+        return {
+            'PolicyUsers': [{'UserName': name} for name, user in self.users.items() if PolicyArn in user['policies']],
+            'PolicyGroups': [{'GroupName': name} for name in self.policies[PolicyArn]['groups']],
+            'PolicyRoles': [{'RoleName': name} for name, role in self.roles.items() if PolicyArn in role['policies']],
+        }
+
+    def detach_group_policy(self, GroupName, PolicyArn):
+        self.policies[PolicyArn]['groups'].remove(GroupName)
+
+    def list_policy_versions(self, PolicyArn):
+        return {'Versions': [{'VersionId': version, 'IsDefaultVersion': version == 'v1'}
+                             for version in self.policies[PolicyArn]['versions']]}
+
+    def delete_policy_version(self, PolicyArn, VersionId):
+        self.policies[PolicyArn]['versions'].remove(VersionId)
+
+    def list_policies(self, Scope):
+        return {'Policies': [{'Arn': arn, 'PolicyName': arn.split('/')[-1]} for arn in self.policies]}
+
+    def delete_policy(self, PolicyArn):
+        policy = self.policies[PolicyArn]
+        if policy['groups'] or policy['versions'] != ['v1'] or any(self.list_entities_for_policy(PolicyArn).values()):
+            raise ClientError({'Error': {'Code': 'DeleteConflict', 'Message': 'still attached'}}, 'DeletePolicy')
+        del self.policies[PolicyArn]
+        self.deleted.append(('policy', PolicyArn))
+
+    def delete_role(self, RoleName):
+        role = self.roles[RoleName]
+        if any(role.values()):
+            raise ClientError({'Error': {'Code': 'DeleteConflict', 'Message': 'still attached'}}, 'DeleteRole')
+        del self.roles[RoleName]
+        self.deleted.append(('role', RoleName))
+
+def test_user_teardown_removes_every_attachment():
+    iam = FakeIAM()
+    iam.add_user(
+        'alice', keys=['AKIA1', 'AKIA2'], policies=['arn:policy/a'], inline=['inline'], groups=['devs'],
+        login=True, mfa=['arn:aws:iam::123456789012:mfa/alice', 'GAHT12345678'], certificates=['cert'], ssh=['ssh']
+    )
+
+    iam_handlers.delete_user(FakeCleaner(iam), 'global', [iam_handlers.Resource('alice')])
+
+    assert 'alice' not in iam.users
+    assert iam.groups['devs'] == set()
+    # Only virtual devices are deleted after being deactivated
+    assert ('mfa', 'arn:aws:iam::123456789012:mfa/alice') in iam.deleted
+    assert ('mfa', 'GAHT12345678') not in iam.deleted
+
+def test_user_without_login_profile():
+    iam = FakeIAM()
+    iam.add_user('bob')
+
+    iam_handlers.delete_user(FakeCleaner(iam), 'global', [iam_handlers.Resource('bob')])
+
+    assert iam.deleted == [('user', 'bob')]
+
+def test_failed_step_keeps_the_user():
+    class BrokenIAM(FakeIAM):
+        def delete_access_key(self, UserName, AccessKeyId):
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'denied'}}, 'DeleteAccessKey')
+
+    iam = BrokenIAM()
+    iam.add_user('carol', keys=['AKIA1'], inline=['inline'])
+
+    with pytest.raises(ClientError, match='AccessDenied'):
+        iam_handlers.delete_user(FakeCleaner(iam), 'global', [iam_handlers.Resource('carol')])
+    # The other steps still ran
+    assert iam.users['carol']['inline'] == []
+    assert 'carol' in iam.users
+
+def test_role_teardown_removes_instance_profiles():
+    iam = FakeIAM()
+    iam.add_role('app', policies=['arn:policy/a'], inline=['inline'], profiles=['app-profile'])
+
+    iam_handlers.delete_role(FakeCleaner(iam), 'global', [iam_handlers.Resource('app')])
+
+    assert iam.deleted == [('instance-profile', 'app-profile'), ('role', 'app')]
+
+class FakeSTS:
+    def __init__(self, arn):
+        self.arn = arn
+        self.calls = 0
+
+    def get_caller_identity(self):
+        self.calls += 1
+        return {'Account': '123456789012', 'Arn': self.arn}
+
+def policy_account(caller_arn):
+    """An account whose 'shared' policy is attached to alice, the admins group and the app role"""
+    iam = FakeIAM()
+    iam.add_user('alice', policies=['arn:policy/shared'], groups=['admins'])
+    iam.add_user('bob', groups=['devs'])
+    iam.add_role('app', policies=['arn:policy/shared'])
+    iam.policies['arn:policy/shared'] = {'groups': ['devs'], 'versions': ['v1', 'v2', 'v3']}
+    iam.policies['arn:policy/admin'] = {'groups': ['admins'], 'versions': ['v1']}
+    sts = FakeSTS(caller_arn)
+    return iam, sts, FakeCleaner(iam, sts)
+
+def delete_policies(cleaner):
+    policies = list(iam_handlers.list_policies(cleaner, 'global'))
+    return {policy.id: iam_handlers.delete_policy(cleaner, 'global', [policy]) for policy in policies}
+
+def test_policy_is_detached_from_every_entity():
+    iam, sts, cleaner = policy_account('arn:aws:iam::123456789012:user/automation/cleaner')
+    iam.add_user('cleaner')
+
+    errors = delete_policies(cleaner)
+
+    assert errors == {'arn:policy/shared': None, 'arn:policy/admin': None}
+    assert ('policy', 'arn:policy/shared') in iam.deleted
+    assert iam.users['alice']['policies'] == [] and iam.roles['app']['policies'] == []
+    # The caller is resolved once for the whole listing
+    assert sts.calls == 1
+
+def test_policies_of_the_calling_user_and_its_groups_are_kept():
+    iam, _, cleaner = policy_account('arn:aws:iam::123456789012:user/alice')
+
+    errors = delete_policies(cleaner)
+
+    assert [arn for arn, _ in errors['arn:policy/shared']] == ['arn:policy/shared']
+    assert 'user alice' in errors['arn:policy/shared'][0][1]
+    assert 'group admins' in errors['arn:policy/admin'][0][1]
+    # Nothing was detached from a kept policy
+    assert iam.users['alice']['policies'] == ['arn:policy/shared']
+    assert iam.roles['app']['policies'] == ['arn:policy/shared']
+    assert iam.policies['arn:policy/shared']['versions'] == ['v1', 'v2', 'v3']
+
+def test_policies_of_the_assumed_role_are_kept():
+    iam, _, cleaner = policy_account('arn:aws:sts::123456789012:assumed-role/app/session')
+
+    errors = delete_policies(cleaner)
+
+    assert 'role app' in errors['arn:policy/shared'][0][1]
+    assert errors['arn:policy/admin'] is None
@@ -0,0 +1,95 @@
+"""
+Tests for the inventory cache (TTL and LRU eviction) and for discovery from a cached inventory
+"""
+
+from inventory_cache import Inventory, InventoryCache, discover
+
+ACCOUNT = '123456789012'
+REGION = 'us-east-1'
+
+def inventory_with(*ids, complete=True):
+    inventory = Inventory()
+    for resource_id in ids:
+        inventory.add(REGION, 'EC2Instance', resource_id)
+    if complete:
+        inventory.complete(REGION, 'EC2Instance')
+    return inventory
+
+def test_incomplete_types_are_not_inventoried():
+    inventory = inventory_with('i-1', complete=False)
+    assert inventory.get(REGION, 'EC2Instance') is None
+    assert inventory.found(REGION, 'EC2Instance') == ['i-1']
+
+def test_cache_is_keyed_by_account_and_region_set():
+    cache = InventoryCache()
+    inventory = inventory_with('i-1')
+    cache.put(ACCOUNT, ['us-east-1', 'eu-west-1'], inventory)
+    assert cache.get(ACCOUNT, ['eu-west-1', 'us-east-1']) is inventory
+    assert cache.get(ACCOUNT, ['us-east-1']) is None
+    assert cache.get('210987654321', ['us-east-1', 'eu-west-1']) is None
+
+def test_expired_inventories_are_dropped():
+    cache = InventoryCache(ttl=60)
+    inventory = inventory_with('i-1')
+    cache.put(ACCOUNT, [REGION], inventory)
+    inventory.created_at -= 61
+    assert cache.get(ACCOUNT, [REGION]) is None
+    inventory.created_at += 61
+    # The expired entry was removed, not just hidden
+    assert cache.get(ACCOUNT, [REGION]) is None
+
+def test_least_recently_used_inventory_is_evicted():
+    cache = InventoryCache(max_entries=2)
+    first, second, third = inventory_with('i-1'), inventory_with('i-2'), inventory_with('i-3')
+    cache.put(ACCOUNT, ['us-east-1'], first)
+    cache.put(ACCOUNT, ['us-west-2'], second)
+    # Reading the first inventory makes the second one the oldest
+    assert cache.get(ACCOUNT, ['us-east-1']) is first
+    cache.put(ACCOUNT, ['eu-west-1'], third)
+    assert cache.get(ACCOUNT, ['us-west-2']) is None
+    assert cache.get(ACCOUNT, ['us-east-1']) is first
+    assert cache.get(ACCOUNT, ['eu-west-1']) is third
+
+def test_invalidate_drops_the_inventory():
+    cache = InventoryCache()
+    cache.put(ACCOUNT, [REGION], inventory_with('i-1'))
+    cache.invalidate(ACCOUNT, [REGION])
+    assert cache.get(ACCOUNT, [REGION]) is None
+
+class Account:
+    """Lists and rechecks instances, counting each call"""
+
+    def __init__(self, *ids):
+        self.ids = list(ids)
+        self.listed = 0
+        self.rechecked = []
+
+    def list_all(self):
+        self.listed += 1
+        return iter(self.ids)
+
+    def recheck(self, ids):
+        self.rechecked.append(list(ids))
+        return (resource_id for resource_id in ids if resource_id in self.ids)
+
+def run_discover(account, inventory=None, cached=None):
+    return list(discover(REGION, 'EC2Instance', account.list_all, account.recheck, lambda item: item, inventory, cached))
+
+def test_discover_lists_and_records_the_inventory():
+    account = Account('i-1', 'i-2')
+    inventory = Inventory()
+    assert run_discover(account, inventory=inventory) == ['i-1', 'i-2']
+    assert account.listed == 1
+    assert inventory.get(REGION, 'EC2Instance') == ['i-1', 'i-2']
+
+def test_discover_only_rechecks_a_complete_cached_inventory():
+    account = Account('i-2', 'i-3')
+    assert run_discover(account, cached=inventory_with('i-1', 'i-2')) == ['i-2']
+    assert account.listed == 0
+    assert account.rechecked == [['i-1', 'i-2']]
+
+def test_discover_rechecks_found_ids_first_then_lists_the_rest():
+    account = Account('i-1', 'i-2', 'i-3')
+    assert run_discover(account, cached=inventory_with('i-2', complete=False)) == ['i-2', 'i-1', 'i-3']
+    assert account.rechecked == [['i-2']]
+    assert account.listed == 1
@@ -0,0 +1,46 @@
+"""
+Tests for the job log: ring buffer reads and sparse index reads from the file
+"""
+
+from jobs import JobLog
+
+def make_log(lines, buffer_lines=3, index_interval=4):
+    log = JobLog(buffer_lines=buffer_lines, index_interval=index_interval)
+    offsets = [log.append(f'line {number}') for number in range(lines)]
+    assert offsets == list(range(lines))
+    return log
+
+def test_recent_lines_come_from_the_ring_buffer():
+    log = make_log(10)
+    try:
+        assert log.read(7) == ['line 7', 'line 8', 'line 9']
+        assert log.read(8, limit=1) == ['line 8']
+    finally:
+        log.close()
+
+def test_old_lines_come_from_the_file():
+    log = make_log(10)
+    try:
+        assert log.read(0, limit=2) == ['line 0', 'line 1']
+        # Starts in the middle of an indexed block and crosses into the next one
+        assert log.read(2, limit=5) == [f'line {number}' for number in range(2, 7)]
+        assert log.read(5) == [f'line {number}' for number in range(5, 10)]
+    finally:
+        log.close()
+
+def test_reads_past_the_end():
+    log = make_log(5)
+    try:
+        assert log.read(5) == []
+        assert log.read(3, limit=10) == ['line 3', 'line 4']
+    finally:
+        log.close()
+
+def test_unicode_lines():
+    log = make_log(0, buffer_lines=1, index_interval=1)
+    try:
+        log.append('🚨 excluído')
+        log.append('✅ ok')
+        assert log.read(0) == ['🚨 excluído', '✅ ok']
+    finally:
+        log.close()
@@ -0,0 +1,99 @@
+"""
+Tests for streaming discovery: background page prefetch and paginated listings
+"""
+
+import threading
+import time
+
+import pytest
+
+from cleaner_common import paginate, prefetch, stream_collection
+
+class Pages:
+    """Page generator that records how many pages were produced"""
+
+    def __init__(self, count, fail_at=None):
+        self.count = count
+        self.fail_at = fail_at
+        self.produced = 0
+        self.finished = threading.Event()
+
+    def __iter__(self):
+        try:
+            for number in range(self.count):
+                if number == self.fail_at:
+                    raise RuntimeError('listing failed')
+                self.produced += 1
+                yield {'Items': [number]}
+        finally:
+            self.finished.set()
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_prefetch_keeps_page_order():
+    assert [page['Items'][0] for page in prefetch(Pages(10))] == list(range(10))
+
+def test_prefetch_reads_at_most_size_pages_ahead():
+    pages = Pages(50)
+    iterator = prefetch(pages, size=2)
+    next(iterator)
+    # The page being consumed, two buffered and one waiting for space
+    assert not wait_for(lambda: pages.produced > 4, timeout=0.3)
+    iterator.close()
+
+def test_prefetch_stops_the_producer_when_the_consumer_stops():
+    pages = Pages(50)
+    iterator = prefetch(pages, size=1)
+    next(iterator)
+    iterator.close()
+    assert wait_for(pages.finished.is_set)
+    assert pages.produced < 50
+
+def test_prefetch_raises_listing_errors_in_the_consumer():
+    received = []
+    with pytest.raises(RuntimeError, match='listing failed'):
+        for page in prefetch(Pages(5, fail_at=3)):
+            received.append(page['Items'][0])
+    # The pages listed before the error are still delivered
+    assert received == [0, 1, 2]
+
+def test_prefetch_size_zero_iterates_inline():
+    assert [page['Items'][0] for page in prefetch(Pages(3), size=0)] == [0, 1, 2]
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+        self.kwargs = None
+
+    def paginate(self, **kwargs):
+        self.kwargs = kwargs
+        return iter(self.pages)
+
+class FakeClient:
+    def __init__(self, pages):
+        self.paginator = FakePaginator(pages)
+        self.operations = []
+
+    def get_paginator(self, operation):
+        self.operations.append(operation)
+        return self.paginator
+
+def test_paginate_yields_the_items_of_every_page():
+    client = FakeClient([{'Functions': [1, 2]}, {}, {'Functions': [3]}])
+    assert list(paginate(client, 'list_functions', 'Functions', MaxItems=10)) == [1, 2, 3]
+    assert client.operations == ['list_functions']
+    assert client.paginator.kwargs == {'MaxItems': 10}
+
+class FakeCollection:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def pages(self):
+        return iter(self._pages)
+
+def test_stream_collection_flattens_resource_pages():
+    assert list(stream_collection(FakeCollection([['vol-1', 'vol-2'], ['vol-3']]))) == ['vol-1', 'vol-2', 'vol-3']
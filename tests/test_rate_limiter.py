@@ -0,0 +1,69 @@
+"""
+Tests for the adaptive rate limiter: token bucket rate adjustment and per-region buckets
+"""
+
+import time
+
+from rate_limiter import MIN_RATE, AdaptiveRateLimiter, TokenBucket
+
+class FakeHttpResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def response(status_code, code=None):
+    return (FakeHttpResponse(status_code), {'Error': {'Code': code}} if code else {})
+
+def context(region):
+    return {'context': {'client_region': region}}
+
+def test_throttling_halves_the_rate_down_to_the_minimum():
+    bucket = TokenBucket(8)
+    bucket.throttled()
+    assert bucket.rate == 4
+    for _ in range(10):
+        bucket.throttled()
+    assert bucket.rate == MIN_RATE
+    assert bucket.throttles == 11
+
+def test_successes_raise_the_rate_up_to_the_maximum():
+    bucket = TokenBucket(2)
+    bucket.throttled()
+    bucket.succeeded()
+    assert bucket.rate == 1.5
+    for _ in range(10):
+        bucket.succeeded()
+    assert bucket.rate == 2
+
+def test_acquire_waits_for_tokens():
+    bucket = TokenBucket(20)
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    # One token is available up front; the other two take 1/20s each
+    assert time.monotonic() - started >= 0.09
+
+def test_regional_services_have_one_bucket_per_region():
+    limiter = AdaptiveRateLimiter()
+    assert limiter.bucket('ec2', 'us-east-1') is limiter.bucket('ec2', 'us-east-1')
+    assert limiter.bucket('ec2', 'us-east-1') is not limiter.bucket('ec2', 'eu-west-1')
+    assert limiter.bucket('iam', 'us-east-1') is limiter.bucket('iam', 'eu-west-1')
+
+def test_throttling_in_one_region_keeps_the_others_at_full_rate():
+    limiter = AdaptiveRateLimiter(max_rates={'ec2': 10})
+    limiter._needs_retry('needs-retry.ec2.DescribeInstances', response(400, 'RequestLimitExceeded'),
+                         request_dict=context('us-east-1'))
+    limiter._needs_retry('needs-retry.ec2.DescribeInstances', response(429), request_dict=context('us-east-1'))
+    limiter._needs_retry('needs-retry.ec2.DescribeInstances', response(200), request_dict=context('eu-west-1'))
+
+    assert limiter.bucket('ec2', 'us-east-1').rate == 2.5
+    assert limiter.bucket('ec2', 'eu-west-1').rate == 10
+    assert limiter.throttles() == {'ec2': 2}
+
+def test_before_send_uses_the_bucket_of_the_client_region():
+    limiter = AdaptiveRateLimiter()
+
+    class Request:
+        context = {'client_region': 'ap-south-1'}
+
+    limiter._before_send('before-send.ec2.DescribeInstances', request=Request())
+    assert set(limiter._buckets) == {('ec2', 'ap-south-1')}
@@ -0,0 +1,146 @@
+"""
+Tests for the nuke-config.yml protection filters
+"""
+
+import pytest
+
+from resource_filters import FilterConfigError, ResourceFilters, blocked
+
+def test_exact_and_implicit_glob():
+    """Plain strings are exact matches unless they contain wildcards"""
+    filters = ResourceFilters({'S3Bucket': ['keep-me', 'important-*']})
+
+    assert filters.protected('S3Bucket', 'keep-me') == 'ID=keep-me'
+    assert filters.protected('S3Bucket', 'important-logs') == 'ID=important-logs'
+    assert filters.protected('S3Bucket', 'keep-me-not') is None
+
+def test_glob_matches_the_whole_value():
+    """An explicit glob is anchored, unlike 'contains'"""
+    filters = ResourceFilters({
+        'EC2Instance': [{'property': 'Name', 'type': 'glob', 'value': 'prod-?'}],
+        'LambdaFunction': [{'type': 'contains', 'value': 'shared'}],
+    })
+
+    assert filters.protected('EC2Instance', 'i-1', {'Name': 'prod-1'}) == 'Name=prod-1'
+    assert filters.protected('EC2Instance', 'i-2', {'Name': 'prod-10'}) is None
+    assert filters.protected('EC2Instance', 'i-3', {'Name': 'my-prod-1'}) is None
+    assert filters.protected('LambdaFunction', 'my-shared-fn') == 'ID=my-shared-fn'
+
+def test_regex():
+    """Regex filters use re.search semantics"""
+    filters = ResourceFilters({'IAMRole': [{'type': 'regex', 'value': '^Admin(Role)?$'}]})
+
+    assert filters.protected('IAMRole', 'AdminRole') == 'ID=AdminRole'
+    assert filters.protected('IAMRole', 'Admin') == 'ID=Admin'
+    assert filters.protected('IAMRole', 'NotAdminRole') is None
+
+def test_tags_in_api_format_and_lazy_lookup():
+    """Tag filters accept API-style tags and only call the tags function when needed"""
+    filters = ResourceFilters({
+        'EC2Instance': [
+            {'property': 'tag:Environment', 'value': 'production'},
+            {'property': 'tag:Owner', 'type': 'glob', 'value': 'team-*'},
+        ],
+        'S3Bucket': ['keep-me'],
+    })
+
+    assert filters.protected('EC2Instance', 'i-1', tags=[{'Key': 'Environment', 'Value': 'production'}]) \
+        == 'tag:Environment=production'
+    assert filters.protected('EC2Instance', 'i-2', tags={'Owner': 'team-a'}) == 'tag:Owner=team-a'
+    assert filters.protected('EC2Instance', 'i-3', tags=lambda: {'Environment': 'dev'}) is None
+
+    def fail():
+        raise AssertionError('tags should not be fetched')
+    assert filters.protected('S3Bucket', 'other', tags=fail) is None
+
+def test_tags_failure_protects_the_resource():
+    """A resource whose tags can't be read is kept"""
+    filters = ResourceFilters({'EC2Instance': [{'property': 'tag:Keep', 'value': 'true'}]})
+
+    def fail():
+        raise RuntimeError('AccessDenied')
+
+    assert filters.protected('EC2Instance', 'i-1', tags=fail) == 'tags unavailable: AccessDenied'
+
+def test_invert_and_global_filters():
+    """Inverted filters protect what doesn't match; global filters apply to every type"""
+    filters = ResourceFilters({
+        'EC2Volume': [{'property': 'tag:Name', 'value': 'scratch-*', 'invert': 'true'}],
+        '__global__': [{'property': 'tag:Protected', 'value': 'yes'}],
+    })
+
+    assert filters.protected('EBSVolume', 'vol-1', tags={'Name': 'scratch-1'}) is None
+    assert filters.protected('EBSVolume', 'vol-2', tags={'Name': 'data'}) == 'tag:Name=data (invert)'
+    assert filters.protected('SQSQueue', 'queue', tags={'Protected': 'yes'}) == 'tag:Protected=yes'
+
+def test_unsupported_filter_type():
+    with pytest.raises(FilterConfigError):
+        ResourceFilters({'S3Bucket': [{'type': 'dateOlderThan', 'value': '1d'}]})
+
+def test_config_accounts():
+    """Filters and the blocklist are read per account"""
+    config = {
+        'account-blocklist': [999999999999],
+        'accounts': {'123456789012': {'filters': {'S3Bucket': ['keep-me']}}},
+    }
+
+    assert blocked(config, '999999999999')
+    assert not blocked(config, '123456789012')
+    assert ResourceFilters.from_config(config, '123456789012').protected('S3Bucket', 'keep-me')
+    assert ResourceFilters.from_config(config, '210987654321') is None
+
+def test_regex_with_leading_inline_flags():
+    """aws-nuke style '(?i)' prefixes are scoped so several regex can be combined"""
+    filters = ResourceFilters({'S3Bucket': [
+        {'type': 'regex', 'value': '(?i)^prod'},
+        {'type': 'regex', 'value': '-keep$'},
+    ]})
+
+    assert filters.protected('S3Bucket', 'PROD-data') == 'ID=PROD-data'
+    assert filters.protected('S3Bucket', 'data-keep') == 'ID=data-keep'
+    assert filters.protected('S3Bucket', 'DATA-KEEP') is None
+
+def test_invalid_regex_is_a_config_error():
+    with pytest.raises(FilterConfigError, match=r'a\(\?i\)b'):
+        ResourceFilters({'S3Bucket': [{'type': 'regex', 'value': 'a(?i)b'}]})
+
+def test_inverted_filters_are_independent():
+    """Each inverted filter protects what it doesn't match, as in aws-nuke"""
+    filters = ResourceFilters({'S3Bucket': [
+        {'property': 'Name', 'value': 'tmp-*', 'invert': 'true'},
+        {'property': 'Name', 'value': '*-scratch', 'invert': 'true'},
+    ]})
+
+    assert filters.protected('S3Bucket', 'b', {'Name': 'tmp-scratch'}) is None
+    assert filters.protected('S3Bucket', 'b', {'Name': 'tmp-data'}) == 'Name=tmp-data (invert)'
+
+def test_cloudformation_stacks_are_matched_by_name():
+    """The main cleaner identifies stacks by name, so bare-string filters protect them"""
+    from handlers import cloudformation
+
+    class FakeCloudFormation:
+        def get_paginator(self, operation):
+            assert operation == 'list_stacks'
+            return self
+
+        def paginate(self, **kwargs):
+            return [{'StackSummaries': [{
+                'StackId': 'arn:aws:cloudformation:us-east-1:123456789012:stack/my-stack/1234',
+                'StackName': 'my-stack', 'StackStatus': 'CREATE_COMPLETE',
+            }]}]
+
+    class FakeCleaner:
+        def __init__(self):
+            self.clients = self
+
+        def client(self, service, region):
+            return FakeCloudFormation()
+
+        def discover(self, region, resource_type, list_all, recheck):
+            return list_all()
+
+    [stack] = cloudformation.list_stacks(FakeCleaner(), 'us-east-1')
+    filters = ResourceFilters({'CloudformationStack': ['my-stack']})
+
+    assert stack.id == 'my-stack'
+    assert filters.protected('CloudFormationStack', stack.id, stack.filter_properties()) == 'ID=my-stack'
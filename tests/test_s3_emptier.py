@@ -0,0 +1,114 @@
+"""
+Tests for the S3 bucket emptier: DeleteObjects batching, multipart uploads and repeated passes
+"""
+
+import threading
+
+from s3_emptier import DELETE_OBJECTS_BATCH_SIZE, S3BucketEmptier
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return self.pages(**kwargs)
+
+class FakeS3:
+    """One bucket with object versions, delete markers and multipart uploads"""
+
+    def __init__(self, versions=0, markers=0, uploads=0, page_size=1000, failing=()):
+        self.versions = [{'Key': f'key-{i}', 'VersionId': f'v{i}'} for i in range(versions)]
+        self.markers = [{'Key': f'marker-{i}', 'VersionId': f'm{i}'} for i in range(markers)]
+        self.uploads = [{'Key': f'upload-{i}', 'UploadId': f'u{i}'} for i in range(uploads)]
+        self.page_size = page_size
+        self.failing = set(failing)
+        self.batches = []
+        self.aborted = []
+        self.bucket_deleted = False
+        # Called after the first DeleteObjects, e.g. to simulate writes during the deletion
+        self.after_delete = None
+        self._lock = threading.Lock()
+
+    def get_bucket_location(self, Bucket):
+        return {'LocationConstraint': None}
+
+    def get_paginator(self, operation):
+        return FakePaginator(getattr(self, f'_{operation}_pages'))
+
+    def _list_object_versions_pages(self, Bucket):
+        entries = [('Versions', entry) for entry in self.versions] + [('DeleteMarkers', entry) for entry in self.markers]
+        for start in range(0, len(entries), self.page_size):
+            page = {'Versions': [], 'DeleteMarkers': []}
+            for kind, entry in entries[start:start + self.page_size]:
+                page[kind].append(dict(entry))
+            yield page
+
+    def _list_multipart_uploads_pages(self, Bucket):
+        yield {'Uploads': list(self.uploads)}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self.aborted.append(UploadId)
+            self.uploads = [upload for upload in self.uploads if upload['UploadId'] != UploadId]
+
+    def delete_objects(self, Bucket, Delete):
+        objects = Delete['Objects']
+        with self._lock:
+            self.batches.append(len(objects))
+            keys = {(entry['Key'], entry['VersionId']) for entry in objects if entry['Key'] not in self.failing}
+            self.versions = [entry for entry in self.versions if (entry['Key'], entry['VersionId']) not in keys]
+            self.markers = [entry for entry in self.markers if (entry['Key'], entry['VersionId']) not in keys]
+            after_delete, self.after_delete = self.after_delete, None
+        if after_delete:
+            after_delete()
+        return {'Errors': [
+            {'Key': entry['Key'], 'Code': 'AccessDenied', 'Message': 'Access Denied'}
+            for entry in objects if entry['Key'] in self.failing
+        ]}
+
+    def delete_bucket(self, Bucket):
+        assert not self.versions and not self.markers and not self.uploads
+        self.bucket_deleted = True
+
+class FakeClients:
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def client(self, service, region=None):
+        return self.s3
+
+def test_versions_and_markers_are_deleted_in_full_batches():
+    s3 = FakeS3(versions=2300, markers=200, page_size=700)
+    result = S3BucketEmptier(FakeClients(s3)).empty_and_delete('bucket')
+
+    assert result.deleted
+    assert result.objects_deleted == 2500
+    assert sorted(s3.batches) == [500, DELETE_OBJECTS_BATCH_SIZE, DELETE_OBJECTS_BATCH_SIZE]
+    assert s3.bucket_deleted
+
+def test_multipart_uploads_are_aborted_before_deleting():
+    s3 = FakeS3(versions=3, uploads=4)
+    result = S3BucketEmptier(FakeClients(s3)).empty_and_delete('bucket')
+
+    assert result.deleted
+    assert result.uploads_aborted == 4
+    assert sorted(s3.aborted) == ['u0', 'u1', 'u2', 'u3']
+
+def test_failed_keys_keep_the_bucket():
+    s3 = FakeS3(versions=10, failing={'key-3'})
+    result = S3BucketEmptier(FakeClients(s3)).empty_and_delete('bucket')
+
+    assert not result.deleted
+    assert result.objects_deleted == 9
+    assert result.errors == [('key-3', 'Access Denied')]
+    assert not s3.bucket_deleted
+    assert 'key-3' in result.summary()
+
+def test_objects_written_during_the_deletion_are_removed_in_another_pass():
+    s3 = FakeS3(versions=5)
+    s3.after_delete = lambda: s3.versions.append({'Key': 'late', 'VersionId': 'v-late'})
+    result = S3BucketEmptier(FakeClients(s3)).empty_and_delete('bucket')
+
+    assert result.deleted
+    assert result.objects_deleted == 6
+    assert s3.batches == [5, 1]
@@ -0,0 +1,37 @@
+"""
+Tests for the Tagging API inventory: ARN parsing into the cleaners' resource types and IDs
+"""
+
+import pytest
+
+from tagging_inventory import parse_arn
+
+ACCOUNT = '123456789012'
+
+@pytest.mark.parametrize('arn, expected', [
+    (f'arn:aws:ec2:us-east-1:{ACCOUNT}:instance/i-0abc', ('EC2Instance', 'i-0abc')),
+    (f'arn:aws:ec2:us-east-1:{ACCOUNT}:volume/vol-1', ('EBSVolume', 'vol-1')),
+    (f'arn:aws:ec2:us-east-1::snapshot/snap-1', ('EBSSnapshot', 'snap-1')),
+    (f'arn:aws:ec2:us-east-1::image/ami-1', ('AMI', 'ami-1')),
+    (f'arn:aws:ec2:us-east-1:{ACCOUNT}:security-group/sg-1', ('SecurityGroup', 'sg-1')),
+    (f'arn:aws:rds:us-east-1:{ACCOUNT}:db:database-1', ('RDSInstance', 'database-1')),
+    (f'arn:aws:lambda:us-east-1:{ACCOUNT}:function:worker', ('LambdaFunction', 'worker')),
+    (f'arn:aws:lambda:us-east-1:{ACCOUNT}:function:worker:3', ('LambdaFunction', 'worker')),
+    (f'arn:aws:dynamodb:us-east-1:{ACCOUNT}:table/orders', ('DynamoDBTable', 'orders')),
+    (f'arn:aws:cloudformation:us-east-1:{ACCOUNT}:stack/app/4f1a-uuid', ('CloudFormationStack', 'app')),
+])
+def test_parse_arn_returns_the_cleaner_type_and_id(arn, expected):
+    assert parse_arn(arn) == expected
+
+@pytest.mark.parametrize('arn', [
+    # Streams and indexes belong to a table, they are not tables themselves
+    f'arn:aws:dynamodb:us-east-1:{ACCOUNT}:table/orders/stream/2024-01-01T00:00:00.000',
+    # Types the cleaners do not handle
+    f'arn:aws:ec2:us-east-1:{ACCOUNT}:network-interface/eni-1',
+    f'arn:aws:sqs:us-east-1:{ACCOUNT}:queue-without-type',
+    # The environment ARN carries the name, not the EnvironmentId the cleaners use
+    f'arn:aws:elasticbeanstalk:us-east-1:{ACCOUNT}:environment/app/web',
+    'not-an-arn',
+])
+def test_parse_arn_ignores_unhandled_resources(arn):
+    assert parse_arn(arn) is None